@@ -0,0 +1,118 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.http import JsonResponse
+
+from . import metrics
+from .views import DepositViewSet, WithdrawViewSet
+
+
+class ExecutorSaturated(Exception):
+    pass
+
+
+class BoundedExecutor:
+    """
+    동기 ORM 작업을 고정된 수의 스레드에서 실행합니다.
+
+    - 처리를 기다리는 요청은 스레드가 아니라 코루틴으로 쌓이므로, 워커 프로세스 하나가
+      수천 개의 진행 중인 요청을 스레드 수와 무관하게 붙잡고 있을 수 있습니다.
+    - 대기 중인 작업이 max_pending 개를 넘으면 ExecutorSaturated 로 거절합니다.
+    - fork 이후에는 부모 프로세스의 스레드가 없으므로 풀을 새로 만듭니다.
+    """
+
+    def __init__(self, workers=None, max_pending=None):
+        self.workers = workers or settings.COMMAND_EXECUTOR_WORKERS
+        self.max_pending = max_pending or settings.COMMAND_EXECUTOR_MAX_PENDING
+        self.pending = 0
+        self._lock = threading.Lock()
+        self._pid = None
+        self._executor = None
+
+    def _get_executor(self):
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._executor = ThreadPoolExecutor(
+                        self.workers, thread_name_prefix="command-db"
+                    )
+                    self._pid = os.getpid()
+        return self._executor
+
+    async def run(self, func, *args, **kwargs):
+        with self._lock:
+            if self.pending >= self.max_pending:
+                raise ExecutorSaturated()
+            self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self._get_executor(), lambda: run_with_connection(func, *args, **kwargs)
+            )
+        finally:
+            with self._lock:
+                self.pending -= 1
+
+    def shutdown(self):
+        if self._pid == os.getpid():
+            self._executor.shutdown()
+            self._pid = None
+
+
+def run_with_connection(func, *args, **kwargs):
+    """
+    풀 스레드는 요청 시작/종료 시그널을 받지 않으므로 DB 연결 정리를 직접 합니다.
+    """
+    close_old_connections()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = BoundedExecutor()
+    return _executor
+
+
+def async_view(view):
+    """
+    동기 DRF 뷰를 제한된 실행기에서 실행하는 비동기 뷰로 감쌉니다.
+    인증, 멱등성 키, 재시도와 렌더링까지 같은 스레드에서 끝내고 응답만 돌려받습니다.
+    """
+
+    def call(request, *args, **kwargs):
+        response = view(request, *args, **kwargs)
+        response.render()
+        return response
+
+    async def handler(request, *args, **kwargs):
+        try:
+            return await get_executor().run(call, request, *args, **kwargs)
+        except ExecutorSaturated:
+            metrics.incr("executor_shed")
+            return JsonResponse(
+                {"detail": "Request was throttled."},
+                status=429,
+                headers={"Retry-After": "1"},
+            )
+
+    # csrf_exempt 데코레이터는 동기 함수로 감싸므로 속성만 지정합니다. (DRF 뷰와 동일)
+    handler.csrf_exempt = True
+    return handler
+
+
+deposit = async_view(DepositViewSet.as_view({"post": "create"}))
+withdraw = async_view(WithdrawViewSet.as_view({"post": "create"}))
@@ -0,0 +1,91 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import signing
+from rest_framework import authentication, exceptions
+
+SALT = "banking.auth.token"
+PRINCIPAL_FIELDS = ("username", "is_active", "is_staff", "is_superuser")
+
+
+def signer():
+    return signing.TimestampSigner(key=settings.AUTH_TOKEN_SECRET, salt=SALT)
+
+
+def issue_token(user):
+    """
+    사용자 id 를 서명한 토큰을 발급합니다. 두 서버가 같은 AUTH_TOKEN_SECRET 으로
+    DB 조회 없이 검증하며, AUTH_TOKEN_TTL 초가 지나면 만료됩니다.
+    """
+    return signer().sign(str(user.pk))
+
+
+class PrincipalCache:
+    """
+    사용자 id -> 인증에 필요한 사용자 정보의 프로세스 내 TTL 캐시입니다.
+    비활성화나 권한 변경은 ttl 초 안에 반영됩니다.
+    """
+
+    def __init__(self, ttl, maxsize):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, user_id):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(user_id)
+                return entry[1]
+        principal = User.objects.filter(pk=user_id).values(*PRINCIPAL_FIELDS).first()
+        with self._lock:
+            self._entries[user_id] = (now + self.ttl, principal)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return principal
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+principals = PrincipalCache(
+    settings.AUTH_PRINCIPAL_CACHE_TTL, settings.AUTH_PRINCIPAL_CACHE_SIZE
+)
+
+
+class SignedTokenAuthentication(authentication.BaseAuthentication):
+    """
+    Authorization: Token <토큰> 헤더를 서명과 만료 시각만으로 검증합니다.
+    세션 테이블을 읽지 않고, 사용자 정보는 PrincipalCache 에서 가져오므로
+    캐시가 유효한 동안에는 인증에 DB 쿼리가 없습니다.
+    """
+
+    keyword = "Token"
+
+    def authenticate(self, request):
+        header = authentication.get_authorization_header(request).split()
+        if not header or header[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(header) != 2:
+            raise exceptions.AuthenticationFailed("Invalid token header.")
+
+        token = header[1].decode("latin-1")
+        try:
+            user_id = int(signer().unsign(token, max_age=settings.AUTH_TOKEN_TTL))
+        except signing.SignatureExpired:
+            raise exceptions.AuthenticationFailed("Token has expired.")
+        except (signing.BadSignature, ValueError):
+            raise exceptions.AuthenticationFailed("Invalid token.")
+
+        principal = principals.get(user_id)
+        if principal is None or not principal["is_active"]:
+            raise exceptions.AuthenticationFailed("User inactive or deleted.")
+        # 저장하지 않는 User 인스턴스입니다. 뷰는 id 와 권한 플래그만 씁니다.
+        return User(pk=user_id, **principal), token
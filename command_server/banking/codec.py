@@ -0,0 +1,101 @@
+import json
+import struct
+
+from django.conf import settings
+
+try:
+    import msgpack
+except ImportError:  # msgpack 이 없으면 JSON 으로만 인코딩합니다.
+    msgpack = None
+
+JSON = "application/json"
+MSGPACK = "application/x-msgpack"
+
+# msgpack 봉투 헤더 = (스키마 버전, 이벤트 순번, 이벤트 시각 epoch 초) 17바이트
+SCHEMA_VERSION = 1
+HEADER = struct.Struct(">Bqd")
+
+_accessors = {}
+
+
+def field_accessors(model):
+    """
+    모델별 (필드 이름, 속성 이름) 목록을 한 번만 만들어 둡니다.
+    외래 키는 *_id 속성을 읽으므로 관련 객체를 조회하지 않습니다.
+    """
+    accessors = _accessors.get(model)
+    if accessors is None:
+        accessors = _accessors[model] = [
+            (field.name, field.attname) for field in model._meta.concrete_fields
+        ]
+    return accessors
+
+
+def serialize_instance(instance):
+    return {
+        name: getattr(instance, attname)
+        for name, attname in field_accessors(type(instance))
+    }
+
+
+def content_type():
+    if settings.EVENT_ENCODING == "msgpack" and msgpack is not None:
+        return MSGPACK
+    return JSON
+
+
+def _default(value):
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return str(value)
+
+
+def encode_payload(message, content_type):
+    """
+    msgpack 은 datetime 을 타임스탬프 확장 타입으로, JSON 은 ISO 8601 문자열로 씁니다.
+    """
+    if content_type == MSGPACK:
+        return msgpack.packb(message, datetime=True, default=_default)
+    return json.dumps(message, default=_default).encode()
+
+
+def decode_payload(payload, content_type):
+    if content_type == MSGPACK:
+        return msgpack.unpackb(payload, timestamp=3)
+    return json.loads(payload)
+
+
+def to_json(payload, content_type):
+    """
+    저장된 본문을 JSON 문자열로 돌려줍니다. JSON 본문은 다시 파싱하지 않습니다.
+    """
+    if content_type == MSGPACK:
+        return json.dumps(decode_payload(payload, content_type), default=_default)
+    return bytes(payload).decode()
+
+
+def envelope(payload, content_type, seq=None, ts=None):
+    """
+    브로커로 보낼 본문을 만듭니다. 본문을 다시 인코딩하지 않도록
+    msgpack 은 헤더(버전, seq, ts)를 앞에 붙이고, JSON 은 객체 끝에 seq/ts 를 덧붙입니다.
+    """
+    if content_type == MSGPACK:
+        return HEADER.pack(SCHEMA_VERSION, seq or 0, ts or 0.0) + payload
+    if seq is None:
+        return payload
+    return payload[:-1] + f',"seq":{seq},"ts":{ts}}}'.encode()
+
+
+def decode_message(body, content_type):
+    """
+    envelope 로 만든 본문을 메시지 딕셔너리로 되돌립니다.
+    """
+    if content_type != MSGPACK:
+        return json.loads(body)
+    version, seq, ts = HEADER.unpack_from(body)
+    if version != SCHEMA_VERSION:
+        raise ValueError(f"Unsupported event schema version {version}")
+    message = msgpack.unpackb(body[HEADER.size :], timestamp=3)
+    if seq:
+        message["seq"], message["ts"] = seq, ts
+    return message
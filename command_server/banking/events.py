@@ -0,0 +1,91 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .codec import decode_payload
+from .models import AccountSnapshot, Event
+from .utils import bulk_insert
+
+
+def event_owner(message):
+    """
+    이벤트가 속한 (사용자 id, 계좌 id) 입니다.
+    """
+    data, model = message["data"], message["model"]
+    if model == "user":
+        return data["id"], None
+    if model == "account":
+        return data.get("user"), data["id"]
+    return data.get("user"), data.get("account")
+
+
+def append_events(messages, content_type):
+    """
+    (메시지, 인코딩된 본문) 목록을 이벤트 로그에 한 번의 INSERT 로 추가하고
+    저장된 이벤트를 같은 순서로 돌려줍니다. 이벤트 id 가 순번(seq)입니다.
+    """
+    if not settings.ENABLE_EVENT_LOG:
+        return []
+    events = []
+    for message, body in messages:
+        user_id, account_id = event_owner(message)
+        events.append(
+            Event(
+                model=f"{message['app_label']}.{message['model']}",
+                user_id=user_id,
+                account_id=account_id,
+                body=body,
+                content_type=content_type,
+            )
+        )
+    bulk_insert(events)
+    return events
+
+
+def take_account_snapshots(chunk_size=2000):
+    """
+    마지막 스냅샷 이후의 계좌 이벤트만 읽어 계좌별 최신 상태를 스냅샷에 반영합니다.
+    이벤트를 접어(fold) 만들므로 스냅샷 상태와 last_event_id 가 항상 일치합니다.
+
+    id 는 커밋 순서가 아니라 INSERT 순서로 매겨지므로, 아직 커밋되지 않았을 수 있는
+    최근 EVENT_SNAPSHOT_LAG 초의 이벤트는 다음 스냅샷으로 미룹니다.
+    """
+    since = AccountSnapshot.objects.aggregate(last=Max("last_event_id"))["last"] or 0
+    cutoff = timezone.now() - timedelta(seconds=settings.EVENT_SNAPSHOT_LAG)
+    events = (
+        Event.objects.filter(
+            model="banking.account", id__gt=since, created_at__lt=cutoff
+        )
+        .order_by("id")
+        .values_list("id", "body", "content_type")
+    )
+
+    latest, deleted = {}, set()
+    for event_id, body, content_type in events.iterator(chunk_size=chunk_size):
+        message = decode_payload(body, content_type)
+        account_id = message["data"]["id"]
+        if message["event"] == "deleted":
+            latest.pop(account_id, None)
+            deleted.add(account_id)
+        else:
+            latest[account_id] = (event_id, message["data"])
+            deleted.discard(account_id)
+
+    with transaction.atomic():
+        AccountSnapshot.objects.filter(account_id__in=deleted | set(latest)).delete()
+        AccountSnapshot.objects.bulk_create(
+            [
+                AccountSnapshot(
+                    account_id=account_id,
+                    user_id=data["user"],
+                    balance=data["balance"],
+                    last_event_id=event_id,
+                )
+                for account_id, (event_id, data) in latest.items()
+            ],
+            batch_size=chunk_size,
+        )
+    return len(latest), len(deleted)
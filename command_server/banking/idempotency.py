@@ -0,0 +1,159 @@
+import functools
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+HEADER = "Idempotency-Key"
+
+
+def idempotency_cache_key(user_id, key):
+    digest = hashlib.sha256(key.encode()).hexdigest()
+    return f"idempotency_{user_id}_{digest}"
+
+
+def request_fingerprint(data):
+    body = json.dumps(data, sort_keys=True, default=str)
+    return hashlib.sha256(body.encode()).hexdigest()
+
+
+class ReservationLost(Exception):
+    pass
+
+
+def in_progress():
+    return Response(
+        {"error": "A request with this key is still being processed"},
+        status=status.HTTP_409_CONFLICT,
+    )
+
+
+def replay(stored, request_hash):
+    stored_hash, status_code, body = stored
+    if stored_hash != request_hash:
+        return Response(
+            {"error": f"{HEADER} was already used with a different request"},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        )
+    if status_code is None:
+        return in_progress()
+    return Response(
+        json.loads(body), status=status_code, headers={"Idempotent-Replayed": "true"}
+    )
+
+
+def release_stale(record):
+    """
+    IDEMPOTENCY_PENDING_TIMEOUT 보다 오래 처리 중으로 남은 키를 풉니다.
+    원장 쓰기와 응답 저장이 한 트랜잭션이므로 처리 중인 키는 원장에 반영되지 않은 키입니다.
+    순서기 모드는 워커 스레드가 따로 커밋하므로 이 보장이 없어 풀지 않습니다.
+    """
+    if settings.ENABLE_SEQUENCER:
+        return False
+    cutoff = timezone.now() - timedelta(seconds=settings.IDEMPOTENCY_PENDING_TIMEOUT)
+    if record.created_at >= cutoff:
+        return False
+    deleted, _ = IdempotencyKey.objects.filter(
+        pk=record.pk, status_code__isnull=True, created_at__lt=cutoff
+    ).delete()
+    return deleted > 0
+
+
+def reserve(user, key, request_hash):
+    """
+    키를 선점해 (레코드, None) 을, 이미 있는 키면 (None, 저장된 응답) 을 돌려줍니다.
+    먼저 선점한 요청이 실패해 키를 풀었거나 오래된 처리 중 키라면 다시 선점합니다.
+    """
+    while True:
+        try:
+            with transaction.atomic():
+                record = IdempotencyKey.objects.create(
+                    user=user, key=key, request_hash=request_hash
+                )
+            return record, None
+        except IntegrityError:
+            pass
+        try:
+            record = IdempotencyKey.objects.get(user=user, key=key)
+        except IdempotencyKey.DoesNotExist:
+            continue
+        if record.status_code is None and release_stale(record):
+            continue
+        return None, replay(
+            (record.request_hash, record.status_code, record.response_body),
+            request_hash,
+        )
+
+
+def idempotent(func):
+    """
+    Idempotency-Key 헤더가 있는 요청을 한 번만 처리합니다.
+
+    - 완료된 응답은 캐시(없으면 유니크 인덱스 테이블)에서 그대로 돌려주므로
+      재시도 요청이 계좌 행을 다시 건드리지 않습니다.
+    - 같은 키가 처리 중이면 409, 다른 요청 본문에 재사용되면 422 를 돌려줍니다.
+    - 예외나 5xx/429 처럼 다시 시도해도 되는 실패는 저장하지 않고 키를 풀어 줍니다.
+    - 원장 쓰기와 응답 저장을 한 트랜잭션으로 커밋하므로, 그 사이에 프로세스가 죽어도
+      키는 처리 중으로만 남고 IDEMPOTENCY_PENDING_TIMEOUT 뒤에 다시 선점됩니다.
+    """
+
+    @functools.wraps(func)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return func(self, request, *args, **kwargs)
+        if len(key) > 255:
+            return Response(
+                {"error": f"{HEADER} must be at most 255 characters"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        request_hash = request_fingerprint(request.data)
+        cache_key = idempotency_cache_key(request.user.id, key)
+        stored = cache.get(cache_key)
+        if stored is not None:
+            return replay(stored, request_hash)
+
+        # 키를 선점합니다. 이미 있으면 저장된 결과를 돌려줍니다.
+        record, replayed = reserve(request.user, key, request_hash)
+        if replayed is not None:
+            return replayed
+
+        stored = None
+        try:
+            with transaction.atomic():
+                response = func(self, request, *args, **kwargs)
+                if (
+                    response.status_code < 500
+                    and response.status_code != status.HTTP_429_TOO_MANY_REQUESTS
+                ):
+                    body = JSONRenderer().render(response.data).decode()
+                    stored = (request_hash, response.status_code, body)
+                    claimed = IdempotencyKey.objects.filter(
+                        pk=record.pk, status_code__isnull=True
+                    ).update(status_code=response.status_code, response_body=body)
+                    if not claimed:
+                        # 너무 오래 걸려 다른 요청이 키를 다시 선점했으므로 이 쓰기는 되돌립니다.
+                        raise ReservationLost()
+        except ReservationLost:
+            return in_progress()
+        except Exception:
+            record.delete()
+            raise
+        if stored is None:
+            record.delete()
+            return response
+
+        cache.set(cache_key, stored, settings.IDEMPOTENCY_KEY_TTL)
+        return response
+
+    return wrapper
@@ -0,0 +1,203 @@
+import sqlite3
+
+from django.db import connection, transaction
+
+from .models import Account, Transaction
+from .signals import publish_bulk_created, publish_change
+from .utils import bulk_insert
+
+
+class LedgerError(Exception):
+    pass
+
+
+class AccountNotFound(LedgerError):
+    pass
+
+
+class AccountNotOwned(LedgerError):
+    pass
+
+
+class InsufficientFunds(LedgerError):
+    pass
+
+
+class BalanceConflict(LedgerError):
+    """
+    일괄 처리 중 읽어 둔 잔액이 다른 요청에 의해 바뀌었습니다. 재시도하면 됩니다.
+    """
+
+
+def supports_update_returning():
+    if connection.vendor == "postgresql":
+        return True
+    return connection.vendor == "sqlite" and sqlite3.sqlite_version_info >= (3, 35)
+
+
+def change_balance(account_id, user_id, delta):
+    """
+    잔액을 조건부 UPDATE 한 문장으로 변경하고 변경된 잔액을 돌려줍니다.
+    소유자 확인과 (출금이면) 잔액 확인을 WHERE 절에 포함하므로
+    별도의 SELECT 나 행 잠금 왕복이 없습니다. 대상 행이 없으면 None 을 돌려줍니다.
+    """
+    quote = connection.ops.quote_name
+    sql = (
+        f"UPDATE {quote(Account._meta.db_table)} "
+        f"SET {quote('balance')} = {quote('balance')} + %s "
+        f"WHERE {quote('id')} = %s AND {quote('user_id')} = %s"
+    )
+    params = [delta, account_id, user_id]
+    if delta < 0:
+        sql += f" AND {quote('balance')} >= %s"
+        params.append(-delta)
+
+    with connection.cursor() as cursor:
+        if supports_update_returning():
+            cursor.execute(f"{sql} RETURNING {quote('balance')}", params)
+            row = cursor.fetchone()
+            return row[0] if row else None
+
+        cursor.execute(sql, params)
+        if cursor.rowcount == 0:
+            return None
+    # RETURNING 을 지원하지 않는 DB: 같은 트랜잭션에서 이미 잠긴 행을 다시 읽습니다.
+    return Account.objects.values_list("balance", flat=True).get(id=account_id)
+
+
+def post_entry(account_id, user, amount, transaction_type, description):
+    """
+    잔액 변경(UPDATE 1회)과 거래 기록(INSERT 1회)을 하나의 짧은 트랜잭션에서 처리합니다.
+    """
+    delta = amount if transaction_type == "deposit" else -amount
+    with transaction.atomic():
+        balance = change_balance(account_id, user.id, delta)
+        if balance is None:
+            # 실패한 경우에만 원인을 한 번 조회합니다.
+            owner_id = (
+                Account.objects.filter(id=account_id)
+                .values_list("user_id", flat=True)
+                .first()
+            )
+            if owner_id is None:
+                raise AccountNotFound(account_id)
+            if owner_id == user.id and delta < 0:
+                raise InsufficientFunds(account_id)
+            raise AccountNotOwned(account_id)
+
+        account = Account(id=account_id, balance=balance, user=user)
+        ledger_entry = Transaction.objects.create(
+            account=account,
+            user=user,
+            amount=amount,
+            balance=balance,
+            transaction_type=transaction_type,
+            description=description,
+        )
+        # UPDATE 는 post_save 시그널을 보내지 않으므로 계좌 변경 이벤트를 직접 기록합니다.
+        # 계좌 이벤트가 이 명령의 마지막 이벤트이므로 그 순번이 일관성 토큰이 됩니다.
+        seq = publish_change(account, "updated")
+    return {
+        "status": "ok",
+        "transaction_id": ledger_entry.pk,
+        "balance": balance,
+        "seq": seq,
+    }
+
+
+def credit(account_id, user, amount, description):
+    return post_entry(account_id, user, amount, "deposit", description)
+
+
+def debit(account_id, user, amount, description):
+    return post_entry(account_id, user, amount, "withdraw", description)
+
+
+def post_batch(user, entries):
+    """
+    검증된 입출금 항목들을 하나의 트랜잭션에서 처리하고 항목별 결과를 같은 순서로 돌려줍니다.
+
+    - 소유 계좌 확인 및 잠금: 쿼리 1회
+    - 잔액 반영: 계좌마다 순 변경액을 UPDATE 1회
+    - 거래 기록: bulk_insert, 이벤트는 청크 단위로 기록
+
+    항목은 요청 순서대로 적용되며, 잔액이 부족한 출금이나 없거나 소유하지 않은 계좌의
+    항목만 거절되고 나머지는 반영됩니다.
+    """
+    results = [None] * len(entries)
+    with transaction.atomic():
+        # 교착 상태를 피하려고 계좌를 id 순서로 잠급니다.
+        opening = dict(
+            Account.objects.select_for_update()
+            .filter(id__in={entry["account"] for entry in entries}, user_id=user.id)
+            .order_by("id")
+            .values_list("id", "balance")
+        )
+        balances = dict(opening)
+        unowned = {entry["account"] for entry in entries} - set(opening)
+        if unowned:
+            # 거절할 항목이 있을 때만 없는 계좌와 남의 계좌를 구분합니다.
+            existing = set(
+                Account.objects.filter(id__in=unowned).values_list("id", flat=True)
+            )
+        accounts = {
+            account_id: Account(id=account_id, user=user) for account_id in opening
+        }
+
+        ledger_entries = []
+        for index, entry in enumerate(entries):
+            account_id, amount = entry["account"], entry["amount"]
+            if account_id not in balances:
+                forbidden = account_id in existing
+                results[index] = {"status": "forbidden" if forbidden else "not_found"}
+                continue
+            delta = amount if entry["transaction_type"] == "deposit" else -amount
+            if balances[account_id] + delta < 0:
+                results[index] = {"status": "insufficient_funds"}
+                continue
+            balances[account_id] += delta
+            ledger_entries.append(
+                (
+                    index,
+                    Transaction(
+                        account=accounts[account_id],
+                        user=user,
+                        amount=amount,
+                        balance=balances[account_id],
+                        transaction_type=entry["transaction_type"],
+                        description=entry["description"],
+                    ),
+                )
+            )
+
+        changed = [
+            account_id
+            for account_id, balance in balances.items()
+            if balance != opening[account_id]
+        ]
+        for account_id in changed:
+            # 읽어 둔 잔액이 그대로일 때만 갱신합니다. (행 잠금이 없는 DB 대비)
+            updated = Account.objects.filter(
+                id=account_id, balance=opening[account_id]
+            ).update(balance=balances[account_id])
+            if not updated:
+                raise BalanceConflict(account_id)
+
+        rows = [row for _, row in ledger_entries]
+        bulk_insert(rows)
+
+        publish_bulk_created(rows)
+        # 계좌마다 마지막 이벤트인 계좌 변경 이벤트의 순번이 그 계좌의 일관성 토큰입니다.
+        seqs = {}
+        for account_id in changed:
+            accounts[account_id].balance = balances[account_id]
+            seqs[account_id] = publish_change(accounts[account_id], "updated")
+
+    for index, row in ledger_entries:
+        results[index] = {
+            "status": "ok",
+            "transaction_id": row.pk,
+            "balance": row.balance,
+            "seq": seqs.get(row.account_id),
+        }
+    return results
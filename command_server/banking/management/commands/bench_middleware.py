@@ -0,0 +1,70 @@
+import time
+
+from django.conf import settings
+from django.core.handlers.base import BaseHandler
+from django.core.management.base import BaseCommand
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+from django.urls import re_path
+from django.views.decorators.csrf import csrf_exempt
+
+
+@csrf_exempt
+def empty_view(request):
+    # DRF APIView 처럼 CSRF 검사에서 제외된, 아무 일도 하지 않는 뷰
+    return HttpResponse(b"{}", content_type="application/json")
+
+
+urlpatterns = [re_path(r"", empty_view)]
+
+PROFILES = {
+    "full": settings.API_MIDDLEWARE + settings.BROWSER_MIDDLEWARE,
+    "lean": settings.API_MIDDLEWARE + ["banking.middleware.BrowserOnlyMiddleware"],
+}
+
+
+def bench(middleware, request_path, iterations, cookies):
+    """
+    빈 뷰 앞에 middleware 스택을 둔 핸들러로 요청 하나당 걸린 시간(마이크로초)을 잽니다.
+    """
+    with override_settings(
+        MIDDLEWARE=middleware, ROOT_URLCONF=__name__, ALLOWED_HOSTS=["testserver"]
+    ):
+        handler = BaseHandler()
+        handler.load_middleware()
+        factory = RequestFactory()
+        factory.cookies.load(cookies)
+        requests = [
+            factory.post(request_path, b"{}", content_type="application/json")
+            for _ in range(iterations)
+        ]
+        started = time.perf_counter()
+        for request in requests:
+            handler.get_response(request)
+        elapsed = time.perf_counter() - started
+    return elapsed / iterations * 1e6
+
+
+class Command(BaseCommand):
+    help = "Compare per-request middleware overhead of the full and lean API profiles"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--path", default="/deposit/", help="API path to request")
+        parser.add_argument("--iterations", type=int, default=10000)
+        parser.add_argument(
+            "--cookie",
+            action="append",
+            default=[],
+            help="Cookie sent with every request, e.g. csrftoken=abc (repeatable)",
+        )
+
+    def handle(self, *args, **options):
+        cookies = "; ".join(options["cookie"])
+        timings = {
+            profile: bench(middleware, options["path"], options["iterations"], cookies)
+            for profile, middleware in PROFILES.items()
+        }
+        for profile, micros in timings.items():
+            print(f"{profile}: {micros:.1f} us/request ({options['path']})")
+        saved = timings["full"] - timings["lean"]
+        print(f"saved: {saved:.1f} us/request ({saved / timings['full']:.0%})")
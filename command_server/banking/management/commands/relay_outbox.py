@@ -0,0 +1,61 @@
+import time
+
+import pika
+from banking.outbox import relay_batch
+from banking.producer import PublisherPool
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = "Relay outbox messages to RabbitMQ"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=settings.OUTBOX_BATCH_SIZE,
+            help="Number of outbox messages published per batch",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=settings.OUTBOX_POLL_INTERVAL,
+            help="Seconds to wait when the outbox is empty",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Drain the outbox once and exit",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        # 트랜잭션 모드의 전용 채널 하나로 순서대로, 묶음마다 한 번만 커밋합니다.
+        publisher = PublisherPool(size=1, transactional=True)
+
+        print("Relaying outbox messages. To exit press CTRL+C")
+        failures = 0
+        try:
+            while True:
+                try:
+                    relayed = relay_batch(publisher, batch_size)
+                except pika.exceptions.AMQPError as e:
+                    if options["once"]:
+                        raise
+                    # 브로커가 돌아올 때까지 지수 백오프로 기다립니다. 메시지는 아웃박스에 남아 있습니다.
+                    failures = min(failures + 1, 10)
+                    delay = min(
+                        options["interval"] * 2**failures,
+                        settings.OUTBOX_MAX_BACKOFF,
+                    )
+                    print(f"Relay failed ({e!r}), retrying in {delay:.1f}s")
+                    time.sleep(delay)
+                    continue
+                failures = 0
+                if relayed < batch_size:
+                    if options["once"]:
+                        break
+                    time.sleep(options["interval"])
+        finally:
+            publisher.close()
@@ -0,0 +1,23 @@
+import time
+
+from banking.events import take_account_snapshots
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = "Fold new account events from the event log into account snapshots"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--interval",
+            type=float,
+            help="Keep running and take a snapshot every this many seconds",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            updated, deleted = take_account_snapshots()
+            print(f"Snapshotted {updated} accounts, removed {deleted}")
+            if not options["interval"]:
+                break
+            time.sleep(options["interval"])
@@ -0,0 +1,32 @@
+import threading
+from bisect import bisect_left
+from collections import Counter
+
+# 프로세스 단위 카운터 (재시도/포기 횟수 등)
+_lock = threading.Lock()
+_counters = Counter()
+
+# 히스토그램 버킷 상한 (밀리초)
+BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+def incr(name, value=1):
+    with _lock:
+        _counters[name] += value
+
+
+def observe(name, value):
+    """
+    누적 버킷 히스토그램에 값을 기록합니다. (name_le_<상한>, name_count, name_sum)
+    """
+    with _lock:
+        for bound in BUCKETS[bisect_left(BUCKETS, value) :]:
+            _counters[f"{name}_le_{bound}"] += 1
+        _counters[f"{name}_le_inf"] += 1
+        _counters[f"{name}_count"] += 1
+        _counters[f"{name}_sum"] += value
+
+
+def snapshot():
+    with _lock:
+        return dict(_counters)
@@ -0,0 +1,116 @@
+import asyncio
+
+from asgiref.sync import markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.handlers.exception import convert_exception_to_response
+from django.utils.module_loading import import_string
+
+
+class BrowserOnlyMiddleware:
+    """
+    BROWSER_MIDDLEWARE(세션, CSRF, 로그인 사용자, 메시지, 클릭재킹 방지)를
+    BROWSER_PATHS(DRF 루트) 와 BROWSER_PATH_PREFIXES 경로(admin, swagger)에만 적용합니다.
+    JSON API 경로는 이 미들웨어들을 통째로 건너뜁니다.
+
+    Django 핸들러는 process_view 같은 훅을 MIDDLEWARE 에 등록된 미들웨어에만 묻기 때문에,
+    브라우저 경로에서는 내부 미들웨어들의 훅을 같은 순서로 대신 호출합니다.
+    ASGI 에서는 비동기로 동작하므로 API 경로 요청이 스레드를 거치지 않습니다.
+    내부 미들웨어는 Django 기본 미들웨어처럼 동기/비동기를 모두 지원해야 합니다.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.paths = frozenset(settings.BROWSER_PATHS)
+        self.prefixes = tuple(settings.BROWSER_PATH_PREFIXES)
+        self.middleware = []
+        handler = get_response
+        for middleware_path in reversed(settings.BROWSER_MIDDLEWARE):
+            instance = import_string(middleware_path)(handler)
+            self.middleware.insert(0, instance)
+            handler = convert_exception_to_response(instance)
+        self.browser_handler = handler
+
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+            # 핸들러가 동기 훅을 sync_to_async 로 감싸지 않도록 비동기 훅을 노출합니다.
+            self.process_view = self.aprocess_view
+            self.process_template_response = self.aprocess_template_response
+
+    def is_browser_path(self, request):
+        path = request.path_info
+        return path in self.paths or path.startswith(self.prefixes)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if self.is_browser_path(request):
+            return self.browser_handler(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        if self.is_browser_path(request):
+            return await self.browser_handler(request)
+        return await self.get_response(request)
+
+    def view_hooks(self):
+        return [
+            instance.process_view
+            for instance in self.middleware
+            if hasattr(instance, "process_view")
+        ]
+
+    def template_response_hooks(self):
+        return [
+            instance.process_template_response
+            for instance in reversed(self.middleware)
+            if hasattr(instance, "process_template_response")
+        ]
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not self.is_browser_path(request):
+            return None
+        for hook in self.view_hooks():
+            response = hook(request, view_func, view_args, view_kwargs)
+            if response is not None:
+                return response
+        return None
+
+    async def aprocess_view(self, request, view_func, view_args, view_kwargs):
+        if not self.is_browser_path(request):
+            return None
+        for hook in self.view_hooks():
+            response = await sync_to_async(hook, thread_sensitive=True)(
+                request, view_func, view_args, view_kwargs
+            )
+            if response is not None:
+                return response
+        return None
+
+    def process_template_response(self, request, response):
+        if self.is_browser_path(request):
+            for hook in self.template_response_hooks():
+                response = hook(request, response)
+        return response
+
+    async def aprocess_template_response(self, request, response):
+        if self.is_browser_path(request):
+            for hook in self.template_response_hooks():
+                response = await sync_to_async(hook, thread_sensitive=True)(
+                    request, response
+                )
+        return response
+
+    def process_exception(self, request, exception):
+        # Django 는 예외 훅을 항상 동기로 호출합니다.
+        if not self.is_browser_path(request):
+            return None
+        for instance in reversed(self.middleware):
+            if hasattr(instance, "process_exception"):
+                response = instance.process_exception(request, exception)
+                if response is not None:
+                    return response
+        return None
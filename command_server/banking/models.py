@@ -27,3 +27,71 @@ class Transaction(models.Model):
     def save(self, *args, **kwargs):
         self.clean()
         super().save(*args, **kwargs)
+
+
+class OutboxMessage(models.Model):
+    """
+    브로커로 보낼 이벤트를 도메인 변경과 같은 DB 트랜잭션 안에서 기록하는 아웃박스입니다.
+    relay_outbox 커맨드가 id 순서대로 읽어 발행한 뒤 삭제합니다.
+    """
+
+    queue = models.CharField(max_length=100)
+    body = models.BinaryField()
+    content_type = models.CharField(max_length=50, default="application/json")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+
+class IdempotencyKey(models.Model):
+    """
+    Idempotency-Key 헤더로 받은 키와 처리 결과입니다.
+    status_code 가 비어 있으면 아직 처리 중인 요청입니다.
+    """
+
+    key = models.CharField(max_length=255)
+    request_hash = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True)
+    response_body = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "key"], name="idempotency_user_key_unique"
+            )
+        ]
+
+
+class Event(models.Model):
+    """
+    추가만 하는 이벤트 로그입니다. id 가 전역 순번이며
+    계좌 스냅샷과 조회 서버 프로젝션 재구축(rebuild_projection)의 기준이 됩니다.
+    사용자/계좌가 삭제되어도 기록은 남아야 하므로 외래 키를 두지 않습니다.
+    """
+
+    id = models.BigAutoField(primary_key=True)
+    model = models.CharField(max_length=100)  # "banking.account"
+    user_id = models.BigIntegerField(null=True)
+    account_id = models.BigIntegerField(null=True)
+    body = models.BinaryField()  # 브로커 봉투를 뺀 메시지 본문
+    content_type = models.CharField(max_length=50, default="application/json")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user_id", "id"], name="event_user_idx"),
+            models.Index(fields=["model", "id"], name="event_model_idx"),
+        ]
+
+
+class AccountSnapshot(models.Model):
+    """
+    계좌별 최신 상태와, 그 상태에 반영된 마지막 이벤트 id 입니다.
+    """
+
+    account_id = models.BigIntegerField(primary_key=True)
+    user_id = models.BigIntegerField(db_index=True)
+    balance = models.PositiveBigIntegerField()
+    last_event_id = models.BigIntegerField()
+    updated_at = models.DateTimeField(auto_now=True)
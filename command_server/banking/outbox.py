@@ -0,0 +1,43 @@
+import pika
+from django.conf import settings
+
+from .codec import JSON
+from .models import OutboxMessage
+
+
+def enqueue(body, queue, content_type=JSON):
+    """
+    이벤트를 아웃박스 테이블에 기록합니다.
+    호출한 쪽의 DB 트랜잭션에 함께 묶이므로 롤백된 변경은 발행되지 않고,
+    행 잠금을 쥔 동안 브로커 왕복이 일어나지 않습니다.
+    """
+    if not settings.ENABLE_MQ:
+        return None
+    return OutboxMessage.objects.create(
+        queue=queue, body=body, content_type=content_type
+    )
+
+
+def relay_batch(publisher, batch_size):
+    """
+    가장 오래된 아웃박스 메시지부터 batch_size 개를 한 묶음으로 순서대로 발행하고 삭제합니다.
+    묶음 발행이 실패하면 아무것도 삭제하지 않고 예외를 다시 던지므로 다음 묶음에서 다시 보냅니다.
+
+    순서를 보장하려면 릴레이 프로세스는 하나만 실행해야 합니다.
+    """
+    messages = list(
+        OutboxMessage.objects.order_by("id").values_list(
+            "id", "queue", "body", "content_type"
+        )[:batch_size]
+    )
+    if not messages:
+        return 0
+    publisher.publish_batch(
+        [
+            # BinaryField 는 DB 에 따라 memoryview 로 돌아옵니다.
+            (bytes(body), queue, pika.BasicProperties(content_type=content_type))
+            for _, queue, body, content_type in messages
+        ]
+    )
+    OutboxMessage.objects.filter(id__in=[message[0] for message in messages]).delete()
+    return len(messages)
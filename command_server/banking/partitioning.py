@@ -0,0 +1,31 @@
+from django.conf import settings
+
+
+def jump_hash(key, buckets):
+    """
+    Jump consistent hash (Lamping & Veach).
+    버킷 수가 바뀌어도 옮겨 가는 키가 1/buckets 정도로 최소화됩니다.
+    """
+    bucket, candidate = -1, 0
+    while candidate < buckets:
+        bucket = candidate
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        candidate = int((bucket + 1) * ((1 << 31) / ((key >> 33) + 1)))
+    return bucket
+
+
+def partition_queue(account_id):
+    partition = jump_hash(account_id, settings.PROJECTION_PARTITIONS)
+    return f"banking_partition_{partition}"
+
+
+def queue_for(app_label, model_name, data):
+    """
+    계좌/거래 이벤트는 계좌 id 로 파티션 큐를 정해, 한 계좌의 이벤트가
+    항상 같은 큐(같은 컨슈머 워커)에서 순서대로 처리되게 합니다.
+    """
+    if model_name == "account":
+        return partition_queue(data["id"])
+    if model_name == "transaction":
+        return partition_queue(data["account"])
+    return f"{app_label}_{model_name}_queue"
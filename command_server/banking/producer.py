@@ -1,16 +1,218 @@
-import json
+import atexit
+import os
+import queue
+import threading
+from contextlib import contextmanager
 
 import pika
 from django.conf import settings
 
 
+def declare_queue(channel, queue):
+    """
+    큐와 그 데드레터 큐를 선언합니다. 컨슈머가 거절(nack, requeue=False)한 메시지는
+    데드레터 교환기를 거쳐 {queue}_dead 큐에 남으므로 확인한 뒤 다시 발행할 수 있습니다.
+    명령 서버와 조회 서버가 같은 인자로 선언해야 합니다.
+    """
+    exchange = settings.RABBITMQ_DEAD_LETTER_EXCHANGE
+    channel.exchange_declare(exchange=exchange, exchange_type="direct", durable=True)
+    channel.queue_declare(queue=f"{queue}_dead", durable=True)
+    channel.queue_bind(queue=f"{queue}_dead", exchange=exchange, routing_key=queue)
+    channel.queue_declare(queue=queue, arguments={"x-dead-letter-exchange": exchange})
+
+
+class PooledChannel:
+    """
+    풀에 보관되는 커넥션/채널 한 쌍입니다.
+    이미 선언한 큐 이름을 기억해 매 발행마다 queue_declare 를 반복하지 않습니다.
+    """
+
+    def __init__(self, connection, channel):
+        self.connection = connection
+        self.channel = channel
+        self.declared = set()
+        self.broken = False
+
+    @property
+    def is_open(self):
+        return not self.broken and self.connection.is_open and self.channel.is_open
+
+    def declare(self, queue_name):
+        if queue_name not in self.declared:
+            declare_queue(self.channel, queue_name)
+            self.declared.add(queue_name)
+
+    def close(self):
+        try:
+            if self.connection.is_open:
+                self.connection.close()
+        except pika.exceptions.AMQPError:
+            pass
+
+
+class PublisherPool:
+    """
+    워커 프로세스마다 RabbitMQ 커넥션/채널 풀을 유지하는 스레드 안전 퍼블리셔입니다.
+
+    - 요청마다 TCP 핸드셰이크와 채널 생성을 반복하지 않고 채널을 재사용합니다.
+    - pika 의 BlockingConnection 은 스레드 안전하지 않으므로 채널 하나는
+      한 번에 한 스레드만 빌려 씁니다.
+    - 끊어진 채널은 폐기하고 새로 연결해 한 번 재시도합니다.
+    - transactional 이면 채널을 트랜잭션 모드로 열고, 묶음을 모두 보낸 뒤
+      tx_commit 한 번으로 브로커의 수락을 기다립니다. (메시지마다 확인을 기다리지 않음)
+    - fork 이후에는 부모 프로세스의 소켓을 공유하지 않도록 풀을 새로 만듭니다.
+    """
+
+    def __init__(self, host=None, size=None, timeout=None, transactional=False):
+        self.host = host or settings.RABBITMQ_HOST
+        self.size = size or settings.RABBITMQ_POOL_SIZE
+        self.timeout = timeout or settings.RABBITMQ_POOL_TIMEOUT
+        self.transactional = transactional
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._in_use = 0
+        self._counters = {
+            "connections_opened": 0,
+            "connections_closed": 0,
+            "reconnects": 0,
+            "published": 0,
+            "publish_errors": 0,
+        }
+
+    def _incr(self, name, value=1):
+        with self._lock:
+            self._counters[name] += value
+
+    def _connect(self):
+        connection = pika.BlockingConnection(pika.ConnectionParameters(self.host))
+        channel = connection.channel()
+        if self.transactional:
+            channel.tx_select()
+        self._incr("connections_opened")
+        return PooledChannel(connection, channel)
+
+    def _discard(self, pooled):
+        pooled.close()
+        self._incr("connections_closed")
+
+    def _checkout(self):
+        while True:
+            try:
+                pooled = self._idle.get_nowait()
+            except queue.Empty:
+                return self._connect()
+            try:
+                # 유휴 상태로 쌓인 하트비트/종료 프레임을 처리해 끊긴 연결을 걸러냅니다.
+                pooled.connection.process_data_events(time_limit=0)
+            except pika.exceptions.AMQPError:
+                pooled.broken = True
+            if pooled.is_open:
+                return pooled
+            self._discard(pooled)
+
+    @contextmanager
+    def channel(self):
+        """
+        풀에서 채널을 빌려주고, 블록이 끝나면 반납합니다.
+        """
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._reset()
+
+        if not self._slots.acquire(timeout=self.timeout):
+            raise TimeoutError("RabbitMQ publisher pool exhausted")
+        pooled = None
+        try:
+            pooled = self._checkout()
+            with self._lock:
+                self._in_use += 1
+            try:
+                yield pooled
+            finally:
+                with self._lock:
+                    self._in_use -= 1
+        finally:
+            if pooled is not None:
+                if pooled.is_open:
+                    self._idle.put(pooled)
+                else:
+                    self._discard(pooled)
+            self._slots.release()
+
+    def publish(self, message, queue_name, properties=None):
+        self.publish_batch([(message, queue_name, properties)])
+
+    def publish_batch(self, messages):
+        """
+        (본문, 큐 이름, 속성) 목록을 한 채널로 순서대로 발행합니다.
+        트랜잭션 모드에서는 커밋되기 전에 실패한 묶음은 브로커가 모두 버리므로 처음부터,
+        아니면 이미 나간 메시지가 중복되지 않도록 실패한 메시지부터 다시 보냅니다.
+        """
+        sent = 0
+        for attempt in range(2):
+            with self.channel() as pooled:
+                try:
+                    for message, queue_name, properties in messages[sent:]:
+                        pooled.declare(queue_name)
+                        pooled.channel.basic_publish(
+                            exchange="",
+                            routing_key=queue_name,
+                            body=message,
+                            properties=properties,
+                        )
+                        if not self.transactional:
+                            sent += 1
+                    if self.transactional:
+                        pooled.channel.tx_commit()
+                except pika.exceptions.AMQPError:
+                    pooled.broken = True
+                    self._incr("publish_errors")
+                    if attempt:
+                        raise
+                    self._incr("reconnects")
+                    continue
+            self._incr("published", len(messages))
+            return
+
+    def stats(self):
+        with self._lock:
+            return {
+                **self._counters,
+                "size": self.size,
+                "in_use": self._in_use,
+                "idle": self._idle.qsize(),
+            }
+
+    def close(self):
+        while True:
+            try:
+                pooled = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._discard(pooled)
+
+
+_publisher = None
+_publisher_lock = threading.Lock()
+
+
+def get_publisher():
+    global _publisher
+    if _publisher is None:
+        with _publisher_lock:
+            if _publisher is None:
+                _publisher = PublisherPool()
+                atexit.register(_publisher.close)
+    return _publisher
+
+
 def send_message(message, queue):
     if not settings.ENABLE_MQ:
         return
-    connection = pika.BlockingConnection(
-        pika.ConnectionParameters(settings.RABBITMQ_HOST)
-    )
-    channel = connection.channel()
-    channel.queue_declare(queue=queue)
-    channel.basic_publish(exchange="", routing_key=queue, body=message)
-    connection.close()
+    get_publisher().publish(message, queue)
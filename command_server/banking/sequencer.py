@@ -0,0 +1,169 @@
+import atexit
+import os
+import queue
+import threading
+from collections import defaultdict
+from concurrent.futures import Future, TimeoutError
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from rest_framework.exceptions import Throttled
+
+from . import metrics
+from .ledger import AccountNotFound, AccountNotOwned, InsufficientFunds, post_batch
+
+
+class SequencedCommand:
+    def __init__(self, user, entry):
+        self.user = user
+        self.entry = entry
+        self.future = Future()
+
+
+class CommandSequencer:
+    """
+    계좌 id 를 해시해 고정된 워커 스레드 큐에 명령을 배정하는 단일 작성자(single-writer) 순서기입니다.
+
+    - 한 계좌의 명령은 항상 같은 워커가 처리하므로 계좌 행을 두고 경쟁하지 않습니다.
+    - 워커는 쌓여 있는 명령을 최대 max_batch 개까지 꺼내 한 트랜잭션으로 그룹 커밋합니다.
+    - 호출한 쪽은 Future 로 결과를 기다리므로 잠금 경합이 재시도 대신 배칭으로 바뀝니다.
+    - fork 이후에는 부모 프로세스의 스레드가 없으므로 워커를 새로 띄웁니다.
+    """
+
+    def __init__(self, workers=None, max_batch=None):
+        self.workers = workers or settings.SEQUENCER_WORKERS
+        self.max_batch = max_batch or settings.SEQUENCER_MAX_BATCH
+        self._lock = threading.Lock()
+        self._pid = None
+        self._queues = []
+        self._threads = []
+
+    def _start(self):
+        self._pid = os.getpid()
+        self._queues = [queue.Queue() for _ in range(self.workers)]
+        self._threads = [
+            threading.Thread(
+                target=self._run,
+                args=(commands,),
+                name=f"sequencer-{index}",
+                daemon=True,
+            )
+            for index, commands in enumerate(self._queues)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, user, entry):
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._start()
+        command = SequencedCommand(user, entry)
+        self._queues[entry["account"] % self.workers].put(command)
+        return command.future
+
+    def _run(self, commands):
+        try:
+            while True:
+                command = commands.get()
+                if command is None:
+                    return
+                batch = [command]
+                while len(batch) < self.max_batch:
+                    try:
+                        command = commands.get_nowait()
+                    except queue.Empty:
+                        break
+                    if command is None:
+                        commit_batch(batch)
+                        return
+                    batch.append(command)
+                commit_batch(batch)
+        finally:
+            connection.close()
+
+    def close(self):
+        if self._pid != os.getpid():
+            return
+        for commands in self._queues:
+            commands.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._pid = None
+
+
+def commit_batch(commands):
+    """
+    워커가 모은 명령들을 하나의 트랜잭션으로 커밋합니다.
+    사용자마다 ledger.post_batch 를 호출하며, 한 사용자의 실패는 그 세이브포인트만
+    롤백하고 나머지 명령은 그대로 커밋합니다. 결과는 커밋이 끝난 뒤에 전달합니다.
+    """
+    # 대기 시간을 넘겨 취소된 명령은 건너뜁니다.
+    commands = [
+        command for command in commands if command.future.set_running_or_notify_cancel()
+    ]
+    if not commands:
+        return
+    close_old_connections()
+    by_user = defaultdict(list)
+    for command in commands:
+        by_user[command.user.id].append(command)
+
+    completed = []
+    try:
+        with transaction.atomic():
+            for user_commands in by_user.values():
+                try:
+                    results = post_batch(
+                        user_commands[0].user,
+                        [command.entry for command in user_commands],
+                    )
+                except Exception as e:
+                    for command in user_commands:
+                        command.future.set_exception(e)
+                else:
+                    completed.extend(zip(user_commands, results))
+    except Exception as e:
+        for command, _ in completed:
+            command.future.set_exception(e)
+        return
+
+    for command, result in completed:
+        command.future.set_result(result)
+
+
+_sequencer = None
+_sequencer_lock = threading.Lock()
+
+
+def get_sequencer():
+    global _sequencer
+    if _sequencer is None:
+        with _sequencer_lock:
+            if _sequencer is None:
+                _sequencer = CommandSequencer()
+                atexit.register(_sequencer.close)
+    return _sequencer
+
+
+def post_sequenced(user, entry):
+    """
+    명령을 순서기에 넣고 결과를 기다립니다. 거절된 명령은 ledger 예외로 바꿔 던지고,
+    대기 시간 안에 처리되지 못한 명령은 취소하고 429 로 부하를 덜어냅니다.
+    """
+    future = get_sequencer().submit(user, entry)
+    try:
+        result = future.result(timeout=settings.SEQUENCER_TIMEOUT)
+    except TimeoutError:
+        # 아직 워커가 꺼내지 않은 명령만 취소할 수 있습니다. 이미 커밋 중이면 결과를 기다립니다.
+        if future.cancel():
+            metrics.incr("sequencer_timeouts")
+            raise Throttled()
+        result = future.result()
+    if result["status"] == "not_found":
+        raise AccountNotFound(entry["account"])
+    if result["status"] == "forbidden":
+        raise AccountNotOwned(entry["account"])
+    if result["status"] == "insufficient_funds":
+        raise InsufficientFunds(entry["account"])
+    return result
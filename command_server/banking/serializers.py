@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.contrib.auth.models import User
 from rest_framework import serializers
 
@@ -17,6 +18,11 @@ class UserSerializer(serializers.ModelSerializer):
         return user
 
 
+class TokenRequestSerializer(serializers.Serializer):
+    username = serializers.CharField()
+    password = serializers.CharField(write_only=True)
+
+
 class AccountSerializer(serializers.ModelSerializer):
     class Meta:
         model = Account
@@ -29,8 +35,20 @@ class AccountSerializer(serializers.ModelSerializer):
         return account
 
 
+class AccountIdField(serializers.IntegerField):
+    """
+    계좌 id 만 검증해 그대로 쓰기 경로로 넘깁니다.
+    존재·소유 확인은 ledger 의 조건부 UPDATE 가 request.user 로 범위를 좁힌
+    한 번의 쿼리로 처리하므로, 쓰기 전에 계좌나 사용자 행을 읽지 않습니다.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault("min_value", 1)
+        super().__init__(**kwargs)
+
+
 class TransactionBaseSerializer(serializers.Serializer):
-    account = serializers.PrimaryKeyRelatedField(queryset=Account.objects.all())
+    account = AccountIdField()
     amount = serializers.IntegerField(min_value=1)  # min_value를 1로 설정하여 0 이하 값을 방지
     description = serializers.CharField()
 
@@ -41,3 +59,23 @@ class DepositSerializer(TransactionBaseSerializer):
 
 class WithdrawSerializer(TransactionBaseSerializer):
     pass
+
+
+class BatchEntrySerializer(serializers.Serializer):
+    """
+    일괄 요청의 항목 하나입니다. 계좌 존재·소유 확인은
+    ledger.post_batch 가 한 번의 쿼리로 처리합니다.
+    """
+
+    account = AccountIdField()
+    amount = serializers.IntegerField(min_value=1)
+    transaction_type = serializers.ChoiceField(choices=["deposit", "withdraw"])
+    description = serializers.CharField()
+
+
+class TransactionBatchSerializer(serializers.Serializer):
+    entries = serializers.ListField(
+        child=serializers.DictField(),
+        allow_empty=False,
+        max_length=settings.TRANSACTION_BATCH_MAX_SIZE,
+    )
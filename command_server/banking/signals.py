@@ -1,27 +1,14 @@
-import json
+from collections import defaultdict
 
-from django.core.serializers.json import DjangoJSONEncoder
-from django.db.models import Model
+from django.conf import settings
 from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
+from .codec import content_type, encode_payload, envelope, serialize_instance
+from .events import append_events
 from .models import Account, Transaction, User
-from .producer import send_message
-
-
-def serialize_instance(instance):
-    """
-    Django 모델 인스턴스를 JSON 직렬화 가능한 딕셔너리로 변환합니다.
-    """
-    data = {}
-    for field in instance._meta.fields:
-        value = getattr(instance, field.name)
-        if isinstance(value, Model):
-            value = value.pk  # 외래 키 필드는 기본 키 값으로 변환
-        elif hasattr(value, "isoformat"):  # datetime 필드 처리
-            value = value.isoformat()
-        data[field.name] = value
-    return data
+from .outbox import enqueue
+from .partitioning import queue_for
 
 
 @receiver(post_save)
@@ -29,18 +16,87 @@ def serialize_instance(instance):
 def handle_model_change(sender, instance, **kwargs):
     if sender not in [User, Account, Transaction]:
         return
+    # bulk_insert 로 넣은 행은 publish_bulk_created 가 기록합니다.
+    if getattr(instance, "_bulk_inserted", False):
+        return
 
     event = (
         "deleted"
         if kwargs.get("signal") == post_delete
         else ("created" if kwargs.get("created", False) else "updated")
     )
+    publish_change(instance, event)
+
 
+def publish_change(instance, event):
+    """
+    모델 변경 이벤트를 이벤트 로그와 아웃박스에 기록하고 이벤트 순번을 돌려줍니다.
+    QuerySet.update() 처럼 시그널을 보내지 않는 변경은 이 함수를 직접 호출합니다.
+    """
     message = {
         "event": event,
         "app_label": instance._meta.app_label,
         "model": instance._meta.model_name,
         "data": serialize_instance(instance),
     }
-    queue_name = f"{instance._meta.app_label}_{instance._meta.model_name}_queue"
-    send_message(json.dumps(message, cls=DjangoJSONEncoder), queue=queue_name)
+    queue_name = queue_for(message["app_label"], message["model"], message["data"])
+    encoding = content_type()
+    payload = encode_payload(message, encoding)
+    events = append_events([(message, payload)], encoding)
+    if not events:
+        enqueue(envelope(payload, encoding), queue_name, encoding)
+        return None
+    event = events[0]
+    body = envelope(payload, encoding, event.id, event.created_at.timestamp())
+    enqueue(body, queue_name, encoding)
+    return event.id
+
+
+def publish_bulk_created(instances):
+    """
+    bulk_insert 로 넣은 행들은 시그널로 기록하지 않으므로,
+    이벤트 로그에는 행마다 created 이벤트를, 아웃박스에는 큐(파티션)별로
+    OUTBOX_BULK_CHUNK_SIZE 개씩 묶은 bulk_created 이벤트 하나를 기록합니다.
+    """
+    if not instances:
+        return
+    meta = instances[0]._meta
+    rows = [serialize_instance(instance) for instance in instances]
+    created = [
+        {
+            "event": "created",
+            "app_label": meta.app_label,
+            "model": meta.model_name,
+            "data": data,
+        }
+        for data in rows
+    ]
+    encoding = content_type()
+    events = append_events(
+        [(message, encode_payload(message, encoding)) for message in created],
+        encoding,
+    )
+
+    by_queue = defaultdict(list)
+    for index, data in enumerate(rows):
+        by_queue[queue_for(meta.app_label, meta.model_name, data)].append(index)
+    chunk_size = settings.OUTBOX_BULK_CHUNK_SIZE
+    for queue_name, indexes in by_queue.items():
+        for start in range(0, len(indexes), chunk_size):
+            chunk = indexes[start : start + chunk_size]
+            message = {
+                "event": "bulk_created",
+                "app_label": meta.app_label,
+                "model": meta.model_name,
+                "data": [rows[index] for index in chunk],
+            }
+            payload = encode_payload(message, encoding)
+            if events:
+                # 묶음의 순번은 마지막 행의 순번입니다.
+                last = events[chunk[-1]]
+                payload = envelope(
+                    payload, encoding, last.id, last.created_at.timestamp()
+                )
+            else:
+                payload = envelope(payload, encoding)
+            enqueue(payload, queue_name, encoding)
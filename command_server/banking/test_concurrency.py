@@ -1,13 +1,20 @@
+import asyncio
 import os
 import threading
 from time import sleep
 
+from django.conf import settings
 from django.contrib.auth.models import User
-from django.test import TransactionTestCase
+from django.core.handlers.asgi import ASGIHandler
+from django.test import AsyncClient, TransactionTestCase, override_settings
 from django.urls import reverse
 from rest_framework.test import APIClient
 
+from command_server.banking.async_views import BoundedExecutor, ExecutorSaturated
+from command_server.banking.authentication import issue_token
+from command_server.banking.middleware import BrowserOnlyMiddleware
 from command_server.banking.models import Account, Transaction
+from command_server.banking.sequencer import CommandSequencer
 
 
 class ConcurrencyTestCase(TransactionTestCase):
@@ -135,3 +142,117 @@ class ConcurrencyTestCase(TransactionTestCase):
 
         transactions = Transaction.objects.filter(account=self.account1)
         self.assertEqual(transactions.count(), 1 if self.account1.balance == 200 else 0)
+
+    def test_sequencer_group_commits_concurrent_commands(self):
+        """
+        순서기 테스트:
+        - 여러 스레드가 같은 계좌에 보낸 명령이 잃어버리는 갱신 없이 모두 반영되는지 확인합니다.
+        """
+        sequencer = CommandSequencer(workers=2, max_batch=50)
+        entry = {"account": self.account1.id, "description": "Sequenced"}
+        futures = []
+
+        def submit(transaction_type, amount):
+            futures.append(
+                sequencer.submit(
+                    self.user1,
+                    {**entry, "transaction_type": transaction_type, "amount": amount},
+                )
+            )
+
+        threads = [
+            threading.Thread(target=submit, args=("deposit", 100)) for _ in range(20)
+        ] + [threading.Thread(target=submit, args=("withdraw", 50)) for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        results = [future.result(timeout=10) for future in futures]
+        sequencer.close()
+
+        self.assertTrue(all(result["status"] == "ok" for result in results))
+        self.account1.refresh_from_db()
+        self.assertEqual(self.account1.balance, 1000 + 2000 - 500)
+        self.assertEqual(Transaction.objects.count(), 30)
+
+    def test_async_deposits_run_on_bounded_executor(self):
+        """
+        비동기 입금 테스트:
+        - 비동기 엔드포인트로 보낸 동시 입금이 모두 반영되는지 확인합니다.
+        """
+        url = reverse("async-deposit")
+        responses = []
+
+        def deposit(amount):
+            responses.append(
+                self.client1.post(
+                    url,
+                    {
+                        "account": self.account1.id,
+                        "amount": amount,
+                        "description": "Async",
+                    },
+                    format="json",
+                )
+            )
+
+        threads = [threading.Thread(target=deposit, args=(100,)) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual([response.status_code for response in responses], [201] * 5)
+        self.account1.refresh_from_db()
+        self.assertEqual(self.account1.balance, 1500)
+
+    def test_bounded_executor_sheds_excess_requests(self):
+        executor = BoundedExecutor(workers=1, max_pending=1)
+        release = threading.Event()
+
+        async def saturate():
+            first = asyncio.ensure_future(executor.run(release.wait, 5))
+            await asyncio.sleep(0.05)
+            with self.assertRaises(ExecutorSaturated):
+                await executor.run(int)
+            release.set()
+            return await first
+
+        self.assertTrue(asyncio.run(saturate()))
+        self.assertEqual(executor.pending, 0)
+        executor.shutdown()
+
+    def test_lean_profile_serves_async_endpoints_without_thread_hops(self):
+        """
+        lean 미들웨어 프로필 + ASGI 테스트:
+        - BrowserOnlyMiddleware 가 비동기로 동작해 API 경로 훅이 sync_to_async 로 감싸지지 않는지,
+          브라우저 경로(/)는 전체 스택을 거치는지 확인합니다.
+        """
+        lean = settings.API_MIDDLEWARE + ["banking.middleware.BrowserOnlyMiddleware"]
+        token = issue_token(self.user1)
+
+        async def run():
+            client = AsyncClient()
+            deposit = await client.post(
+                reverse("async-deposit"),
+                {"account": self.account1.id, "amount": 100, "description": "ASGI"},
+                content_type="application/json",
+                authorization=f"Token {token}",
+            )
+            root = await client.get("/")
+            return deposit, root
+
+        with override_settings(MIDDLEWARE=lean):
+            handler = ASGIHandler()
+            self.assertEqual(
+                [hook.__func__ for hook in handler._view_middleware],
+                [BrowserOnlyMiddleware.aprocess_view],
+            )
+            deposit, root = asyncio.run(run())
+
+        self.assertEqual(deposit.status_code, 201)
+        self.assertNotIn("X-Frame-Options", deposit)
+        self.assertEqual(root["X-Frame-Options"], "DENY")
+        self.account1.refresh_from_db()
+        self.assertEqual(self.account1.balance, 1100)
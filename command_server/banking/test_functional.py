@@ -1,11 +1,29 @@
 import os
+from datetime import timedelta
+from unittest import mock
 
+from django.conf import settings
 from django.contrib.auth.models import User
+from django.db import IntegrityError, connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
-from rest_framework.test import APITestCase
+from rest_framework.test import APIClient, APITestCase
 
-from command_server.banking.models import Account, Transaction
+from command_server.banking.authentication import principals
+from command_server.banking.codec import decode_message
+from command_server.banking.events import take_account_snapshots
+from command_server.banking.idempotency import request_fingerprint
+from command_server.banking.ledger import BalanceConflict
+from command_server.banking.models import (
+    Account,
+    IdempotencyKey,
+    OutboxMessage,
+    Transaction,
+)
+from command_server.banking.partitioning import partition_queue
 
 
 class BankingAPITest(APITestCase):
@@ -60,6 +78,102 @@ class BankingAPITest(APITestCase):
         self.assertEqual(self.account2.balance, 2000)
         self.assertEqual(Transaction.objects.count(), 0)
 
+    @override_settings(ENABLE_SEQUENCER=True)
+    def test_sequenced_balance_conflict_is_retried(self):
+        url = reverse("deposit-list")
+        data = {"account": self.account1.id, "amount": 500, "description": "Retry"}
+        with mock.patch(
+            "command_server.banking.views.post_sequenced",
+            side_effect=[BalanceConflict(), {"seq": 7}],
+        ) as post_sequenced:
+            response = self.client.post(url, data, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.json()["consistency_token"], f"{self.account1.id}:7")
+        self.assertEqual(post_sequenced.call_count, 2)
+
+    def test_deposit_does_not_read_account_before_writing(self):
+        url = reverse("deposit-list")
+        data = {"account": self.account1.id, "amount": 500, "description": "Deposit"}
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        account_reads = [
+            query["sql"]
+            for query in queries.captured_queries
+            if query["sql"].startswith("SELECT") and '"banking_account"' in query["sql"]
+        ]
+        self.assertEqual(account_reads, [])
+
+    def test_deposit_to_missing_account(self):
+        url = reverse("deposit-list")
+        data = {"account": 999999, "amount": 500, "description": "Deposit"}
+        response = self.client.post(url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("account", response.data)
+        self.assertEqual(Transaction.objects.count(), 0)
+
+    def test_signed_token_authenticates_without_session_or_user_queries(self):
+        principals.clear()
+        self.client.logout()
+        last_login = User.objects.get(id=self.user1.id).last_login
+        response = self.client.post(
+            reverse("auth-token"),
+            {"username": "testuser1", "password": "testpassword1"},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.user1.refresh_from_db()
+        self.assertEqual(self.user1.last_login, last_login)
+        token = response.data["token"]
+
+        url = reverse("deposit-list")
+        data = {"account": self.account1.id, "amount": 100, "description": "Token"}
+        headers = {"HTTP_AUTHORIZATION": f"Token {token}"}
+        self.assertEqual(
+            self.client.post(url, data, format="json", **headers).status_code,
+            status.HTTP_201_CREATED,
+        )
+        # 두 번째 요청부터는 사용자 정보도 캐시에서 읽습니다.
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(url, data, format="json", **headers)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        auth_reads = [
+            query["sql"]
+            for query in queries.captured_queries
+            if '"auth_user"' in query["sql"] or '"django_session"' in query["sql"]
+        ]
+        self.assertEqual(auth_reads, [])
+
+        response = self.client.post(
+            url, data, format="json", HTTP_AUTHORIZATION=f"Token {token}x"
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_lean_middleware_profile_skips_browser_middleware_on_api_paths(self):
+        lean = settings.API_MIDDLEWARE + ["banking.middleware.BrowserOnlyMiddleware"]
+        with override_settings(MIDDLEWARE=lean):
+            client = APIClient()
+            response = client.post(
+                reverse("auth-token"),
+                {"username": "testuser1", "password": "testpassword1"},
+                format="json",
+            )
+            client.credentials(HTTP_AUTHORIZATION=f"Token {response.data['token']}")
+            response = client.post(
+                reverse("deposit-list"),
+                {"account": self.account1.id, "amount": 100, "description": "Lean"},
+                format="json",
+            )
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            self.assertNotIn("X-Frame-Options", response)
+
+            # admin 은 세션/CSRF/클릭재킹 방지를 그대로 거칩니다.
+            response = client.get("/admin/login/")
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response["X-Frame-Options"], "DENY")
+            self.assertIn("csrftoken", response.cookies)
+
     def test_withdraw_by_owner(self):
         url = reverse("withdraw-list")
         data = {
@@ -102,3 +216,208 @@ class BankingAPITest(APITestCase):
         self.account1.refresh_from_db()
         self.assertEqual(self.account1.balance, 1000)
         self.assertEqual(Transaction.objects.count(), 0)
+
+    @override_settings(ENABLE_MQ=True)
+    def test_deposit_writes_outbox_messages(self):
+        OutboxMessage.objects.all().delete()
+        url = reverse("deposit-list")
+        data = {
+            "account": self.account1.id,
+            "amount": 500,
+            "description": "Test deposit",
+        }
+        response = self.client.post(url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        queues = list(
+            OutboxMessage.objects.order_by("id").values_list("queue", flat=True)
+        )
+        self.assertEqual(queues, [partition_queue(self.account1.id)] * 2)
+        # 마지막 메시지(계좌 변경)의 순번이 응답의 일관성 토큰입니다.
+        last = OutboxMessage.objects.latest("id")
+        last = decode_message(bytes(last.body), last.content_type)
+        self.assertEqual(last["model"], "account")
+        self.assertEqual(
+            response.data["consistency_token"], f"{self.account1.id}:{last['seq']}"
+        )
+
+    @override_settings(ENABLE_MQ=True, OUTBOX_BULK_CHUNK_SIZE=2)
+    def test_transaction_batch(self):
+        OutboxMessage.objects.all().delete()
+        url = reverse("transaction-batch-list")
+        entry = {"account": self.account1.id, "description": "Payroll"}
+        data = {
+            "entries": [
+                {**entry, "amount": 500, "transaction_type": "deposit"},
+                {**entry, "amount": 2000, "transaction_type": "withdraw"},
+                {**entry, "amount": 1200, "transaction_type": "withdraw"},
+                {**entry, "account": self.account2.id, "amount": 1},
+                {**entry, "amount": 0, "transaction_type": "deposit"},
+                {**entry, "amount": 100, "transaction_type": "deposit"},
+            ]
+        }
+        response = self.client.post(url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["succeeded"], 3)
+        self.assertEqual(
+            [result["status"] for result in response.data["results"]],
+            ["ok", "insufficient_funds", "ok", "invalid", "invalid", "ok"],
+        )
+        self.assertEqual(
+            [result.get("balance") for result in response.data["results"]],
+            [1500, None, 300, None, None, 400],
+        )
+        self.assertRegex(
+            response.data["consistency_token"], rf"^{self.account1.id}:\d+$"
+        )
+
+        self.account1.refresh_from_db()
+        self.assertEqual(self.account1.balance, 400)
+        self.assertEqual(
+            list(Transaction.objects.order_by("id").values_list("id", "balance")),
+            [
+                (response.data["results"][index]["transaction_id"], balance)
+                for index, balance in ((0, 1500), (2, 300), (5, 400))
+            ],
+        )
+        self.assertEqual(
+            list(OutboxMessage.objects.order_by("id").values_list("queue", flat=True)),
+            [partition_queue(self.account1.id)] * 3,
+        )
+
+    def test_deposit_with_idempotency_key_is_applied_once(self):
+        url = reverse("deposit-list")
+        data = {
+            "account": self.account1.id,
+            "amount": 500,
+            "description": "Test deposit",
+        }
+        first = self.client.post(url, data, format="json", HTTP_IDEMPOTENCY_KEY="k1")
+        replayed = self.client.post(url, data, format="json", HTTP_IDEMPOTENCY_KEY="k1")
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(replayed.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(replayed.data, first.data)
+        self.assertEqual(replayed["Idempotent-Replayed"], "true")
+
+        self.account1.refresh_from_db()
+        self.assertEqual(self.account1.balance, 1500)
+        self.assertEqual(Transaction.objects.count(), 1)
+
+        reused = self.client.post(
+            url, {**data, "amount": 1}, format="json", HTTP_IDEMPOTENCY_KEY="k1"
+        )
+        self.assertEqual(reused.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+    def test_idempotency_key_released_during_reservation_is_reserved_again(self):
+        url = reverse("deposit-list")
+        data = {"account": self.account1.id, "amount": 500, "description": "Race"}
+        create = IdempotencyKey.objects.create
+        calls = []
+
+        def create_after_release(**kwargs):
+            # 처음 선점은 다른 요청의 키와 부딪치고, 조회 전에 그 요청이 키를 풉니다.
+            calls.append(kwargs)
+            if len(calls) == 1:
+                raise IntegrityError("duplicate key")
+            return create(**kwargs)
+
+        with mock.patch.object(
+            IdempotencyKey.objects, "create", side_effect=create_after_release
+        ):
+            response = self.client.post(
+                url, data, format="json", HTTP_IDEMPOTENCY_KEY="race"
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(calls), 2)
+        self.account1.refresh_from_db()
+        self.assertEqual(self.account1.balance, 1500)
+
+    def test_stale_in_progress_idempotency_key_is_taken_over(self):
+        url = reverse("deposit-list")
+        data = {"account": self.account1.id, "amount": 500, "description": "Crash"}
+        # 응답을 저장하기 전에 프로세스가 죽어 처리 중으로 남은 키입니다.
+        pending = IdempotencyKey.objects.create(
+            user=self.user1, key="crash", request_hash=request_fingerprint(data)
+        )
+        busy = self.client.post(url, data, format="json", HTTP_IDEMPOTENCY_KEY="crash")
+        self.assertEqual(busy.status_code, status.HTTP_409_CONFLICT)
+
+        IdempotencyKey.objects.filter(pk=pending.pk).update(
+            created_at=timezone.now()
+            - timedelta(seconds=settings.IDEMPOTENCY_PENDING_TIMEOUT + 1)
+        )
+        response = self.client.post(
+            url, data, format="json", HTTP_IDEMPOTENCY_KEY="crash"
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            IdempotencyKey.objects.get(user=self.user1, key="crash").status_code,
+            status.HTTP_201_CREATED,
+        )
+        self.account1.refresh_from_db()
+        self.assertEqual(self.account1.balance, 1500)
+
+    @override_settings(EVENT_API_TOKEN="secret")
+    def test_event_log_api_requires_token(self):
+        url = reverse("events")
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+
+        response = self.client.get(
+            url,
+            {"user": self.user1.id, "limit": 1},
+            HTTP_AUTHORIZATION="Bearer secret",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        page = response.json()
+        self.assertEqual(len(page["events"]), 1)
+        self.assertEqual(page["next"], page["events"][0]["id"])
+        self.assertEqual(page["events"][0]["message"]["model"], "user")
+
+    @override_settings(EVENT_API_TOKEN="secret", EVENT_SNAPSHOT_LAG=-60)
+    def test_snapshot_api_serves_users_and_snapshotted_transactions(self):
+        for amount in (500, 300):
+            self.client.post(
+                reverse("deposit-list"),
+                {"account": self.account1.id, "amount": amount, "description": "Pay"},
+                format="json",
+            )
+        take_account_snapshots()
+        # 스냅샷 이후에 만든 계좌의 거래는 이벤트로 재생되므로 내려주지 않습니다.
+        later = Account.objects.create(user=self.user1, balance=0)
+        Transaction.objects.create(
+            account=later,
+            user=self.user1,
+            amount=1,
+            balance=1,
+            transaction_type="deposit",
+            description="Later",
+        )
+
+        url = reverse("snapshot-transactions")
+        auth = {"HTTP_AUTHORIZATION": "Bearer secret"}
+        first = self.client.get(url, {"user": self.user1.id, "limit": 1}, **auth)
+        first = first.json()
+        rest = self.client.get(
+            url, {"user": self.user1.id, "after": first["next"]}, **auth
+        ).json()
+        rows = first["transactions"] + rest["transactions"]
+        self.assertEqual([row["amount"] for row in rows], [500, 300])
+        self.assertEqual({row["account"] for row in rows}, {self.account1.id})
+        self.assertIsNone(rest["next"])
+
+        snapshot = self.client.get(
+            reverse("snapshots"), {"user": self.user1.id}, **auth
+        ).json()
+        self.assertEqual([user["id"] for user in snapshot["users"]], [self.user1.id])
+        self.assertEqual(
+            [row["account_id"] for row in snapshot["snapshots"]], [self.account1.id]
+        )
+
+    @override_settings(EVENT_API_TOKEN="secret")
+    def test_event_log_api_rejects_non_positive_limit(self):
+        url = reverse("events")
+        for limit in (0, -1):
+            response = self.client.get(
+                url, {"limit": limit}, HTTP_AUTHORIZATION="Bearer secret"
+            )
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -1,9 +1,44 @@
+import io
 import os
+import time
+from contextlib import redirect_stdout
+from datetime import datetime, timezone
+from unittest import mock
 
+import pika
 from django.contrib.auth.models import User
-from django.test import TestCase
+from django.core.management import call_command
+from django.db import OperationalError
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.exceptions import Throttled
 
-from command_server.banking.models import Account, Transaction
+from command_server.banking.codec import (
+    JSON,
+    MSGPACK,
+    decode_message,
+    encode_payload,
+    envelope,
+)
+from command_server.banking.events import take_account_snapshots
+from command_server.banking.ledger import (
+    AccountNotOwned,
+    InsufficientFunds,
+    credit,
+    debit,
+)
+from command_server.banking.management.commands import relay_outbox
+from command_server.banking.metrics import snapshot
+from command_server.banking.models import (
+    Account,
+    AccountSnapshot,
+    Event,
+    OutboxMessage,
+    Transaction,
+)
+from command_server.banking.outbox import relay_batch
+from command_server.banking.partitioning import jump_hash
+from command_server.banking.producer import PublisherPool
+from command_server.banking.utils import bulk_insert, retry
 
 
 class AccountModelTest(TestCase):
@@ -54,3 +89,319 @@ class AccountModelTest(TestCase):
         self.account.save()
         self.assertEqual(transaction.balance, 700)
         self.assertEqual(self.account.balance, 700)
+
+
+class PublisherPoolTest(SimpleTestCase):
+    def test_channel_reused_across_publishes(self):
+        with mock.patch("pika.BlockingConnection") as connection_class:
+            pool = PublisherPool(host="localhost", size=2)
+            pool.publish("first", "test_queue")
+            pool.publish("second", "test_queue")
+
+        self.assertEqual(connection_class.call_count, 1)
+        channel = connection_class.return_value.channel.return_value
+        channel.queue_declare.assert_any_call(
+            queue="test_queue",
+            arguments={"x-dead-letter-exchange": "banking_dead_letter"},
+        )
+        self.assertEqual(channel.queue_declare.call_count, 2)
+        self.assertEqual(channel.basic_publish.call_count, 2)
+        self.assertEqual(pool.stats()["published"], 2)
+        self.assertEqual(pool.stats()["idle"], 1)
+
+    def test_transactional_batch_commits_once(self):
+        with mock.patch("pika.BlockingConnection") as connection_class:
+            pool = PublisherPool(host="localhost", size=1, transactional=True)
+            pool.publish_batch(
+                [(f"message {i}".encode(), "test_queue", None) for i in range(3)]
+            )
+
+        channel = connection_class.return_value.channel.return_value
+        channel.tx_select.assert_called_once_with()
+        self.assertEqual(channel.basic_publish.call_count, 3)
+        channel.tx_commit.assert_called_once_with()
+        self.assertEqual(pool.stats()["published"], 3)
+
+    def test_reconnects_after_broken_channel(self):
+        with mock.patch("pika.BlockingConnection") as connection_class:
+            channel = connection_class.return_value.channel.return_value
+            channel.basic_publish.side_effect = [
+                pika.exceptions.StreamLostError("lost"),
+                None,
+            ]
+            pool = PublisherPool(host="localhost", size=2)
+            pool.publish("message", "test_queue")
+
+        self.assertEqual(connection_class.call_count, 2)
+        stats = pool.stats()
+        self.assertEqual(stats["reconnects"], 1)
+        self.assertEqual(stats["connections_closed"], 1)
+        self.assertEqual(stats["published"], 1)
+
+    def test_batch_resumes_from_failed_message_without_transactions(self):
+        with mock.patch("pika.BlockingConnection") as connection_class:
+            channel = connection_class.return_value.channel.return_value
+            channel.basic_publish.side_effect = [
+                None,
+                pika.exceptions.StreamLostError("lost"),
+                None,
+                None,
+            ]
+            pool = PublisherPool(host="localhost", size=1)
+            pool.publish_batch(
+                [(f"message {i}".encode(), "test_queue", None) for i in range(3)]
+            )
+
+        bodies = [call.kwargs["body"] for call in channel.basic_publish.call_args_list]
+        self.assertEqual(
+            bodies, [b"message 0", b"message 1", b"message 1", b"message 2"]
+        )
+        self.assertEqual(pool.stats()["reconnects"], 1)
+        self.assertEqual(pool.stats()["published"], 3)
+
+    def test_transactional_batch_retries_from_start(self):
+        with mock.patch("pika.BlockingConnection") as connection_class:
+            channel = connection_class.return_value.channel.return_value
+            channel.tx_commit.side_effect = [
+                pika.exceptions.StreamLostError("lost"),
+                None,
+            ]
+            pool = PublisherPool(host="localhost", size=1, transactional=True)
+            pool.publish_batch(
+                [(f"message {i}".encode(), "test_queue", None) for i in range(2)]
+            )
+
+        self.assertEqual(channel.basic_publish.call_count, 4)
+        self.assertEqual(channel.tx_commit.call_count, 2)
+        self.assertEqual(pool.stats()["published"], 2)
+
+
+class RelayOutboxTest(TestCase):
+    def setUp(self):
+        for i in range(3):
+            OutboxMessage.objects.create(
+                queue="test_queue", body=f"message {i}".encode()
+            )
+
+    def test_relay_publishes_in_order_and_deletes(self):
+        publisher = mock.Mock()
+        relayed = relay_batch(publisher, batch_size=2)
+
+        self.assertEqual(relayed, 2)
+        (messages,) = publisher.publish_batch.call_args.args
+        self.assertEqual(
+            [message[:2] for message in messages],
+            [(b"message 0", "test_queue"), (b"message 1", "test_queue")],
+        )
+        self.assertEqual(messages[-1][2].content_type, "application/json")
+        self.assertEqual(
+            [
+                bytes(body)
+                for body in OutboxMessage.objects.values_list("body", flat=True)
+            ],
+            [b"message 2"],
+        )
+
+    def test_relay_keeps_uncommitted_batch(self):
+        publisher = mock.Mock()
+        publisher.publish_batch.side_effect = pika.exceptions.StreamLostError("lost")
+
+        with self.assertRaises(pika.exceptions.StreamLostError):
+            relay_batch(publisher, batch_size=2)
+
+        self.assertEqual(
+            [
+                bytes(body)
+                for body in OutboxMessage.objects.order_by("id").values_list(
+                    "body", flat=True
+                )
+            ],
+            [b"message 0", b"message 1", b"message 2"],
+        )
+
+    @override_settings(OUTBOX_MAX_BACKOFF=1)
+    def test_relay_command_backs_off_on_broker_errors(self):
+        with mock.patch.object(
+            relay_outbox,
+            "relay_batch",
+            side_effect=[pika.exceptions.AMQPConnectionError("down"), 0],
+        ), mock.patch("time.sleep", side_effect=[None, KeyboardInterrupt]) as sleep:
+            with redirect_stdout(io.StringIO()), self.assertRaises(KeyboardInterrupt):
+                call_command("relay_outbox", interval=0.5)
+
+        # 실패 뒤에는 백오프만큼, 비어 있으면 폴링 간격만큼 기다립니다.
+        self.assertEqual([call.args[0] for call in sleep.call_args_list], [1, 0.5])
+
+
+class LedgerTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="owner", password="password")
+        self.other = User.objects.create_user(username="other", password="password")
+        self.account = Account.objects.create(user=self.user, balance=1000)
+
+    def test_credit_updates_balance_and_records_transaction(self):
+        result = credit(self.account.id, self.user, 500, "Test deposit")
+
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, 1500)
+        self.assertEqual(result["balance"], 1500)
+        entry = Transaction.objects.get()
+        self.assertEqual(entry.pk, result["transaction_id"])
+        self.assertEqual(entry.transaction_type, "deposit")
+        # 계좌 변경 이벤트가 이 명령의 마지막 이벤트입니다.
+        self.assertEqual(result["seq"], Event.objects.latest("id").id)
+
+    def test_credit_rejects_account_of_another_user(self):
+        with self.assertRaises(AccountNotOwned):
+            credit(self.account.id, self.other, 500, "Test deposit")
+
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, 1000)
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_debit_refuses_to_overdraw(self):
+        result = debit(self.account.id, self.user, 1000, "Test withdraw")
+        self.assertEqual(result["balance"], 0)
+
+        with self.assertRaises(InsufficientFunds):
+            debit(self.account.id, self.user, 1, "Test withdraw")
+        with self.assertRaises(AccountNotOwned):
+            debit(self.account.id, self.other, 1, "Test withdraw")
+
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, 0)
+        self.assertEqual(Transaction.objects.count(), 1)
+
+    def test_bulk_insert_assigns_ids_of_inserted_rows(self):
+        rows = [
+            Transaction(
+                account=self.account,
+                user=self.user,
+                amount=100 + i,
+                balance=1000,
+                transaction_type="deposit",
+                description=f"row {i}",
+            )
+            for i in range(3)
+        ]
+        events = Event.objects.count()
+
+        bulk_insert(rows)
+
+        for row in rows:
+            self.assertEqual(Transaction.objects.get(pk=row.pk).amount, row.amount)
+        # 이벤트는 호출한 쪽이 publish_bulk_created 로 기록하므로 시그널은 조용합니다.
+        self.assertEqual(Event.objects.count(), events)
+
+
+@override_settings(
+    CONTENTION_BUDGET_MS=50,
+    CONTENTION_BASE_DELAY_MS=1,
+    CONTENTION_MAX_DELAY_MS=5,
+    CONTENTION_BREAKER_THRESHOLD=2,
+    CONTENTION_BREAKER_COOLDOWN=60,
+)
+class RetryTest(SimpleTestCase):
+    def test_retries_until_success(self):
+        calls = mock.Mock(side_effect=[OperationalError, OperationalError, "ok"])
+        retries = snapshot().get("contention_retries", 0)
+
+        self.assertEqual(retry(OperationalError)(calls)(), "ok")
+        self.assertEqual(calls.call_count, 3)
+        self.assertEqual(snapshot()["contention_retries"], retries + 2)
+
+    def test_gives_up_after_budget_and_sheds_load(self):
+        calls = mock.Mock(side_effect=OperationalError)
+        wrapped = retry(OperationalError)(calls)
+
+        started = time.monotonic()
+        for _ in range(2):
+            with self.assertRaises(Throttled):
+                wrapped()
+        self.assertLess(time.monotonic() - started, 1)
+
+        # 회로가 열려 있으면 함수를 호출하지 않고 곧바로 거절합니다.
+        call_count = calls.call_count
+        with self.assertRaises(Throttled):
+            wrapped()
+        self.assertEqual(calls.call_count, call_count)
+
+
+class EventLogTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="owner", password="password")
+        self.account = Account.objects.create(user=self.user, balance=1000)
+
+    @override_settings(EVENT_SNAPSHOT_LAG=-60)
+    def test_snapshot_folds_latest_account_event(self):
+        credit(self.account.id, self.user, 500, "Test deposit")
+        debit(self.account.id, self.user, 200, "Test withdraw")
+
+        self.assertEqual(
+            list(
+                Event.objects.filter(account_id=self.account.id)
+                .order_by("id")
+                .values_list("model", flat=True)
+            ),
+            [
+                "banking.account",
+                "banking.transaction",
+                "banking.account",
+                "banking.transaction",
+                "banking.account",
+            ],
+        )
+        self.assertEqual(take_account_snapshots(), (1, 0))
+        snapshot = AccountSnapshot.objects.get(account_id=self.account.id)
+        self.assertEqual(snapshot.balance, 1300)
+        self.assertEqual(
+            snapshot.last_event_id,
+            Event.objects.filter(model="banking.account").latest("id").id,
+        )
+        # 새 이벤트가 없으면 아무것도 바꾸지 않습니다.
+        self.assertEqual(take_account_snapshots(), (0, 0))
+
+
+class CodecTest(SimpleTestCase):
+    def setUp(self):
+        self.message = {
+            "event": "created",
+            "app_label": "banking",
+            "model": "transaction",
+            "data": {
+                "id": 1,
+                "amount": 500,
+                "transaction_date": datetime(
+                    2024, 1, 2, 3, 4, 5, 6, tzinfo=timezone.utc
+                ),
+            },
+        }
+
+    def test_msgpack_envelope_round_trip(self):
+        payload = encode_payload(self.message, MSGPACK)
+        body = envelope(payload, MSGPACK, 42, 1700000000.5)
+
+        decoded = decode_message(body, MSGPACK)
+        self.assertEqual(decoded, {**self.message, "seq": 42, "ts": 1700000000.5})
+        self.assertLess(len(body), len(encode_payload(self.message, JSON)))
+
+    def test_json_envelope_round_trip(self):
+        payload = encode_payload(self.message, JSON)
+        decoded = decode_message(envelope(payload, JSON, 42, 1.5), JSON)
+
+        self.assertEqual(
+            decoded["data"]["transaction_date"], "2024-01-02T03:04:05.000006+00:00"
+        )
+        self.assertEqual((decoded["seq"], decoded["ts"]), (42, 1.5))
+
+
+class JumpHashTest(SimpleTestCase):
+    def test_growing_buckets_moves_few_keys(self):
+        before = [jump_hash(key, 8) for key in range(10000)]
+        after = [jump_hash(key, 9) for key in range(10000)]
+
+        self.assertTrue(all(0 <= bucket < 8 for bucket in before))
+        moved = [b for a, b in zip(before, after) if a != b]
+        # 옮겨 간 키는 모두 새 버킷으로만 가고, 약 1/9 입니다.
+        self.assertEqual(set(moved), {8})
+        self.assertLess(len(moved), 10000 * 2 / 9)
@@ -1,14 +1,40 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from .views import AccountViewSet, DepositViewSet, UserViewSet, WithdrawViewSet
+from . import async_views
+from .views import (
+    AccountSnapshotView,
+    AccountViewSet,
+    DepositViewSet,
+    EventLogView,
+    MetricsView,
+    SnapshotTransactionView,
+    TokenView,
+    TransactionBatchViewSet,
+    UserViewSet,
+    WithdrawViewSet,
+)
 
 router = DefaultRouter()
 router.register(r"users", UserViewSet, basename="user")
 router.register(r"accounts", AccountViewSet, basename="account")
 router.register(r"deposit", DepositViewSet, basename="deposit")
 router.register(r"withdraw", WithdrawViewSet, basename="withdraw")
+router.register(
+    r"transactions/batch", TransactionBatchViewSet, basename="transaction-batch"
+)
 
 urlpatterns = [
     path("", include(router.urls)),
+    path("async/deposit/", async_views.deposit, name="async-deposit"),
+    path("async/withdraw/", async_views.withdraw, name="async-withdraw"),
+    path("auth/token/", TokenView.as_view(), name="auth-token"),
+    path("metrics/", MetricsView.as_view(), name="metrics"),
+    path("events/", EventLogView.as_view(), name="events"),
+    path("snapshots/", AccountSnapshotView.as_view(), name="snapshots"),
+    path(
+        "snapshots/transactions/",
+        SnapshotTransactionView.as_view(),
+        name="snapshot-transactions",
+    ),
 ]
@@ -1,27 +1,111 @@
 import functools
+import random
+import threading
 import time
 
+from django.conf import settings
+from django.db import connection, transaction
+from rest_framework.exceptions import Throttled
 
-def retry(exceptions, tries=3, delay=1, backoff=2):
+from . import metrics
+
+
+def bulk_insert(instances):
+    """
+    행들을 넣고 생성된 id 를 채웁니다.
+    bulk_create 가 id 를 돌려주는 백엔드(PostgreSQL 등)에서는 한 번의 INSERT 로,
+    아니면(SQLite 등) 같은 트랜잭션 안에서 행마다 INSERT 해 id 를 추측하지 않습니다.
+    """
+    if not instances:
+        return instances
+    model = type(instances[0])
+    if connection.features.can_return_rows_from_bulk_insert:
+        return model.objects.bulk_create(instances)
+    with transaction.atomic():
+        for instance in instances:
+            # post_save 시그널이 같은 변경을 다시 기록하지 않도록 표시합니다.
+            instance._bulk_inserted = True
+            instance.save(force_insert=True)
+    return instances
+
+
+class CircuitBreaker:
+    """
+    예산 안에 끝나지 못한 요청이 연속 threshold 번 나오면 cooldown 초 동안
+    새 요청을 재시도 없이 곧바로 거절합니다. (부하 차단)
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._open_until = 0.0
+
+    def allow(self):
+        return time.monotonic() >= self._open_until
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._failures >= settings.CONTENTION_BREAKER_THRESHOLD:
+                self._failures = 0
+                self._open_until = (
+                    time.monotonic() + settings.CONTENTION_BREAKER_COOLDOWN
+                )
+
+
+def retry(exceptions):
     """
     SQLite는 데이터베이스 테이블이 잠겼을 때 바로 에러를 던지므로,
-    이 문제를 해결하기 위해 retry 데코레이터를 사용하여 잠금이 해제될 때까지
-    트랜잭션을 재시도합니다.
+    잠금 경합 오류를 밀리초 단위의 지터 백오프로 재시도합니다.
+
+    - 대기 시간은 [0, min(최대 대기, 기본 대기 * 2^n)] 에서 무작위로 고릅니다. (full jitter)
+    - 요청마다 CONTENTION_BUDGET_MS 예산을 넘기면 포기하고 429 를 돌려줍니다.
+    - 포기가 이어지면 회로가 열려 잠시 동안 요청을 곧바로 429 로 거절합니다.
+    - 재시도/포기/거절 횟수와 경합으로 쓴 시간은 metrics 에 기록됩니다.
     """
 
     def decorator_retry(func):
+        breaker = CircuitBreaker()
+
         @functools.wraps(func)
         def wrapper_retry(*args, **kwargs):
-            _tries, _delay = tries, delay
-            while _tries > 1:
+            if not breaker.allow():
+                metrics.incr("contention_shed")
+                raise Throttled(wait=settings.CONTENTION_BREAKER_COOLDOWN)
+
+            started = time.monotonic()
+            deadline = started + settings.CONTENTION_BUDGET_MS / 1000
+            attempt = 0
+            while True:
                 try:
-                    return func(*args, **kwargs)
-                except exceptions as e:
-                    print(f"{e}, Retrying in {_delay} seconds...")
-                    time.sleep(_delay)
-                    _tries -= 1
-                    _delay *= backoff
-            return func(*args, **kwargs)
+                    result = func(*args, **kwargs)
+                except exceptions:
+                    attempt += 1
+                    cap = min(
+                        settings.CONTENTION_MAX_DELAY_MS,
+                        settings.CONTENTION_BASE_DELAY_MS * 2**attempt,
+                    )
+                    delay = random.uniform(0, cap) / 1000
+                    if time.monotonic() + delay >= deadline:
+                        metrics.incr("contention_giveups")
+                        metrics.observe(
+                            "contention_wait_ms", (time.monotonic() - started) * 1000
+                        )
+                        breaker.record_failure()
+                        raise Throttled(wait=settings.CONTENTION_BREAKER_COOLDOWN)
+                    metrics.incr("contention_retries")
+                    time.sleep(delay)
+                else:
+                    if attempt:
+                        metrics.observe(
+                            "contention_wait_ms", (time.monotonic() - started) * 1000
+                        )
+                    breaker.record_success()
+                    return result
 
         return wrapper_retry
 
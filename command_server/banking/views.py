@@ -1,19 +1,95 @@
+import hmac
+
+from django.conf import settings
+from django.contrib.auth import authenticate
 from django.contrib.auth.models import User
-from django.db import OperationalError, transaction
+from django.db import OperationalError
+from django.http import HttpResponse
+from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
-from rest_framework import status, viewsets
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework import serializers, status, viewsets
+from rest_framework.exceptions import ParseError
+from rest_framework.permissions import (
+    AllowAny,
+    BasePermission,
+    IsAdminUser,
+    IsAuthenticated,
+)
 from rest_framework.response import Response
+from rest_framework.views import APIView
 
-from .models import Account, Transaction
+from . import metrics
+from .authentication import issue_token
+from .codec import serialize_instance, to_json
+from .idempotency import HEADER, idempotent
+from .ledger import (
+    AccountNotFound,
+    AccountNotOwned,
+    BalanceConflict,
+    InsufficientFunds,
+    credit,
+    debit,
+    post_batch,
+)
+from .models import Account, AccountSnapshot, Event, Transaction
+from .sequencer import post_sequenced
 from .serializers import (
     AccountSerializer,
+    BatchEntrySerializer,
     DepositSerializer,
+    TokenRequestSerializer,
+    TransactionBatchSerializer,
     UserSerializer,
     WithdrawSerializer,
 )
 from .utils import retry
 
+IDEMPOTENCY_KEY_PARAMETER = openapi.Parameter(
+    HEADER,
+    openapi.IN_HEADER,
+    description="Replays the stored response when the same key is sent again",
+    type=openapi.TYPE_STRING,
+)
+
+
+def account_not_found(account_id):
+    # 이전 PrimaryKeyRelatedField 와 같은 형식의 검증 오류입니다.
+    return Response(
+        {"account": [f'Invalid pk "{account_id}" - object does not exist.']},
+        status=status.HTTP_400_BAD_REQUEST,
+    )
+
+
+def consistency_token(positions):
+    """
+    조회 서버의 min_seq 로 넘길 "계좌:순번" 목록을 만듭니다.
+    계좌마다 파티션이 달라 반영 순서가 다르므로, 순번과 함께 계좌를 알려야
+    조회 서버가 그 계좌의 반영 여부를 확인할 수 있습니다.
+    """
+    positions = sorted((account, seq) for account, seq in positions.items() if seq)
+    return ",".join(f"{account}:{seq}" for account, seq in positions) or None
+
+
+def post_entry_for(user, validated_data, transaction_type):
+    """
+    입출금 한 건을 반영합니다. 순서기 모드에서는 계좌별 워커에 맡기고 결과를 기다립니다.
+    """
+    account_id = validated_data["account"]
+    if settings.ENABLE_SEQUENCER:
+        return post_sequenced(
+            user,
+            {
+                "account": account_id,
+                "amount": validated_data["amount"],
+                "transaction_type": transaction_type,
+                "description": validated_data["description"],
+            },
+        )
+    post = credit if transaction_type == "deposit" else debit
+    return post(
+        account_id, user, validated_data["amount"], validated_data["description"]
+    )
+
 
 class UserViewSet(viewsets.ModelViewSet):
     queryset = User.objects.all()
@@ -33,18 +109,25 @@ class DepositViewSet(viewsets.ViewSet):
     @swagger_auto_schema(
         operation_description="Deposit money into an account",
         request_body=DepositSerializer,
-        responses={201: "Deposit successful", 400: "Invalid input", 403: "Forbidden"},
+        responses={
+            201: "Deposit successful",
+            400: "Invalid input",
+            403: "Forbidden",
+            409: "Request with this key in progress",
+            422: "Key reused with a different request",
+            429: "Too much contention",
+        },
+        manual_parameters=[IDEMPOTENCY_KEY_PARAMETER],
     )
-    @retry(OperationalError, tries=5, delay=1, backoff=2)
+    @idempotent
+    @retry((OperationalError, BalanceConflict))
     def create(self, request):
         """
         입금 기능을 처리하는 메소드입니다.
 
         시간 복잡도 분석:
-        - 데이터 검증 (serializer.is_valid()): O(n)
-        - 데이터베이스 조회 (account 조회): O(1)
-        - 계좌 소유주 확인: O(1)
-        - 데이터베이스 업데이트 (account.save()): O(1)
+        - 데이터 검증 (serializer.is_valid(), 쿼리 없음): O(1)
+        - 잔액 증가 + 계좌 소유주 확인 (조건부 UPDATE 1회): O(1)
         - 트랜잭션 생성 (Transaction.objects.create()): O(1)
         - 응답 생성: O(1)
 
@@ -52,39 +135,27 @@ class DepositViewSet(viewsets.ViewSet):
         """
         serializer = DepositSerializer(data=request.data)
         if serializer.is_valid():
-            account = serializer.validated_data["account"]
-            # 계좌 소유주 확인
-            if account.user != request.user:
+            try:
+                result = post_entry_for(
+                    request.user, serializer.validated_data, "deposit"
+                )
+            except AccountNotFound as e:
+                return account_not_found(e.args[0])
+            except AccountNotOwned:
                 return Response(
                     {"error": "You do not own this account"},
                     status=status.HTTP_403_FORBIDDEN,
                 )
 
-            amount = serializer.validated_data["amount"]
-            description = serializer.validated_data["description"]
-
-            with transaction.atomic():
-                # 계좌 레코드 잠금 및 잔액 업데이트
-                account = (
-                    Account.objects.select_for_update()
-                    .only("id", "balance")
-                    .get(id=account.id)
-                )
-                account.balance += amount
-                account.save()  # 데이터베이스 업데이트 (O(1))
-
-                # 트랜잭션 생성
-                Transaction.objects.create(
-                    account=account,
-                    user=request.user,
-                    amount=amount,
-                    balance=account.balance,
-                    transaction_type="deposit",
-                    description=description,
-                )  # 트랜잭션 생성 (O(1))
-
+            # 조회 서버에 min_seq 로 넘기면 이 변경이 반영된 결과를 읽을 수 있습니다.
             return Response(
-                {"status": "deposit successful"}, status=status.HTTP_201_CREATED
+                {
+                    "status": "deposit successful",
+                    "consistency_token": consistency_token(
+                        {serializer.validated_data["account"]: result["seq"]}
+                    ),
+                },
+                status=status.HTTP_201_CREATED,
             )  # 응답 생성 (O(1))
 
         return Response(
@@ -98,19 +169,25 @@ class WithdrawViewSet(viewsets.ViewSet):
     @swagger_auto_schema(
         operation_description="Withdraw money from an account",
         request_body=WithdrawSerializer,
-        responses={201: "Withdraw successful", 400: "Invalid input", 403: "Forbidden"},
+        responses={
+            201: "Withdraw successful",
+            400: "Invalid input",
+            403: "Forbidden",
+            409: "Request with this key in progress",
+            422: "Key reused with a different request",
+            429: "Too much contention",
+        },
+        manual_parameters=[IDEMPOTENCY_KEY_PARAMETER],
     )
-    @retry(OperationalError, tries=5, delay=1, backoff=2)
+    @idempotent
+    @retry((OperationalError, BalanceConflict))
     def create(self, request):
         """
         출금 기능을 처리하는 메소드입니다.
 
         시간 복잡도 분석:
-        - 데이터 검증 (serializer.is_valid()): O(1)
-        - 데이터베이스 조회 (account 조회): O(1)
-        - 계좌 소유주 확인: O(1)
-        - 잔액 확인: O(1)
-        - 데이터베이스 업데이트 (account.save()): O(1)
+        - 데이터 검증 (serializer.is_valid(), 쿼리 없음): O(1)
+        - 잔액 차감 + 계좌 소유주/잔액 확인 (조건부 UPDATE 1회): O(1)
         - 트랜잭션 생성 (Transaction.objects.create()): O(1)
         - 응답 생성: O(1)
 
@@ -118,48 +195,264 @@ class WithdrawViewSet(viewsets.ViewSet):
         """
         serializer = WithdrawSerializer(data=request.data)
         if serializer.is_valid():
-            account = serializer.validated_data["account"]
-            # 계좌 소유주 확인
-            if account.user != request.user:
+            try:
+                result = post_entry_for(
+                    request.user, serializer.validated_data, "withdraw"
+                )
+            except AccountNotFound as e:
+                return account_not_found(e.args[0])
+            except AccountNotOwned:
                 return Response(
                     {"error": "You do not own this account"},
                     status=status.HTTP_403_FORBIDDEN,
                 )
-
-            amount = serializer.validated_data["amount"]
-            description = serializer.validated_data["description"]
-
-            with transaction.atomic():
-                # 잔액 확인 및 레코드 잠금
-                account = (
-                    Account.objects.select_for_update()
-                    .only("id", "balance")
-                    .get(id=account.id)
+            except InsufficientFunds:
+                return Response(
+                    {"error": "Insufficient funds"},
+                    status=status.HTTP_400_BAD_REQUEST,
                 )
-                if account.balance < amount:
-                    return Response(
-                        {"error": "Insufficient funds"},
-                        status=status.HTTP_400_BAD_REQUEST,
-                    )
-
-                # 계좌 잔액 업데이트
-                account.balance -= amount
-                account.save()  # 데이터베이스 업데이트 (O(1))
-
-                # 트랜잭션 생성
-                Transaction.objects.create(
-                    account=account,
-                    user=request.user,
-                    amount=amount,
-                    balance=account.balance,
-                    transaction_type="withdraw",
-                    description=description,
-                )  # 트랜잭션 생성 (O(1))
 
+            # 조회 서버에 min_seq 로 넘기면 이 변경이 반영된 결과를 읽을 수 있습니다.
             return Response(
-                {"status": "withdraw successful"}, status=status.HTTP_201_CREATED
+                {
+                    "status": "withdraw successful",
+                    "consistency_token": consistency_token(
+                        {serializer.validated_data["account"]: result["seq"]}
+                    ),
+                },
+                status=status.HTTP_201_CREATED,
             )  # 응답 생성 (O(1))
 
         return Response(
             serializer.errors, status=status.HTTP_400_BAD_REQUEST
         )  # 응답 생성 (O(1))
+
+
+class TransactionBatchViewSet(viewsets.ViewSet):
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_description="Submit many deposits/withdrawals in one request",
+        request_body=TransactionBatchSerializer,
+        responses={
+            201: "Per-entry results",
+            400: "Invalid input",
+            409: "Request with this key in progress",
+            422: "Key reused with a different request",
+            429: "Too much contention",
+        },
+        manual_parameters=[IDEMPOTENCY_KEY_PARAMETER],
+    )
+    @idempotent
+    @retry((OperationalError, BalanceConflict))
+    def create(self, request):
+        """
+        일괄 입출금 기능을 처리하는 메소드입니다.
+
+        시간 복잡도 분석 (n: 항목 수, a: 계좌 수):
+        - 항목 검증 (하나의 항목 시리얼라이저로 한 번 순회, DB 조회 없음): O(n)
+        - 계좌 소유주 확인 및 잠금 (쿼리 1회): O(a)
+        - 잔액 업데이트 (계좌마다 UPDATE 1회): O(a)
+        - 트랜잭션 생성 (bulk_create): O(n)
+        - 응답 생성: O(n)
+
+        전체 시간 복잡도: O(n)
+        """
+        serializer = TransactionBatchSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        items = serializer.validated_data["entries"]
+        entry_serializer = BatchEntrySerializer()
+        results = [None] * len(items)
+        valid_indexes, entries = [], []
+        for index, item in enumerate(items):
+            try:
+                entries.append(entry_serializer.run_validation(item))
+            except serializers.ValidationError as e:
+                results[index] = {"status": "invalid", "errors": e.detail}
+            else:
+                valid_indexes.append(index)
+
+        positions = {}
+        if entries:
+            posted = post_batch(request.user, entries)
+            for index, entry, result in zip(valid_indexes, entries, posted):
+                results[index] = result
+                if result.get("seq"):
+                    positions[entry["account"]] = result["seq"]
+
+        succeeded = sum(result["status"] == "ok" for result in results)
+        return Response(
+            {
+                "succeeded": succeeded,
+                "failed": len(results) - succeeded,
+                "consistency_token": consistency_token(positions),
+                "results": [
+                    {"index": index, **result} for index, result in enumerate(results)
+                ],
+            },
+            status=status.HTTP_201_CREATED,
+        )
+
+
+class TokenView(APIView):
+    """
+    아이디/비밀번호를 확인하고 서명 토큰을 발급합니다.
+    세션을 만들지 않고 login() 을 호출하지 않으므로 last_login 도 쓰지 않습니다.
+    """
+
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    @swagger_auto_schema(
+        operation_description="Issue a signed API token for both servers",
+        request_body=TokenRequestSerializer,
+        responses={200: "Token issued", 400: "Invalid credentials"},
+    )
+    def post(self, request):
+        serializer = TokenRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        user = authenticate(
+            request,
+            username=serializer.validated_data["username"],
+            password=serializer.validated_data["password"],
+        )
+        if user is None:
+            return Response(
+                {"error": "Invalid credentials"}, status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response(
+            {"token": issue_token(user), "expires_in": settings.AUTH_TOKEN_TTL}
+        )
+
+
+class MetricsView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(metrics.snapshot())
+
+
+class HasEventApiToken(BasePermission):
+    """
+    조회 서버가 프로젝션을 재구축할 때 쓰는 API 입니다.
+    Authorization: Bearer <EVENT_API_TOKEN> 헤더가 있어야 합니다.
+    """
+
+    def has_permission(self, request, view):
+        token = settings.EVENT_API_TOKEN
+        return bool(token) and hmac.compare_digest(
+            request.headers.get("Authorization", ""), f"Bearer {token}"
+        )
+
+
+def int_param(request, name, default=None):
+    value = request.query_params.get(name)
+    if value is None:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise ParseError(f"{name} must be an integer")
+
+
+def page_limit(request):
+    limit = min(
+        int_param(request, "limit", settings.EVENT_API_MAX_PAGE_SIZE),
+        settings.EVENT_API_MAX_PAGE_SIZE,
+    )
+    if limit < 1:
+        raise ParseError("limit must be at least 1")
+    return limit
+
+
+class EventLogView(APIView):
+    """
+    이벤트 로그를 id 순서로 after 다음부터 limit 건씩 돌려줍니다.
+    JSON 으로 저장된 본문은 다시 파싱하지 않고 그대로 이어 붙여 응답합니다.
+    """
+
+    authentication_classes = []
+    permission_classes = [HasEventApiToken]
+
+    def get(self, request):
+        after = int_param(request, "after", 0)
+        limit = page_limit(request)
+        user_id = int_param(request, "user")
+
+        events = Event.objects.filter(id__gt=after)
+        if user_id is not None:
+            events = events.filter(user_id=user_id)
+        rows = list(
+            events.order_by("id").values_list("id", "body", "content_type")[:limit]
+        )
+
+        next_after = rows[-1][0] if len(rows) == limit else None
+        body = ",".join(
+            f'{{"id":{event_id},"message":{to_json(message, content_type)}}}'
+            for event_id, message, content_type in rows
+        )
+        return HttpResponse(
+            f'{{"next":{"null" if next_after is None else next_after},'
+            f'"events":[{body}]}}',
+            content_type="application/json",
+        )
+
+
+class AccountSnapshotView(APIView):
+    """
+    계좌 스냅샷과 사용자 행을 돌려줍니다. 조회 서버 재구축은 이 상태에서 시작해
+    스냅샷 이후의 이벤트만 재생합니다.
+    """
+
+    authentication_classes = []
+    permission_classes = [HasEventApiToken]
+
+    def get(self, request):
+        snapshots = AccountSnapshot.objects.order_by("account_id")
+        users = User.objects.order_by("id")
+        user_id = int_param(request, "user")
+        if user_id is not None:
+            snapshots = snapshots.filter(user_id=user_id)
+            users = users.filter(id=user_id)
+        return Response(
+            {
+                "snapshots": list(
+                    snapshots.values(
+                        "account_id", "user_id", "balance", "last_event_id"
+                    )
+                ),
+                "users": [serialize_instance(user) for user in users],
+            }
+        )
+
+
+class SnapshotTransactionView(APIView):
+    """
+    스냅샷이 있는 계좌의 거래 행을 id 순서로 after 다음부터 limit 건씩 돌려줍니다.
+    거래는 추가만 되므로, 재구축은 이 행들로 거래내역과 집계를 채우고
+    그 이전의 거래 이벤트는 다시 읽지 않습니다.
+    """
+
+    authentication_classes = []
+    permission_classes = [HasEventApiToken]
+
+    def get(self, request):
+        after = int_param(request, "after", 0)
+        limit = page_limit(request)
+        user_id = int_param(request, "user")
+
+        transactions = Transaction.objects.filter(
+            id__gt=after,
+            account_id__in=AccountSnapshot.objects.values("account_id"),
+        )
+        if user_id is not None:
+            transactions = transactions.filter(user_id=user_id)
+        rows = list(transactions.order_by("id")[:limit])
+        return Response(
+            {
+                "next": rows[-1].id if len(rows) == limit else None,
+                "transactions": [serialize_instance(row) for row in rows],
+            }
+        )
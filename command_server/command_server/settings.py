@@ -43,18 +43,49 @@ INSTALLED_APPS = [
 
 REST_FRAMEWORK = {
     "DEFAULT_SCHEMA_CLASS": "rest_framework.schemas.coreapi.AutoSchema",
+    "DEFAULT_AUTHENTICATION_CLASSES": [
+        "banking.authentication.SignedTokenAuthentication",
+        "rest_framework.authentication.SessionAuthentication",
+        "rest_framework.authentication.BasicAuthentication",
+    ],
 }
 
-MIDDLEWARE = [
+# 서명 토큰 키(두 서버가 같아야 합니다)와 토큰 유효 시간(초)
+AUTH_TOKEN_SECRET = os.getenv("AUTH_TOKEN_SECRET", SECRET_KEY)
+AUTH_TOKEN_TTL = int(os.getenv("AUTH_TOKEN_TTL", "3600"))
+
+# 토큰 인증 사용자 정보의 프로세스 내 캐시 TTL(초)과 최대 항목 수
+AUTH_PRINCIPAL_CACHE_TTL = float(os.getenv("AUTH_PRINCIPAL_CACHE_TTL", "30"))
+AUTH_PRINCIPAL_CACHE_SIZE = int(os.getenv("AUTH_PRINCIPAL_CACHE_SIZE", "10000"))
+
+# 모든 경로에 적용하는 미들웨어
+API_MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
-    "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
+]
+
+# 브라우저용 미들웨어 (세션, CSRF, 로그인 사용자, 메시지, 클릭재킹 방지)
+BROWSER_MIDDLEWARE = [
+    "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
+# 미들웨어 프로필: full 은 모든 경로에 전체 스택을 적용하고, lean 은
+# BROWSER_PATHS/BROWSER_PATH_PREFIXES 이외의 API 경로에서 BROWSER_MIDDLEWARE 를 건너뜁니다.
+# lean 에서는 API 경로의 세션 인증이 꺼지므로 토큰(또는 Basic) 인증을 씁니다.
+API_MIDDLEWARE_PROFILE = os.getenv("API_MIDDLEWARE_PROFILE", "full")
+# DRF 브라우저블 API 루트는 정확히 일치할 때만, 나머지는 접두사로 비교합니다.
+BROWSER_PATHS = ["/"]
+BROWSER_PATH_PREFIXES = ["/admin/", "/swagger", "/redoc/"]
+
+if API_MIDDLEWARE_PROFILE == "lean":
+    MIDDLEWARE = API_MIDDLEWARE + ["banking.middleware.BrowserOnlyMiddleware"]
+else:
+    MIDDLEWARE = API_MIDDLEWARE + BROWSER_MIDDLEWARE
+
 ROOT_URLCONF = "command_server.urls"
 
 TEMPLATES = [
@@ -78,22 +109,91 @@ WSGI_APPLICATION = "command_server.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
+# SQLite 가 잠긴 DB 를 기다리는 시간(초). 길게 기다리지 않고 재시도 계층에 맡깁니다.
+SQLITE_BUSY_TIMEOUT = float(os.getenv("SQLITE_BUSY_TIMEOUT", "0.1"))
+
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
         "OPTIONS": {
-            "timeout": 20,
+            "timeout": SQLITE_BUSY_TIMEOUT,
         },
     }
 }
 
+# 잠금 경합 재시도: 요청당 예산(ms), 지터 백오프 기본/최대 대기(ms)
+CONTENTION_BUDGET_MS = int(os.getenv("CONTENTION_BUDGET_MS", "2000"))
+CONTENTION_BASE_DELAY_MS = int(os.getenv("CONTENTION_BASE_DELAY_MS", "5"))
+CONTENTION_MAX_DELAY_MS = int(os.getenv("CONTENTION_MAX_DELAY_MS", "200"))
+
+# 연속으로 예산을 넘긴 요청이 이만큼이면 쿨다운(초) 동안 요청을 곧바로 429 로 거절
+CONTENTION_BREAKER_THRESHOLD = int(os.getenv("CONTENTION_BREAKER_THRESHOLD", "5"))
+CONTENTION_BREAKER_COOLDOWN = float(os.getenv("CONTENTION_BREAKER_COOLDOWN", "1"))
+
 # RabbitMQ 설정
 RABBITMQ_HOST = os.getenv("RABBITMQ_HOST", "localhost")
 
+# 컨슈머가 처리하지 못한 메시지를 보낼 데드레터 교환기 (두 서버가 같아야 합니다)
+RABBITMQ_DEAD_LETTER_EXCHANGE = os.getenv(
+    "RABBITMQ_DEAD_LETTER_EXCHANGE", "banking_dead_letter"
+)
+
+# 워커 프로세스당 유지할 퍼블리셔 커넥션/채널 수와 채널 대기 시간(초)
+RABBITMQ_POOL_SIZE = int(os.getenv("RABBITMQ_POOL_SIZE", "4"))
+RABBITMQ_POOL_TIMEOUT = float(os.getenv("RABBITMQ_POOL_TIMEOUT", "5"))
+
+# 계좌/거래 이벤트를 나눌 파티션 큐 수 (조회 서버와 같은 값을 써야 합니다)
+# 값을 바꾸면 일부 계좌가 다른 큐로 옮겨 가므로, 큐가 빈 뒤에 바꿉니다.
+PROJECTION_PARTITIONS = int(os.getenv("PROJECTION_PARTITIONS", "4"))
+
 # 메시지 큐 전송 기능 활성화 여부를 환경 변수로 설정
 ENABLE_MQ = os.getenv("ENABLE_MQ", "true").lower() == "true"
 
+# 아웃박스 릴레이가 한 번에 발행할 메시지 수와 비어 있을 때 대기 시간(초)
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "100"))
+OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", "0.5"))
+
+# 브로커 오류 뒤 아웃박스 릴레이가 다시 시도하기까지 기다리는 최대 시간(초)
+OUTBOX_MAX_BACKOFF = float(os.getenv("OUTBOX_MAX_BACKOFF", "30"))
+
+# 일괄 생성 이벤트 하나에 담을 최대 행 수
+OUTBOX_BULK_CHUNK_SIZE = int(os.getenv("OUTBOX_BULK_CHUNK_SIZE", "500"))
+
+# 이벤트 본문 인코딩: msgpack (기본, 바이너리) 또는 json. msgpack 이 없으면 json 을 씁니다.
+EVENT_ENCODING = os.getenv("EVENT_ENCODING", "msgpack")
+
+# 순서기 모드: 입출금 명령을 계좌별 워커 스레드에 맡겨 그룹 커밋합니다.
+# 워커 수, 한 번에 커밋할 최대 명령 수, 결과 대기 시간(초)
+# SQLite 는 쓰기 작성자가 하나뿐이므로 워커를 1 로 두는 것이 좋습니다.
+ENABLE_SEQUENCER = os.getenv("ENABLE_SEQUENCER", "false").lower() == "true"
+SEQUENCER_WORKERS = int(os.getenv("SEQUENCER_WORKERS", "4"))
+SEQUENCER_MAX_BATCH = int(os.getenv("SEQUENCER_MAX_BATCH", "200"))
+SEQUENCER_TIMEOUT = float(os.getenv("SEQUENCER_TIMEOUT", "5"))
+
+# 비동기(ASGI) 입출금 엔드포인트가 DB 작업을 맡기는 스레드 수와 최대 대기 요청 수
+COMMAND_EXECUTOR_WORKERS = int(os.getenv("COMMAND_EXECUTOR_WORKERS", "16"))
+COMMAND_EXECUTOR_MAX_PENDING = int(os.getenv("COMMAND_EXECUTOR_MAX_PENDING", "4096"))
+
+# 이벤트 로그 기록 여부
+ENABLE_EVENT_LOG = os.getenv("ENABLE_EVENT_LOG", "true").lower() == "true"
+
+# 이벤트/스냅샷 API 토큰 (비어 있으면 API 를 닫습니다), 이벤트 API 한 페이지 최대 건수
+EVENT_API_TOKEN = os.getenv("EVENT_API_TOKEN", "")
+EVENT_API_MAX_PAGE_SIZE = int(os.getenv("EVENT_API_MAX_PAGE_SIZE", "10000"))
+
+# 커밋되지 않았을 수 있는 최근 이벤트를 스냅샷에서 제외할 시간(초)
+EVENT_SNAPSHOT_LAG = float(os.getenv("EVENT_SNAPSHOT_LAG", "5"))
+
+# Idempotency-Key 로 저장한 응답을 보관할 시간(초)
+IDEMPOTENCY_KEY_TTL = int(os.getenv("IDEMPOTENCY_KEY_TTL", "86400"))
+
+# 처리 중으로 남은 Idempotency-Key 를 다시 선점할 수 있게 되는 시간(초)
+IDEMPOTENCY_PENDING_TIMEOUT = int(os.getenv("IDEMPOTENCY_PENDING_TIMEOUT", "30"))
+
+# /transactions/batch/ 요청 하나에 담을 수 있는 최대 항목 수
+TRANSACTION_BATCH_MAX_SIZE = int(os.getenv("TRANSACTION_BATCH_MAX_SIZE", "10000"))
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
@@ -0,0 +1,140 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+
+from .codec import as_datetime
+from .models import Transaction, TransactionAggregate
+
+
+def aggregate_periods(transaction_date):
+    """
+    거래 일시가 속하는 (granularity, period) 목록입니다.
+    """
+    return [
+        ("day", transaction_date.date().isoformat()),
+        ("month", transaction_date.strftime("%Y-%m")),
+        ("all", ""),
+    ]
+
+
+def apply_deltas(deltas):
+    for (account_id, user_id, granularity, period, transaction_type), (
+        count,
+        amount,
+    ) in deltas.items():
+        key = {
+            "account_id": account_id,
+            "granularity": granularity,
+            "period": period,
+            "transaction_type": transaction_type,
+        }
+        updated = TransactionAggregate.objects.filter(**key).update(
+            count=F("count") + count, amount=F("amount") + amount
+        )
+        if not updated:
+            TransactionAggregate.objects.create(
+                **key, user_id=user_id, count=count, amount=amount
+            )
+
+
+def update_aggregates(messages):
+    """
+    메시지 묶음의 거래 생성/삭제를 집계 테이블에 증분 반영합니다.
+    재전달된 이벤트를 두 번 세지 않도록, 반영 전에 이미 있는 거래 id 를 한 번에 확인하고
+    묶음 안의 순서대로 존재 여부를 따라가며 변화량을 계산합니다.
+    이벤트 반영과 같은 트랜잭션 안에서, 이벤트를 반영하기 전에 호출해야 합니다.
+    """
+    events = [
+        (message["event"], message["data"])
+        for message in messages
+        if message["model"] == "transaction"
+        and message["event"] in ("created", "deleted")
+    ]
+    if not events:
+        return
+
+    present = set(
+        Transaction.objects.filter(
+            pk__in={data["id"] for _, data in events}
+        ).values_list("pk", flat=True)
+    )
+    deltas = defaultdict(lambda: [0, 0])
+    for event, data in events:
+        if event == "created" and data["id"] not in present:
+            present.add(data["id"])
+            sign = 1
+        elif event == "deleted" and data["id"] in present:
+            present.discard(data["id"])
+            sign = -1
+        else:
+            continue
+        for granularity, period in aggregate_periods(
+            as_datetime(data["transaction_date"])
+        ):
+            delta = deltas[
+                (
+                    data["account"],
+                    data["user"],
+                    granularity,
+                    period,
+                    data["transaction_type"],
+                )
+            ]
+            delta[0] += sign
+            delta[1] += sign * data["amount"]
+
+    apply_deltas(deltas)
+
+
+def rebuild_aggregates():
+    """
+    거래 테이블 전체에서 집계 테이블을 다시 만듭니다. (초기 적재/복구용)
+    """
+    daily = (
+        Transaction.objects.annotate(day=TruncDate("transaction_date"))
+        .values("account_id", "user_id", "transaction_type", "day")
+        .annotate(count=Count("id"), amount=Sum("amount"))
+    )
+    totals = defaultdict(lambda: [0, 0])
+    for row in daily.iterator():
+        for granularity, period in (
+            ("day", row["day"].isoformat()),
+            ("month", row["day"].strftime("%Y-%m")),
+            ("all", ""),
+        ):
+            total = totals[
+                (
+                    row["account_id"],
+                    row["user_id"],
+                    granularity,
+                    period,
+                    row["transaction_type"],
+                )
+            ]
+            total[0] += row["count"]
+            total[1] += row["amount"]
+
+    with transaction.atomic():
+        TransactionAggregate.objects.all().delete()
+        TransactionAggregate.objects.bulk_create(
+            [
+                TransactionAggregate(
+                    account_id=account_id,
+                    user_id=user_id,
+                    granularity=granularity,
+                    period=period,
+                    transaction_type=transaction_type,
+                    count=count,
+                    amount=amount,
+                )
+                for (
+                    account_id,
+                    user_id,
+                    granularity,
+                    period,
+                    transaction_type,
+                ), (count, amount) in totals.items()
+            ]
+        )
@@ -0,0 +1,228 @@
+import logging
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .caching import user_generation_key
+from .codec import as_datetime
+from .queries import seek, transaction_queryset
+
+logger = logging.getLogger(__name__)
+
+
+def anchor_key(user_id, account_id=None, transaction_type=None):
+    return (
+        f"transaction_anchors_{user_id}_{account_id or None}_{transaction_type or None}"
+    )
+
+
+def user_anchor_keys(data):
+    """
+    거래 한 건이 속하는 사용자 단위 앵커 범위(사용자 / 거래 유형)의 키입니다.
+    """
+    user_id = data.get("user")
+    return [
+        anchor_key(user_id),
+        anchor_key(user_id, None, data.get("transaction_type")),
+    ]
+
+
+def account_anchor_keys(data):
+    """
+    거래 한 건이 속하는 계좌 단위 앵커 범위(계좌 / 계좌+거래 유형)의 키입니다.
+    """
+    user_id, account_id = data.get("user"), data.get("account")
+    return [
+        anchor_key(user_id, account_id),
+        anchor_key(user_id, account_id, data.get("transaction_type")),
+    ]
+
+
+def transaction_anchor_keys(data):
+    return user_anchor_keys(data) + account_anchor_keys(data)
+
+
+def forget_user_anchors(user_id):
+    """
+    사용자의 모든 앵커 범위를 캐시에서 지웁니다. (프로젝션을 다시 만들기 전)
+    """
+    keys = {anchor_key(user_id)}
+    scopes = (
+        transaction_queryset(user_id)
+        .order_by()
+        .values_list("account_id", "transaction_type")
+        .distinct()
+    )
+    for account_id, transaction_type in scopes:
+        keys.update(
+            transaction_anchor_keys(
+                {
+                    "user": user_id,
+                    "account": account_id,
+                    "transaction_type": transaction_type,
+                }
+            )
+        )
+    cache.delete_many(list(keys))
+
+
+def build_anchors(queryset, interval):
+    """
+    오름차순으로 interval 번째 행마다 (transaction_date, id) 를 앵커로 기록합니다.
+    앵커 사이를 인덱스로 건너뛰므로 한 번에 읽는 행은 interval 개를 넘지 않습니다.
+    """
+    queryset = queryset.order_by("transaction_date", "id").values_list(
+        "transaction_date", "id"
+    )
+    anchors, position = [], None
+    while True:
+        block = queryset if position is None else seek(queryset, position)
+        row = list(block[interval - 1 : interval])
+        if not row:
+            break
+        position = row[0]
+        anchors.append(position)
+
+    tail = list(queryset if position is None else seek(queryset, position))
+    return {
+        "interval": interval,
+        "count": len(anchors) * interval + len(tail),
+        "last": tail[-1] if tail else position,
+        "anchors": anchors,
+    }
+
+
+def anchor_lock_key(user_id):
+    return f"transaction_anchors_lock_{user_id}"
+
+
+@contextmanager
+def anchor_lock(user_id, wait=True):
+    """
+    사용자의 앵커 범위들을 읽고 고쳐 쓰는 구간을 프로세스 사이에서 직렬화합니다.
+    웹 프로세스와 컨슈머 워커들이 같은 Redis 캐시의 cache.add 로 잡으므로 공유 캐시가 필요합니다.
+    잠금을 잡지 못하면 False 를 넘기며, 잡은 프로세스가 죽어도 timeout 뒤에 풀립니다.
+    """
+    lock = anchor_lock_key(user_id)
+    timeout = settings.PAGE_ANCHOR_LOCK_TIMEOUT
+    deadline = time.monotonic() + timeout
+    while not cache.add(lock, 1, timeout=timeout):
+        if not wait or time.monotonic() >= deadline:
+            yield False
+            return
+        time.sleep(0.005)
+    try:
+        yield True
+    finally:
+        cache.delete(lock)
+
+
+def store_anchors(user_id, key, state, generation):
+    """
+    빌드하는 동안 컨슈머가 이 사용자의 이벤트를 반영했다면(세대 번호가 바뀜)
+    빌드 결과가 그 반영을 놓쳤을 수 있으므로 저장하지 않고 버립니다.
+    """
+    with anchor_lock(user_id, wait=False) as locked:
+        if locked and cache.get(user_generation_key(user_id), 0) == generation:
+            cache.set(key, state, timeout=settings.PAGE_ANCHOR_TTL)
+
+
+def get_anchors(user_id, account_id=None, transaction_type=None):
+    key = anchor_key(user_id, account_id, transaction_type)
+    state = cache.get(key)
+    if state is None:
+        # 범위의 첫 page= 요청은 거래 수에 비례하는 빌드를 치르므로 느리면 남깁니다.
+        generation = cache.get(user_generation_key(user_id), 0)
+        started = time.monotonic()
+        state = build_anchors(
+            transaction_queryset(user_id, account_id, transaction_type),
+            settings.PAGE_ANCHOR_INTERVAL,
+        )
+        elapsed = time.monotonic() - started
+        if elapsed >= settings.PAGE_ANCHOR_SLOW_BUILD:
+            logger.warning(
+                "Built page anchors %s over %d rows in %.3fs",
+                key,
+                state["count"],
+                elapsed,
+            )
+        store_anchors(user_id, key, state, generation)
+    return state
+
+
+def ascending_slice(queryset, state, start, end):
+    if end <= start:
+        return []
+    interval = state["interval"]
+    block = min(start // interval, len(state["anchors"]))
+    queryset = queryset.order_by("transaction_date", "id")
+    if block:
+        queryset = seek(queryset, state["anchors"][block - 1])
+    skip = start - block * interval
+    return list(queryset[skip : skip + end - start])
+
+
+def page_rows(queryset, state, offset, limit, descending):
+    """
+    offset 위치의 페이지를 가장 가까운 앵커에서 키셋 탐색으로 읽습니다.
+    내림차순 페이지는 건수로 오름차순 위치를 계산해 읽은 뒤 뒤집습니다.
+    """
+    count = state["count"]
+    if not descending:
+        return ascending_slice(queryset, state, offset, min(offset + limit, count))
+    end = count - offset
+    rows = ascending_slice(queryset, state, max(end - limit, 0), end)
+    rows.reverse()
+    return rows
+
+
+def update_page_anchors(messages):
+    """
+    컨슈머가 반영한 거래 이벤트로 캐시된 앵커와 건수를 증분 갱신합니다.
+    캐시에 없는 범위는 조회할 때 만들어지므로 건드리지 않고,
+    끝에 추가되는 생성 이벤트가 아니면 해당 범위를 버려 다시 만들게 합니다.
+    여러 컨슈머 프로세스가 한 사용자의 계좌들을 나눠 반영해도 사용자 잠금 안에서
+    고쳐 쓰므로 사용자 단위 범위의 건수를 잃지 않습니다.
+    """
+    scoped = defaultdict(lambda: defaultdict(list))
+    for message in messages:
+        if message["model"] != "transaction":
+            continue
+        data = message["data"]
+        for key in transaction_anchor_keys(data):
+            scoped[data.get("user")][key].append((message["event"], data))
+
+    # 반영이 끝난 뒤(세대 번호를 올린 뒤) 사용자 잠금 안에서 고쳐 써야
+    # 동시에 빌드한 낡은 앵커가 이 갱신을 덮어쓰지 못합니다.
+    for user_id, scopes in scoped.items():
+        with anchor_lock(user_id) as locked:
+            if locked:
+                extend_anchors(scopes)
+            else:
+                cache.delete_many(list(scopes))
+
+
+def extend_anchors(scoped):
+    updated, stale = {}, []
+    for key, state in cache.get_many(list(scoped)).items():
+        for event, data in scoped[key]:
+            position = (as_datetime(data["transaction_date"]), data["id"])
+            if event != "created" or (
+                state["last"] is not None and position <= state["last"]
+            ):
+                stale.append(key)
+                break
+            state["count"] += 1
+            state["last"] = position
+            if state["count"] % state["interval"] == 0:
+                state["anchors"].append(position)
+        else:
+            updated[key] = state
+
+    if updated:
+        cache.set_many(updated, timeout=settings.PAGE_ANCHOR_TTL)
+    if stale:
+        cache.delete_many(stale)
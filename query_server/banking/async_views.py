@@ -0,0 +1,171 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+from django.http import JsonResponse
+from rest_framework.exceptions import AuthenticationFailed, ParseError
+
+from . import metrics
+from .authentication import SignedTokenAuthentication
+from .caching import transaction_cache_key
+from .consistency import applied_seq, parse_min_seq
+from .views import CachedPageResponse, TransactionViewSet
+
+
+class ExecutorSaturated(Exception):
+    pass
+
+
+class BoundedExecutor:
+    """
+    동기 캐시/ORM 호출을 고정된 수의 스레드에서 실행합니다.
+    기다리는 요청은 코루틴으로 쌓이고, 대기 작업이 max_pending 개를 넘으면 거절합니다.
+    fork 이후에는 풀을 새로 만듭니다.
+    """
+
+    def __init__(self, name, workers, max_pending):
+        self.name = name
+        self.workers = workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self._lock = threading.Lock()
+        self._pid = None
+        self._executor = None
+
+    def _get_executor(self):
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._executor = ThreadPoolExecutor(
+                        self.workers, thread_name_prefix=self.name
+                    )
+                    self._pid = os.getpid()
+        return self._executor
+
+    async def run(self, func, *args, **kwargs):
+        with self._lock:
+            if self.pending >= self.max_pending:
+                raise ExecutorSaturated()
+            self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self._get_executor(), lambda: run_with_connection(func, *args, **kwargs)
+            )
+        finally:
+            with self._lock:
+                self.pending -= 1
+
+
+def run_with_connection(func, *args, **kwargs):
+    """
+    풀 스레드는 요청 시작/종료 시그널을 받지 않으므로 DB 연결 정리를 직접 합니다.
+    """
+    close_old_connections()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+# 캐시 적중 경로(세션 확인 + 캐시 GET)는 짧으므로 넓은 풀에서,
+# 미스 때의 DB 조회와 직렬화는 좁은 풀에서 실행해 DB 가 느려도 적중 응답이 밀리지 않게 합니다.
+cache_executor = BoundedExecutor(
+    "query-cache",
+    settings.QUERY_CACHE_EXECUTOR_WORKERS,
+    settings.QUERY_EXECUTOR_MAX_PENDING,
+)
+db_executor = BoundedExecutor(
+    "query-db",
+    settings.QUERY_DB_EXECUTOR_WORKERS,
+    settings.QUERY_EXECUTOR_MAX_PENDING,
+)
+
+transaction_list = TransactionViewSet.as_view({"get": "list"})
+
+
+def request_user(request):
+    """
+    토큰 또는 세션으로 인증된 사용자입니다. 실패하면 None 을 돌려주고 오류 응답은 DRF 뷰에 맡깁니다.
+    """
+    try:
+        authenticated = SignedTokenAuthentication().authenticate(request)
+    except AuthenticationFailed:
+        return None
+    if authenticated is not None:
+        return authenticated[0]
+    # lean 미들웨어 프로필의 API 경로에는 세션 사용자가 없습니다.
+    user = getattr(request, "user", None)
+    return user if user is not None and user.is_authenticated else None
+
+
+def cached_transaction_page(request):
+    """
+    인증된 사용자의 캐시된 거래내역 페이지를 돌려줍니다.
+    인증 실패, 캐시 미스는 None 으로 DRF 뷰에 맡깁니다.
+    """
+    user = request_user(request)
+    if user is None:
+        return None
+    return cache.get(transaction_cache_key(user.id, request.GET))
+
+
+def render_transaction_list(request):
+    response = transaction_list(request)
+    response.render()
+    return response
+
+
+async def wait_for_projection(request):
+    """
+    min_seq 까지 반영되기를 이벤트 루프에서 기다립니다.
+    확인 쿼리만 풀 스레드에서 실행하고 확인 사이에는 스레드를 붙잡지 않습니다.
+    결과는 request.projection_seq 로 DRF 뷰에 넘기며, 잘못된 min_seq 와
+    인증 실패는 DRF 뷰가 응답하도록 그대로 둡니다.
+    """
+    try:
+        positions = parse_min_seq(request.GET)
+    except ParseError:
+        return
+    user = await cache_executor.run(request_user, request)
+    if user is None:
+        return
+    deadline = time.monotonic() + settings.CONSISTENCY_MAX_WAIT
+    while True:
+        seq, caught_up = await db_executor.run(applied_seq, user.id, positions)
+        if caught_up or time.monotonic() >= deadline:
+            break
+        await asyncio.sleep(settings.CONSISTENCY_POLL_INTERVAL)
+    request.projection_seq = (seq, caught_up)
+
+
+async def transactions(request):
+    """
+    거래내역 목록의 비동기 버전입니다. 응답 형식은 /banking/ 과 같습니다.
+    """
+    try:
+        if "min_seq" in request.GET:
+            # 커밋과 캐시 무효화 사이의 오래된 페이지를 피하려고 캐시를 거치지 않습니다.
+            await wait_for_projection(request)
+        else:
+            page = await cache_executor.run(cached_transaction_page, request)
+            if page is not None:
+                metrics.incr("transaction_page_cache_hits")
+                return CachedPageResponse(page)
+        # 미스: DRF 뷰가 다시 한 번 캐시를 확인한 뒤 DB 를 읽고 캐시를 채웁니다.
+        return await db_executor.run(render_transaction_list, request)
+    except ExecutorSaturated:
+        metrics.incr("executor_shed")
+        return JsonResponse(
+            {"detail": "Request was throttled."},
+            status=429,
+            headers={"Retry-After": "1"},
+        )
+
+
+transactions.csrf_exempt = True
@@ -0,0 +1,69 @@
+from datetime import date
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+def user_generation_key(user_id):
+    return f"transaction_gen_user_{user_id}"
+
+
+def account_generation_key(account_id):
+    return f"transaction_gen_account_{account_id}"
+
+
+# 페이지 응답을 결정하는 쿼리 파라미터 (캐시 키 구성 요소)
+PAGE_CACHE_PARAMS = (
+    "account_id",
+    "transaction_type",
+    "start_date",
+    "end_date",
+    "ordering",
+    "cursor",
+    "page",
+    "page_size",
+)
+
+
+def transaction_cache_key(user_id, params):
+    """
+    거래내역 페이지 캐시 키를 만듭니다.
+    키에 사용자(계좌 필터가 있으면 계좌)의 세대 번호를 넣어 두므로,
+    세대 번호만 올리면 해당 소유자의 이전 키들이 O(1) 로 모두 무효화됩니다.
+    """
+    account_id = params.get("account_id")
+    if account_id:
+        generation = cache.get(account_generation_key(account_id), 0)
+    else:
+        generation = cache.get(user_generation_key(user_id), 0)
+    values = "_".join(str(params.get(name)) for name in PAGE_CACHE_PARAMS)
+    return f"transaction_{user_id}_{generation}_{values}"
+
+
+def page_cache_timeout(params):
+    """
+    종료일이 이미 지난 기간의 페이지는 더 바뀌지 않으므로 더 오래 보관합니다.
+    """
+    end_date = params.get("end_date")
+    if end_date and end_date < date.today().isoformat():
+        return settings.TRANSACTION_HISTORY_CACHE_TTL
+    return settings.TRANSACTION_PAGE_CACHE_TTL
+
+
+def bump_generation(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        # 키가 없으면 만들고, 그 사이 다른 프로세스가 만들었다면 다시 증가시킵니다.
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+
+
+def invalidate_transactions(user_ids=(), account_ids=()):
+    """
+    변경된 사용자/계좌의 거래내역 캐시만 무효화합니다.
+    """
+    for user_id in user_ids:
+        bump_generation(user_generation_key(user_id))
+    for account_id in account_ids:
+        bump_generation(account_generation_key(account_id))
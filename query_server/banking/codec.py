@@ -0,0 +1,62 @@
+import json
+import struct
+from datetime import datetime
+
+from django.utils.dateparse import parse_datetime
+
+try:
+    import msgpack
+except ImportError:  # msgpack 이 없으면 JSON 메시지만 읽을 수 있습니다.
+    msgpack = None
+
+MSGPACK = "application/x-msgpack"
+JSON = "application/json"
+
+# 명령 서버 banking/codec.py 와 같은 봉투 헤더 = (스키마 버전, 이벤트 순번, 이벤트 시각)
+SCHEMA_VERSION = 1
+HEADER = struct.Struct(">Bqd")
+
+
+class DecodeError(ValueError):
+    """
+    읽을 수 없는 메시지 본문입니다. (잘린 본문, 모르는 content_type, 지원하지 않는 스키마 버전)
+    다시 받아도 읽을 수 없으므로 컨슈머는 재시도하지 않고 데드레터 큐로 보냅니다.
+    """
+
+
+def decode_message(body, content_type):
+    """
+    브로커 메시지 본문을 메시지 딕셔너리로 디코딩합니다.
+    content_type 이 없는 (인코딩 도입 이전의) 메시지는 JSON 으로 읽습니다.
+    """
+    if content_type in (None, JSON):
+        try:
+            message = json.loads(body)
+        except ValueError as e:
+            raise DecodeError(f"Malformed JSON message: {e}") from e
+    elif content_type == MSGPACK and msgpack is not None:
+        if len(body) < HEADER.size:
+            raise DecodeError(f"Message of {len(body)} bytes has no envelope header")
+        version, seq, ts = HEADER.unpack_from(body)
+        if version != SCHEMA_VERSION:
+            raise DecodeError(f"Unsupported event schema version {version}")
+        try:
+            message = msgpack.unpackb(body[HEADER.size :], timestamp=3)
+        except (ValueError, msgpack.exceptions.UnpackException) as e:
+            raise DecodeError(f"Malformed msgpack message: {e}") from e
+        if seq and isinstance(message, dict):
+            message["seq"], message["ts"] = seq, ts
+    else:
+        raise DecodeError(f"Unsupported content type {content_type}")
+    if not isinstance(message, dict):
+        raise DecodeError(f"Message is a {type(message).__name__}, not an object")
+    return message
+
+
+def as_datetime(value):
+    """
+    msgpack 메시지는 datetime 을, JSON 메시지와 이벤트 로그 API 는 ISO 8601 문자열을 담습니다.
+    """
+    if isinstance(value, datetime):
+        return value
+    return parse_datetime(value)
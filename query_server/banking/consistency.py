@@ -0,0 +1,86 @@
+import time
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+
+from . import metrics
+from .models import Account
+
+
+def parse_min_seq(params):
+    """
+    min_seq 를 {계좌 id: 순번} 으로 읽습니다.
+    명령 서버의 consistency_token("계좌:순번" 목록)을 그대로 받고,
+    순번만 넘길 때는 account_id 로 계좌를 함께 지정해야 합니다.
+    """
+    value = params.get("min_seq")
+    if not value:
+        return None
+    try:
+        if ":" not in value:
+            account_id = params.get("account_id")
+            if not account_id:
+                raise ParseError("min_seq without an account requires account_id")
+            return {int(account_id): int(value)}
+        positions = {}
+        for position in value.split(","):
+            account_id, seq = position.split(":")
+            positions[int(account_id)] = int(seq)
+        return positions
+    except ValueError:
+        raise ParseError("min_seq must be a consistency_token or an integer")
+
+
+def applied_seq(user_id, positions):
+    """
+    min_seq 의 계좌들에 반영된 순번 중 가장 작은 값과, 모든 계좌가 따라잡았는지를 돌려줍니다.
+    순번은 계좌마다 따로 비교하므로 다른 계좌가 앞서 있어도 따라잡은 것으로 보지 않습니다.
+    """
+    applied = dict(
+        Account.objects.filter(user_id=user_id, id__in=positions).values_list(
+            "id", "last_seq"
+        )
+    )
+    caught_up = all(
+        applied.get(account_id, 0) >= seq for account_id, seq in positions.items()
+    )
+    return min(applied.get(account_id, 0) for account_id in positions), caught_up
+
+
+def wait_for_seq(user_id, positions):
+    """
+    프로젝션이 min_seq 까지 반영될 때까지 최대 CONSISTENCY_MAX_WAIT 초 기다리고
+    applied_seq 의 결과를 돌려줍니다.
+    """
+    deadline = time.monotonic() + settings.CONSISTENCY_MAX_WAIT
+    while True:
+        seq, caught_up = applied_seq(user_id, positions)
+        if caught_up or time.monotonic() >= deadline:
+            return seq, caught_up
+        time.sleep(settings.CONSISTENCY_POLL_INTERVAL)
+
+
+class ReadYourWritesMixin:
+    """
+    min_seq(명령 서버 응답의 consistency_token) 가 있으면 프로젝션이 그 순번까지
+    반영될 때까지 잠시 기다린 뒤 응답합니다. 반영된 순번은 X-Projection-Seq 헤더로,
+    기다려도 따라잡지 못했으면 X-Projection-Stale 헤더로 알려 줍니다.
+
+    비동기 뷰가 이미 기다렸다면 그 결과(request.projection_seq)를 그대로 씁니다.
+    """
+
+    def list(self, request, *args, **kwargs):
+        positions = parse_min_seq(request.query_params)
+        if positions is None:
+            return super().list(request, *args, **kwargs)
+
+        applied = getattr(request, "projection_seq", None)
+        if applied is None:
+            applied = wait_for_seq(request.user.id, positions)
+        seq, caught_up = applied
+        response = super().list(request, *args, **kwargs)
+        response["X-Projection-Seq"] = str(seq)
+        if not caught_up:
+            metrics.incr("consistency_wait_timeouts")
+            response["X-Projection-Stale"] = "true"
+        return response
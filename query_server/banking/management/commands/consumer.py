@@ -1,84 +1,508 @@
-import json
+import multiprocessing
+import time
+from collections import OrderedDict, defaultdict
+from datetime import datetime, timezone
+from itertools import groupby
 
 import pika
+from banking.aggregates import update_aggregates
+from banking.anchors import update_page_anchors
+from banking.caching import invalidate_transactions
+from banking.codec import DecodeError, decode_message
+from banking.models import ProjectionCheckpoint
 from django.apps import apps
 from django.conf import settings
-from django.contrib.auth import get_user_model
-from django.core.cache import cache
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, connections, transaction
 
-User = get_user_model()
+USER_QUEUE = "auth_user_queue"
 
 
-def handle_message(message):
-    app_label = message["app_label"]
-    model_name = message["model"]
-    event = message["event"]
-    data = message["data"]
+def declare_queue(channel, queue):
+    """
+    큐와 그 데드레터 큐를 선언합니다. 컨슈머가 거절(nack, requeue=False)한 메시지는
+    데드레터 교환기를 거쳐 {queue}_dead 큐에 남으므로 확인한 뒤 다시 발행할 수 있습니다.
+    명령 서버와 조회 서버가 같은 인자로 선언해야 합니다.
+    """
+    exchange = settings.RABBITMQ_DEAD_LETTER_EXCHANGE
+    channel.exchange_declare(exchange=exchange, exchange_type="direct", durable=True)
+    channel.queue_declare(queue=f"{queue}_dead", durable=True)
+    channel.queue_bind(queue=f"{queue}_dead", exchange=exchange, routing_key=queue)
+    channel.queue_declare(queue=queue, arguments={"x-dead-letter-exchange": exchange})
 
-    model = apps.get_model(app_label, model_name)
 
-    # Redis 캐시 무효화
-    cache.delete_pattern(f"transaction*")
+def partition_queues(partitions):
+    """
+    명령 서버가 계좌 id 로 나눈 계좌/거래 이벤트 파티션 큐 이름입니다.
+    """
+    return [f"banking_partition_{partition}" for partition in range(partitions)]
 
-    if model_name == "account" and "user" in data:
-        data["user"] = User.objects.get(pk=data["user"])
 
-    if model_name == "transaction" and "account" in data:
-        from banking.models import Account
+def assign_queues(partitions, workers):
+    """
+    파티션 큐를 워커에 나눠 줍니다. 한 파티션은 한 워커만 소비하므로
+    계좌별 이벤트 순서가 유지됩니다. 사용자 큐는 첫 번째 워커가 맡습니다.
+    """
+    assignments = [[] for _ in range(workers)]
+    assignments[0].append(USER_QUEUE)
+    for partition, queue in enumerate(partition_queues(partitions)):
+        assignments[partition % workers].append(queue)
+    return assignments
 
-        data["account"] = Account.objects.get(pk=data["account"])
 
-    if model_name == "transaction" and "user" in data:
-        data["user"] = User.objects.get(pk=data["user"])
+_relation_fields = {}
 
+
+def relation_fields(model):
+    """
+    모델의 외래 키 필드 목록입니다. 메시지마다 _meta 를 훑지 않도록 한 번만 만듭니다.
+    """
+    fields = _relation_fields.get(model)
+    if fields is None:
+        fields = _relation_fields[model] = [
+            field for field in model._meta.concrete_fields if field.is_relation
+        ]
+    return fields
+
+
+def build_instance(model, data):
+    """
+    외래 키는 관련 객체를 조회하지 않고 *_id 컬럼에 id 를 그대로 씁니다.
+    """
+    data = dict(data)
+    for field in relation_fields(model):
+        if field.name in data:
+            data[field.attname] = data.pop(field.name)
+    return model(**data)
+
+
+class ForeignKeyGuard:
+    """
+    외래 키가 가리키는 행이 존재하는지 확인합니다.
+    확인된 id 는 모델별 LRU 에 maxsize 개까지 기억해 다시 조회하지 않습니다.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._known = defaultdict(OrderedDict)
+
+    def remember(self, model, ids):
+        known = self._known[model]
+        for pk in ids:
+            known[pk] = None
+            known.move_to_end(pk)
+        while len(known) > self.maxsize:
+            known.popitem(last=False)
+
+    def forget(self, model, ids):
+        known = self._known[model]
+        for pk in ids:
+            known.pop(pk, None)
+
+    def clear(self):
+        self._known.clear()
+
+    def missing(self, model, ids):
+        known = self._known[model]
+        unknown = set()
+        for pk in ids:
+            if pk in known:
+                known.move_to_end(pk)
+            else:
+                unknown.add(pk)
+        if unknown:
+            found = set(
+                model.objects.filter(pk__in=unknown).values_list("pk", flat=True)
+            )
+            self.remember(model, found)
+            unknown -= found
+        return unknown
+
+    def filter_messages(self, messages):
+        """
+        존재하지 않는 행을 참조하는 이벤트를 걸러냅니다.
+        같은 묶음에서 생성되는 행은 존재하는 것으로 보고, 나머지는 관련 모델마다
+        한 번의 쿼리로 확인합니다.
+        """
+        events = [
+            (apps.get_model(message["app_label"], message["model"]), message)
+            for message in messages
+        ]
+        created = defaultdict(set)
+        for model, message in events:
+            if message["event"] == "created":
+                created[model].add(message["data"]["id"])
+
+        referenced = defaultdict(set)
+        for model, message in events:
+            if message["event"] not in ("created", "updated"):
+                continue
+            for field in relation_fields(model):
+                value = message["data"].get(field.name)
+                if value:
+                    if value not in created[field.related_model]:
+                        referenced[field.related_model].add(value)
+        missing = {
+            related_model: self.missing(related_model, ids)
+            for related_model, ids in referenced.items()
+        }
+
+        kept = []
+        for model, message in events:
+            unknown = [
+                field.name
+                for field in relation_fields(model)
+                if message["event"] in ("created", "updated")
+                and message["data"].get(field.name)
+                in missing.get(field.related_model, ())
+            ]
+            if unknown:
+                print(f"Skipping {message} referencing missing {', '.join(unknown)}")
+                continue
+            kept.append(message)
+        return kept
+
+
+def apply_events(model, event, rows, guard=None):
+    """
+    같은 모델/이벤트의 연속 구간을 한 번의 벌크 쿼리로 반영합니다.
+    브로커는 최소 한 번(at-least-once) 전달하므로 생성 이벤트는 중복을 무시합니다.
+    guard 가 있으면 생성/삭제된 id 를 LRU 에 반영합니다.
+    """
     if event == "created":
-        model.objects.create(**data)
+        model.objects.bulk_create(
+            [build_instance(model, data) for data in rows], ignore_conflicts=True
+        )
+        if guard is not None:
+            guard.remember(model, [data["id"] for data in rows])
     elif event == "updated":
-        instance = model.objects.get(pk=data["id"])
-        for key, value in data.items():
-            if hasattr(instance, key):
-                setattr(instance, key, value)
-        instance.save()
+        # 같은 행이 여러 번 갱신되면 마지막 상태만 반영합니다.
+        instances = {}
+        field_names = set()
+        for data in rows:
+            field_names.update(data)
+            instance = build_instance(model, data)
+            instances[instance.pk] = instance
+        fields = [
+            field.name
+            for field in model._meta.concrete_fields
+            if not field.primary_key and field.name in field_names
+        ]
+        model.objects.bulk_update(instances.values(), fields)
     elif event == "deleted":
-        model.objects.filter(pk=data["id"]).delete()
+        ids = [data["id"] for data in rows]
+        model.objects.filter(pk__in=ids).delete()
+        if guard is not None:
+            guard.forget(model, ids)
+
+
+def expand_messages(messages):
+    """
+    일괄 생성(bulk_created) 이벤트를 행 단위 created 이벤트로 펼칩니다.
+    """
+    for message in messages:
+        if message["event"] == "bulk_created":
+            for data in message["data"]:
+                yield {**message, "event": "created", "data": data}
+        else:
+            yield message
+
+
+def event_data(message):
+    """
+    계좌 이벤트는 이벤트 순번을 last_seq 로 함께 반영합니다.
+    """
+    if message["model"] == "account" and "seq" in message:
+        return {**message["data"], "last_seq": message["seq"]}
+    return message["data"]
+
+
+def record_checkpoints(deliveries):
+    """
+    (큐 이름, 메시지) 목록에서 큐별 마지막 순번과 이벤트 시각을 기록합니다.
+    """
+    positions = {}
+    for queue, message in deliveries:
+        if "seq" in message:
+            positions[queue] = max(
+                positions.get(queue, (0, 0)), (message["seq"], message["ts"])
+            )
+    for queue, (seq, ts) in positions.items():
+        ProjectionCheckpoint.objects.update_or_create(
+            queue=queue,
+            defaults={
+                "last_seq": seq,
+                "last_event_at": datetime.fromtimestamp(ts, timezone.utc),
+            },
+        )
+
+
+def retry_key(queue, message):
+    """
+    재전달된 같은 메시지를 알아보기 위한 키입니다. 순번이 있으면 순번을 씁니다.
+    """
+    if "seq" in message:
+        return queue, message["seq"]
+    return queue, message["model"], message["event"], repr(message["data"])
+
+
+def affected_owners(messages):
+    """
+    거래내역 캐시에 영향을 주는 사용자/계좌 id 를 모읍니다.
+    계좌·사용자 갱신은 거래내역 목록을 바꾸지 않으므로 삭제일 때만 포함합니다.
+    """
+    user_ids, account_ids = set(), set()
+    for message in messages:
+        model_name, data = message["model"], message["data"]
+        if model_name == "transaction":
+            user_ids.add(data.get("user"))
+            account_ids.add(data.get("account"))
+        elif message["event"] == "deleted":
+            if model_name == "account":
+                user_ids.add(data.get("user"))
+                account_ids.add(data["id"])
+            elif model_name == "user":
+                user_ids.add(data["id"])
+    user_ids.discard(None)
+    account_ids.discard(None)
+    return user_ids, account_ids
+
+
+def handle_batch(messages, guard=None):
+    """
+    메시지 묶음을 하나의 DB 트랜잭션으로 반영합니다.
+    메시지 순서를 유지한 채 같은 모델/이벤트가 이어지는 구간끼리 묶어 처리합니다.
+    """
+    messages = list(expand_messages(messages))
+    if guard is not None:
+        messages = guard.filter_messages(messages)
+
+    with transaction.atomic():
+        # 집계는 이벤트 반영 전의 존재 여부를 기준으로 계산합니다.
+        update_aggregates(messages)
+        for (app_label, model_name, event), run in groupby(
+            messages,
+            key=lambda message: (
+                message["app_label"],
+                message["model"],
+                message["event"],
+            ),
+        ):
+            model = apps.get_model(app_label, model_name)
+            apply_events(model, event, [event_data(message) for message in run], guard)
+
+    # 영향을 받은 소유자의 캐시만 무효화 (커밋 이후에 한 번만)
+    invalidate_transactions(*affected_owners(messages))
+    update_page_anchors(messages)
+
+
+def handle_message(message, guard=None):
+    handle_batch([message], guard)
 
 
 class Command(BaseCommand):
     help = "Run RabbitMQ consumer"
 
-    def handle(self, *args, **options):
-        connection = pika.BlockingConnection(
-            pika.ConnectionParameters(settings.RABBITMQ_HOST)
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--prefetch",
+            type=int,
+            default=settings.CONSUMER_PREFETCH,
+            help="Maximum number of unacknowledged messages (basic_qos)",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=settings.CONSUMER_BATCH_SIZE,
+            help="Flush a batch once this many messages are pending",
+        )
+        parser.add_argument(
+            "--batch-window",
+            type=float,
+            default=settings.CONSUMER_BATCH_WINDOW,
+            help="Flush a batch at least every this many seconds",
+        )
+        parser.add_argument(
+            "--verify-fks",
+            action="store_true",
+            help="Skip events whose foreign keys point at unknown rows",
+        )
+        parser.add_argument(
+            "--known-ids-size",
+            type=int,
+            default=settings.CONSUMER_KNOWN_IDS_SIZE,
+            help="Number of verified ids remembered per model (LRU)",
+        )
+        parser.add_argument(
+            "--partitions",
+            type=int,
+            default=settings.PROJECTION_PARTITIONS,
+            help="Number of account partition queues (must match the command server)",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Number of consumer processes; each partition goes to one worker",
+        )
+        parser.add_argument(
+            "--reset-queues",
+            action="store_true",
+            help="Delete and re-declare the queues before consuming",
         )
-        channel = connection.channel()
 
-        queues = [
-            "auth_user_queue",
-            "banking_account_queue",
-            "banking_transaction_queue",
+    def handle(self, *args, **options):
+        if options["workers"] < 1:
+            raise CommandError("--workers must be at least 1")
+        if options["partitions"] < 1:
+            raise CommandError("--partitions must be at least 1")
+        workers = min(options["workers"], options["partitions"])
+        assignments = assign_queues(options["partitions"], workers)
+        if workers == 1:
+            consume(assignments[0], options)
+            return
+
+        # 자식 프로세스가 부모의 DB 커넥션을 공유하지 않도록 닫고 fork 합니다.
+        connections.close_all()
+        context = multiprocessing.get_context("fork")
+        processes = [
+            context.Process(
+                target=consume,
+                args=(queues, options),
+                name=f"consumer-{index}",
+            )
+            for index, queues in enumerate(assignments)
         ]
+        for process in processes:
+            process.start()
+        try:
+            for process in processes:
+                process.join()
+        except KeyboardInterrupt:
+            for process in processes:
+                process.terminate()
+
+
+class DeliveryBatch:
+    """
+    받은 메시지를 모았다가 한 트랜잭션으로 반영하고 확인(ack)합니다.
+    묶음이 실패하면 한 건씩 반영하며, 실패한 메시지는 데드레터 큐로 보냅니다.
+    """
+
+    def __init__(self, channel, guard=None):
+        self.channel = channel
+        self.guard = guard
+        self.pending = []
+        # 외래 키 위반으로 큐에 되돌린 메시지별 재시도 횟수
+        self.fk_attempts = {}
+
+    def add(self, delivery_tag, queue, message):
+        self.pending.append((delivery_tag, queue, message))
+
+    def receive(self, channel, method, properties, body):
+        """
+        basic_consume 콜백입니다. 읽을 수 없는 본문은 묶음에 넣지 않고 바로 데드레터 큐로 보내,
+        메시지 하나 때문에 워커가 죽고 재전달된 같은 메시지로 다시 죽는 일을 막습니다.
+        """
+        try:
+            message = decode_message(body, properties.content_type)
+        except DecodeError as e:
+            self.dead_letter(method.delivery_tag, body[:64], e)
+            return
+        self.add(method.delivery_tag, method.routing_key, message)
+
+    def flush(self):
+        if not self.pending:
+            return
+        try:
+            handle_batch([message for _, _, message in self.pending], self.guard)
+        except Exception as e:
+            if self.guard is not None:
+                # 롤백된 배치에서 기억한 id 는 믿을 수 없습니다.
+                self.guard.clear()
+            print(f"Batch of {len(self.pending)} failed ({e}), applying one by one")
+            self.flush_one_by_one()
+        else:
+            record_checkpoints([(queue, message) for _, queue, message in self.pending])
+            # 커밋이 끝난 뒤 마지막 delivery tag 까지 한 번에 확인합니다.
+            self.channel.basic_ack(delivery_tag=self.pending[-1][0], multiple=True)
+        self.pending.clear()
 
-        # Declare queues with the desired properties
-        for queue in queues:
+    def flush_one_by_one(self):
+        for delivery_tag, queue, message in self.pending:
+            key = retry_key(queue, message)
             try:
+                handle_message(message, self.guard)
+            except IntegrityError as e:
+                # 다른 워커가 아직 반영하지 않은 사용자 행을 참조하는 경우입니다.
+                # 이 메시지와 뒤의 메시지를 순서 그대로 큐에 되돌리고 잠시 뒤 다시 받습니다.
+                attempts = self.fk_attempts.get(key, 0) + 1
+                if attempts <= settings.CONSUMER_FK_RETRIES:
+                    self.fk_attempts[key] = attempts
+                    print(f"Requeueing message {message} (attempt {attempts}): {e}")
+                    self.channel.basic_nack(
+                        delivery_tag=self.pending[-1][0], multiple=True, requeue=True
+                    )
+                    # connection.sleep 은 기다리는 동안에도 하트비트를 처리합니다.
+                    self.channel.connection.sleep(
+                        settings.CONSUMER_FK_RETRY_DELAY * attempts
+                    )
+                    return
+                self.fk_attempts.pop(key, None)
+                self.dead_letter(delivery_tag, message, e)
+            except Exception as e:
+                self.dead_letter(delivery_tag, message, e)
+            else:
+                self.fk_attempts.pop(key, None)
+                record_checkpoints([(queue, message)])
+                self.channel.basic_ack(delivery_tag=delivery_tag)
+
+    def dead_letter(self, delivery_tag, message, error):
+        print(f"Dead-lettering message {message}: {error}")
+        self.channel.basic_nack(delivery_tag=delivery_tag, requeue=False)
+
+
+def consume(queues, options):
+    """
+    주어진 큐들을 하나의 채널로 소비하며 메시지를 묶음 단위로 반영합니다.
+    """
+    batch_size = options["batch_size"]
+    batch_window = options["batch_window"]
+    guard = (
+        ForeignKeyGuard(options["known_ids_size"]) if options["verify_fks"] else None
+    )
+
+    connection = pika.BlockingConnection(
+        pika.ConnectionParameters(settings.RABBITMQ_HOST)
+    )
+    channel = connection.channel()
+
+    # Declare queues with the desired properties
+    for queue in queues:
+        try:
+            if options["reset_queues"]:
                 channel.queue_delete(queue=queue)  # 기존 큐 삭제
-                channel.queue_declare(queue=queue)  # 새로운 큐 선언
-            except pika.exceptions.ChannelClosedByBroker as e:
-                print(f"Error declaring queue {queue}: {e}")
-                connection = pika.BlockingConnection(
-                    pika.ConnectionParameters(settings.RABBITMQ_HOST)
-                )
-                channel = connection.channel()
-
-        def callback(ch, method, properties, body):
-            message = json.loads(body)
-            handle_message(message)
-
-        for queue in queues:
-            channel.basic_consume(
-                queue=queue, on_message_callback=callback, auto_ack=True
+            declare_queue(channel, queue)  # 새로운 큐 선언
+        except pika.exceptions.ChannelClosedByBroker as e:
+            print(f"Error declaring queue {queue}: {e}")
+            connection = pika.BlockingConnection(
+                pika.ConnectionParameters(settings.RABBITMQ_HOST)
             )
+            channel = connection.channel()
+
+    # 확인(ack) 전에 받아 둘 수 있는 메시지 수를 제한합니다.
+    channel.basic_qos(prefetch_count=options["prefetch"])
+
+    batch = DeliveryBatch(channel, guard)
+    for queue in queues:
+        channel.basic_consume(queue=queue, on_message_callback=batch.receive)
 
-        print("Waiting for messages. To exit press CTRL+C")
-        channel.start_consuming()
+    print(f"Waiting for messages on {', '.join(queues)}. To exit press CTRL+C")
+    while True:
+        deadline = time.monotonic() + batch_window
+        while len(batch.pending) < batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            connection.process_data_events(time_limit=remaining)
+        batch.flush()
@@ -0,0 +1,54 @@
+from datetime import date, timedelta
+from itertools import product
+
+from banking.models import Account
+from banking.queries import transaction_queryset
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = "Print EXPLAIN plans for every transaction list filter combination"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", type=int, required=True, help="User ID")
+        parser.add_argument(
+            "--account", type=int, help="Account ID (defaults to the user's first)"
+        )
+        parser.add_argument(
+            "--transaction-type", default="deposit", choices=["deposit", "withdraw"]
+        )
+        parser.add_argument(
+            "--start-date", default=(date.today() - timedelta(days=30)).isoformat()
+        )
+        parser.add_argument("--end-date", default=date.today().isoformat())
+        parser.add_argument("--page-size", type=int, default=10)
+
+    def handle(self, *args, **options):
+        user_id = options["user"]
+        account_id = options["account"] or (
+            Account.objects.filter(user_id=user_id).values_list("id", flat=True).first()
+        )
+        if account_id is None:
+            raise CommandError(f"User {user_id} has no accounts")
+
+        # 뷰가 지원하는 필터 조합 (계좌, 거래 유형, 날짜 범위) x 정렬 방향
+        for use_account, use_type, use_dates, ordering in product(
+            (False, True),
+            (False, True),
+            (False, True),
+            ("transaction_date", "-transaction_date"),
+        ):
+            queryset = transaction_queryset(
+                user_id,
+                account_id=account_id if use_account else None,
+                transaction_type=options["transaction_type"] if use_type else None,
+                start_date=options["start_date"] if use_dates else None,
+                end_date=options["end_date"] if use_dates else None,
+                ordering=ordering,
+            )
+            print(
+                f"account_id={use_account} transaction_type={use_type} "
+                f"date_range={use_dates} ordering={ordering}"
+            )
+            print(queryset[: options["page_size"]].explain())
+            print()
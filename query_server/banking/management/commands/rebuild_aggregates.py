@@ -0,0 +1,10 @@
+from banking.aggregates import rebuild_aggregates
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = "Recompute the transaction aggregates table from the transactions"
+
+    def handle(self, *args, **options):
+        rebuild_aggregates()
+        print("Transaction aggregates rebuilt")
@@ -0,0 +1,149 @@
+import json
+from urllib.parse import urlencode
+from urllib.request import Request, urlopen
+
+from banking.anchors import forget_user_anchors
+from banking.caching import invalidate_transactions
+from banking.management.commands.consumer import handle_batch
+from banking.models import Account
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+
+
+def fetch(source, path, token, **params):
+    url = f"{source.rstrip('/')}/{path}?{urlencode(params)}"
+    request = Request(url, headers={"Authorization": f"Bearer {token}"})
+    with urlopen(request, timeout=60) as response:
+        return json.load(response)
+
+
+def apply_snapshot(snapshots, event_id, message):
+    """
+    스냅샷에 이미 반영된 계좌 이벤트는 건너뜁니다. 스냅샷 계좌는 재생 전에 채워 둡니다.
+    """
+    if message["model"] != "account":
+        return message
+    snapshot = snapshots.get(message["data"]["id"])
+    if snapshot is not None and event_id <= snapshot["last_event_id"]:
+        return None
+    return message
+
+
+def created(app_label, model, data):
+    return {"event": "created", "app_label": app_label, "model": model, "data": data}
+
+
+def seed_messages(payload):
+    """
+    스냅샷 응답으로 사용자와 계좌를 채우는 메시지입니다.
+    이미 있는 사용자 행은 같은 묶음의 updated 로 스냅샷 시점 상태로 덮어씁니다.
+    계좌의 last_seq 는 스냅샷에 반영된 마지막 이벤트입니다.
+    """
+    messages = [created("auth", "user", data) for data in payload["users"]]
+    messages += [{**message, "event": "updated"} for message in messages]
+    messages += [
+        {
+            **created(
+                "banking",
+                "account",
+                {
+                    "id": snapshot["account_id"],
+                    "user": snapshot["user_id"],
+                    "balance": snapshot["balance"],
+                },
+            ),
+            "seq": snapshot["last_event_id"],
+        }
+        for snapshot in payload["snapshots"]
+    ]
+    return messages
+
+
+class Command(BaseCommand):
+    help = "Rebuild the read model from the command server's snapshots and event log"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", type=int, help="Rebuild a single user only")
+        parser.add_argument("--source", default=settings.COMMAND_SERVER_URL)
+        parser.add_argument("--token", default=settings.EVENT_API_TOKEN)
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=settings.REBUILD_CHUNK_SIZE,
+            help="Number of rows or events fetched and applied per batch",
+        )
+
+    def handle(self, *args, **options):
+        user_id = options["user"]
+        params = {} if user_id is None else {"user": user_id}
+        source, token = options["source"], options["token"]
+
+        # 기존 계좌(거래내역, 집계 포함)를 지웁니다. 사용자 행은 스냅샷으로 덮어씁니다.
+        if user_id is None:
+            Account.objects.all().delete()
+            cache.clear()
+        else:
+            forget_user_anchors(user_id)
+            accounts = Account.objects.filter(user_id=user_id)
+            account_ids = list(accounts.values_list("id", flat=True))
+            accounts.delete()
+            invalidate_transactions([user_id], account_ids)
+
+        payload = fetch(source, "snapshots/", token, **params)
+        snapshots = {
+            snapshot["account_id"]: snapshot for snapshot in payload["snapshots"]
+        }
+        handle_batch(seed_messages(payload))
+        print(f"Loaded {len(snapshots)} account snapshots")
+
+        # 스냅샷 계좌의 거래내역과 집계는 이벤트 대신 거래 행으로 채웁니다.
+        after, seeded = 0, 0
+        while after is not None:
+            page = fetch(
+                source,
+                "snapshots/transactions/",
+                token,
+                after=after,
+                limit=options["chunk_size"],
+                **params,
+            )
+            handle_batch(
+                [
+                    created("banking", "transaction", data)
+                    for data in page["transactions"]
+                ]
+            )
+            seeded += len(page["transactions"])
+            after = page["next"]
+            print(f"Seeded {seeded} transactions")
+
+        # 스냅샷이 반영한 마지막 이벤트 이후(꼬리)만 재생합니다.
+        # 이미 채운 거래가 다시 오면 생성 이벤트의 중복 무시로 한 번만 반영됩니다.
+        after = max(
+            (snapshot["last_event_id"] for snapshot in snapshots.values()), default=0
+        )
+        replayed = 0
+        while after is not None:
+            page = fetch(
+                source,
+                "events/",
+                token,
+                after=after,
+                limit=options["chunk_size"],
+                **params,
+            )
+            messages = [
+                message
+                for message in (
+                    apply_snapshot(
+                        snapshots, event["id"], {**event["message"], "seq": event["id"]}
+                    )
+                    for event in page["events"]
+                )
+                if message is not None
+            ]
+            handle_batch(messages)
+            replayed += len(page["events"])
+            after = page["next"]
+            print(f"Replayed {replayed} events")
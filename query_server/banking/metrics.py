@@ -0,0 +1,16 @@
+import threading
+from collections import Counter
+
+# 프로세스 단위 카운터 (캐시 적중/실패 등)
+_lock = threading.Lock()
+_counters = Counter()
+
+
+def incr(name, value=1):
+    with _lock:
+        _counters[name] += value
+
+
+def snapshot():
+    with _lock:
+        return dict(_counters)
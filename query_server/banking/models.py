@@ -4,6 +4,8 @@ from django.db import models
 
 class Account(models.Model):
     balance = models.PositiveBigIntegerField(default=0)
+    # 이 계좌에 마지막으로 반영한 명령 서버 이벤트 순번 (읽기 일관성 확인용)
+    last_seq = models.BigIntegerField(default=0)
 
     user = models.ForeignKey(User, on_delete=models.CASCADE)
 
@@ -24,8 +26,62 @@ class Transaction(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
 
     class Meta:
+        # 모든 목록 조회는 사용자 범위에서 시작하고 (transaction_date, id) 순으로 정렬되므로
+        # 비정규화된 user 를 선두 컬럼으로 둔 복합 인덱스로 조인/정렬 없이 범위 스캔합니다.
         indexes = [
-            models.Index(fields=["transaction_date"]),
-            models.Index(fields=["transaction_type"]),
-            models.Index(fields=["transaction_date", "transaction_type"]),
+            models.Index(
+                fields=["user", "account", "transaction_date", "id"],
+                name="txn_user_account_date_idx",
+            ),
+            models.Index(
+                fields=["user", "transaction_type", "transaction_date", "id"],
+                name="txn_user_type_date_idx",
+            ),
         ]
+
+
+class TransactionAggregate(models.Model):
+    """
+    계좌/기간/거래 유형별 거래 건수와 금액 합계입니다.
+    컨슈머가 이벤트를 반영할 때 증분으로 갱신하므로 조회는 O(1) 입니다.
+    """
+
+    GRANULARITIES = [
+        ("day", "Day"),
+        ("month", "Month"),
+        ("all", "All"),
+    ]
+
+    granularity = models.CharField(max_length=5, choices=GRANULARITIES)
+    period = models.CharField(max_length=10)  # "2024-06-01", "2024-06", "" (전체)
+    transaction_type = models.CharField(max_length=10)
+    count = models.BigIntegerField(default=0)
+    amount = models.BigIntegerField(default=0)
+
+    account = models.ForeignKey(Account, on_delete=models.CASCADE)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["account", "granularity", "period", "transaction_type"],
+                name="txn_aggregate_unique",
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=["user", "granularity", "period"],
+                name="txn_aggregate_user_idx",
+            ),
+        ]
+
+
+class ProjectionCheckpoint(models.Model):
+    """
+    컨슈머가 큐별로 마지막으로 반영한 이벤트 순번과 시각입니다. (반영 지연 확인용)
+    """
+
+    queue = models.CharField(max_length=100, primary_key=True)
+    last_seq = models.BigIntegerField()
+    last_event_at = models.DateTimeField()
+    applied_at = models.DateTimeField(auto_now=True)
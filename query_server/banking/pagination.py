@@ -1,25 +1,256 @@
-from rest_framework.pagination import CursorPagination, PageNumberPagination
+import base64
+import binascii
+import json
+import struct
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from .anchors import get_anchors, page_rows
+from .queries import resolve_ordering, seek, seek_aggregate
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+# 커서 = (이전 페이지 방향 여부, transaction_date 마이크로초, id) 17바이트
+CURSOR_FORMAT = struct.Struct(">?qq")
+
+
+def encode_cursor(reverse, transaction_date, pk):
+    micros = (transaction_date - EPOCH) // timedelta(microseconds=1)
+    raw = CURSOR_FORMAT.pack(reverse, micros, pk)
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        reverse, micros, pk = CURSOR_FORMAT.unpack(raw)
+    except (binascii.Error, struct.error, ValueError):
+        raise NotFound("Invalid cursor")
+    return reverse, EPOCH + timedelta(microseconds=micros), pk
+
+
+class PageSizeMixin:
+    page_size = 10
+    page_size_query_param = "page_size"
+    max_page_size = 1000
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+
+class KeysetPagination(PageSizeMixin, BasePagination):
+    """
+    (transaction_date, id) 키셋 페이지네이션입니다.
+    ordering 파라미터의 오름차순/내림차순을 그대로 따르며, COUNT 없이
+    page_size + 1 개만 읽어 다음 페이지 존재 여부를 판단하므로
+    얼마나 깊이 스크롤하든 페이지당 비용이 O(page_size) 입니다.
+    """
+
+    cursor_query_param = "cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        descending = resolve_ordering(request.query_params.get("ordering")).startswith(
+            "-"
+        )
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        position = decode_cursor(cursor) if cursor else None
+        reverse = position is not None and position[0]
+
+        # 이전 페이지는 요청한 정렬의 반대 방향으로 읽은 뒤 뒤집습니다.
+        scan_descending = descending != reverse
+        if position is not None:
+            queryset = seek(queryset, position[1:], scan_descending)
+        if scan_descending:
+            queryset = queryset.order_by("-transaction_date", "-id")
+        else:
+            queryset = queryset.order_by("transaction_date", "id")
+
+        rows = list(queryset[: self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[: self.page_size]
+        if reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+
+        self.page = rows
+        return rows
+
+    def get_link(self, reverse, row):
+        cursor = encode_cursor(reverse, row.transaction_date, row.pk)
+        return replace_query_param(self.base_url, self.cursor_query_param, cursor)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.get_link(False, self.page[-1])
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.get_link(True, self.page[0])
+
+    def get_paginated_response(self, data):
+        return Response(
+            OrderedDict(
+                [
+                    ("next", self.get_next_link()),
+                    ("previous", self.get_previous_link()),
+                    ("results", data),
+                ]
+            )
+        )
+
+
+class AggregateKeysetPagination(PageSizeMixin, BasePagination):
+    """
+    집계 목록용 (account_id, period, transaction_type) 키셋 페이지네이션입니다.
+    day 단위처럼 행이 많은 경우에도 page_size + 1 개만 읽습니다. 앞으로만 넘깁니다.
+    """
+
+    cursor_query_param = "cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            queryset = seek_aggregate(queryset, self.decode_cursor(cursor))
+        queryset = queryset.order_by("account_id", "period", "transaction_type")
+
+        rows = list(queryset[: self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        self.page = rows[: self.page_size]
+        return self.page
+
+    def encode_cursor(self, row):
+        raw = json.dumps([row.account_id, row.period, row.transaction_type])
+        return base64.urlsafe_b64encode(raw.encode()).rstrip(b"=").decode("ascii")
+
+    def decode_cursor(self, cursor):
+        try:
+            raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+            account_id, period, transaction_type = json.loads(raw)
+            return int(account_id), str(period), str(transaction_type)
+        except (binascii.Error, TypeError, ValueError):
+            raise NotFound("Invalid cursor")
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        cursor = self.encode_cursor(self.page[-1])
+        return replace_query_param(self.base_url, self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        return Response(
+            OrderedDict([("next", self.get_next_link()), ("results", data)])
+        )
+
+
+class AnchoredPageNumberPagination(PageSizeMixin, BasePagination):
+    """
+    page= 요청을 COUNT(*) + OFFSET 대신 캐시된 페이지 앵커에서 키셋 탐색으로 처리합니다.
+    전체 건수도 스캔하지 않고 컨슈머가 유지하는 카운터를 씁니다.
+    """
+
+    page_query_param = "page"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        try:
+            self.page_number = int(params.get(self.page_query_param, 1))
+        except ValueError:
+            raise NotFound("Invalid page.")
+        if self.page_number < 1:
+            raise NotFound("Invalid page.")
+
+        state = get_anchors(
+            request.user.id, params.get("account_id"), params.get("transaction_type")
+        )
+        self.count = state["count"]
+        offset = (self.page_number - 1) * self.page_size
+        if offset and offset >= self.count:
+            raise NotFound("Invalid page.")
+
+        descending = resolve_ordering(params.get("ordering")).startswith("-")
+        self.page = page_rows(queryset, state, offset, self.page_size, descending)
+        return self.page
+
+    def get_next_link(self):
+        if self.page_number * self.page_size >= self.count:
+            return None
+        return replace_query_param(
+            self.base_url, self.page_query_param, self.page_number + 1
+        )
+
+    def get_previous_link(self):
+        if self.page_number == 1:
+            return None
+        if self.page_number == 2:
+            return remove_query_param(self.base_url, self.page_query_param)
+        return replace_query_param(
+            self.base_url, self.page_query_param, self.page_number - 1
+        )
+
+    def get_paginated_response(self, data):
+        return Response(
+            OrderedDict(
+                [
+                    ("count", self.count),
+                    ("next", self.get_next_link()),
+                    ("previous", self.get_previous_link()),
+                    ("results", data),
+                ]
+            )
+        )
+
+
+class TransactionPageNumberPagination(PageNumberPagination):
+    page_size = 10
+    page_size_query_param = "page_size"
+    max_page_size = 1000
 
 
 class CursorOrPageNumberPagination:
-    cursor_pagination_class = CursorPagination
-    page_number_pagination_class = PageNumberPagination
+    cursor_pagination_class = KeysetPagination
+    anchored_pagination_class = AnchoredPageNumberPagination
+    page_number_pagination_class = TransactionPageNumberPagination
+    display_page_controls = False
 
     def __init__(self):
         self.cursor_pagination = self.cursor_pagination_class()
+        self.anchored_pagination = self.anchored_pagination_class()
         self.page_number_pagination = self.page_number_pagination_class()
+        self.active_pagination = self.cursor_pagination
 
     def paginate_queryset(self, queryset, request, view=None):
-        if "page" in request.query_params:
-            return self.page_number_pagination.paginate_queryset(
-                queryset, request, view=view
-            )
-        return self.cursor_pagination.paginate_queryset(queryset, request, view=view)
+        params = request.query_params
+        if "page" not in params:
+            self.active_pagination = self.cursor_pagination
+        elif params.get("start_date") or params.get("end_date"):
+            # 임의의 날짜 범위는 앵커로 나눌 수 없으므로 OFFSET 페이지네이션을 씁니다.
+            self.active_pagination = self.page_number_pagination
+        else:
+            self.active_pagination = self.anchored_pagination
+        return self.active_pagination.paginate_queryset(queryset, request, view=view)
 
     def get_paginated_response(self, data):
-        if (
-            hasattr(self.page_number_pagination, "page")
-            and self.page_number_pagination.page is not None
-        ):
-            return self.page_number_pagination.get_paginated_response(data)
-        return self.cursor_pagination.get_paginated_response(data)
+        return self.active_pagination.get_paginated_response(data)
@@ -0,0 +1,75 @@
+from django.db.models import Q
+
+from .models import Transaction
+
+# 키셋 페이지네이션이 지원하는 정렬 (첫 번째가 기본값)
+ORDERINGS = ("transaction_date", "-transaction_date")
+
+
+def resolve_ordering(ordering):
+    return ordering if ordering in ORDERINGS else ORDERINGS[0]
+
+
+def transaction_queryset(
+    user_id,
+    account_id=None,
+    transaction_type=None,
+    start_date=None,
+    end_date=None,
+    ordering="transaction_date",
+):
+    """
+    거래내역 목록 쿼리셋을 만듭니다.
+    (user, account, transaction_date, id) / (user, transaction_type, transaction_date, id)
+    복합 인덱스의 선두 컬럼 순서에 맞춰 필터와 정렬을 구성합니다.
+    """
+    # 사용자 필터 (계좌 조인 없이 비정규화된 user_id 사용, 인덱스 선두 컬럼)
+    queryset = Transaction.objects.filter(user_id=user_id)
+
+    # account_id 필터 적용 (O(log n), (user, account, ...) 인덱스)
+    if account_id:
+        queryset = queryset.filter(account_id=account_id)
+
+    # transaction_type 필터 적용 (O(log n), (user, transaction_type, ...) 인덱스)
+    if transaction_type:
+        queryset = queryset.filter(transaction_type=transaction_type)
+
+    # 날짜 범위 필터 적용 (O(log n), 인덱스의 transaction_date 범위 스캔)
+    if start_date and end_date:
+        queryset = queryset.filter(transaction_date__range=[start_date, end_date])
+
+    # 정렬 적용 (인덱스 순서를 그대로 따르므로 별도 정렬 없음)
+    tie_breaker = "-id" if ordering.startswith("-") else "id"
+    return queryset.order_by(ordering, tie_breaker)
+
+
+def seek(queryset, position, descending=False):
+    """
+    (transaction_date, id) 위치 다음 행부터 읽도록 키셋 조건을 붙입니다.
+    """
+    transaction_date, pk = position
+    if descending:
+        return queryset.filter(
+            Q(transaction_date__lt=transaction_date)
+            | Q(transaction_date=transaction_date, id__lt=pk)
+        )
+    return queryset.filter(
+        Q(transaction_date__gt=transaction_date)
+        | Q(transaction_date=transaction_date, id__gt=pk)
+    )
+
+
+def seek_aggregate(queryset, position):
+    """
+    (account_id, period, transaction_type) 위치 다음 집계 행부터 읽도록 키셋 조건을 붙입니다.
+    """
+    account_id, period, transaction_type = position
+    return queryset.filter(
+        Q(account_id__gt=account_id)
+        | Q(account_id=account_id, period__gt=period)
+        | Q(
+            account_id=account_id,
+            period=period,
+            transaction_type__gt=transaction_type,
+        )
+    )
@@ -1,6 +1,6 @@
 from rest_framework import serializers
 
-from .models import Transaction
+from .models import Transaction, TransactionAggregate
 
 
 class TransactionSerializer(serializers.ModelSerializer):
@@ -13,3 +13,16 @@ class TransactionSerializer(serializers.ModelSerializer):
             "transaction_type",
             "description",
         ]
+
+
+class TransactionAggregateSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = TransactionAggregate
+        fields = [
+            "account",
+            "granularity",
+            "period",
+            "transaction_type",
+            "count",
+            "amount",
+        ]
@@ -1,10 +1,13 @@
 from datetime import datetime, timedelta
 
 from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TransactionTestCase, override_settings
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
 
+from .metrics import snapshot
 from .models import Account, Transaction
 
 
@@ -87,3 +90,56 @@ class TransactionFunctionalTest(APITestCase):
             self.assertEqual(response.status_code, status.HTTP_200_OK)
             next_dates = [t["transaction_date"] for t in response.data["results"]]
             self.assertEqual(next_dates, sorted(next_dates, reverse=True))
+
+
+class AsyncTransactionListTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        self.account = Account.objects.create(user=self.user, balance=10000)
+        for i in range(3):
+            Transaction.objects.create(
+                transaction_date=datetime.now() - timedelta(days=i),
+                amount=100 + i,
+                balance=10000 - i,
+                transaction_type="DEPOSIT",
+                description=f"Transaction {i}",
+                account=self.account,
+                user=self.user,
+            )
+        self.client.login(username="testuser", password="testpass")
+
+    def test_async_list_matches_sync_list_and_serves_cache_hits(self):
+        url = reverse("async-transaction-list")
+        first = self.client.get(url, {"page_size": 2})
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(first.json()["results"]), 2)
+
+        hits = snapshot().get("transaction_page_cache_hits", 0)
+        second = self.client.get(url, {"page_size": 2})
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(snapshot()["transaction_page_cache_hits"], hits + 1)
+
+        sync = self.client.get(reverse("transaction-list"), {"page_size": 2})
+        self.assertEqual(sync.json()["results"], first.json()["results"])
+
+    @override_settings(CONSISTENCY_MAX_WAIT=0.05, CONSISTENCY_POLL_INTERVAL=0.01)
+    def test_async_list_waits_for_consistency_token_per_account(self):
+        url = reverse("async-transaction-list")
+        Account.objects.filter(pk=self.account.pk).update(last_seq=5)
+        # 다른 계좌가 앞서 있어도 토큰의 계좌가 따라잡았는지로만 판단합니다.
+        Account.objects.create(user=self.user, balance=0, last_seq=9)
+
+        applied = self.client.get(url, {"min_seq": f"{self.account.id}:5"})
+        self.assertEqual(applied.status_code, status.HTTP_200_OK)
+        self.assertEqual(applied["X-Projection-Seq"], "5")
+        self.assertFalse(applied.has_header("X-Projection-Stale"))
+
+        behind = self.client.get(url, {"min_seq": f"{self.account.id}:6"})
+        self.assertEqual(behind.status_code, status.HTTP_200_OK)
+        self.assertEqual(behind["X-Projection-Stale"], "true")
+
+    def test_async_list_requires_authentication(self):
+        self.client.logout()
+        response = self.client.get(reverse("async-transaction-list"))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
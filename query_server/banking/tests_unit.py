@@ -1,11 +1,35 @@
-from datetime import datetime, timedelta
+import io
+import json
+from contextlib import redirect_stdout
+from datetime import datetime, timedelta, timezone
+from unittest import mock
 
+import msgpack
 from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
 
-from .models import Account, Transaction
+from . import anchors
+from .anchors import anchor_key, get_anchors
+from .authentication import principals, signer
+from .caching import invalidate_transactions, transaction_cache_key
+from .codec import HEADER, MSGPACK, SCHEMA_VERSION, DecodeError, decode_message
+from .management.commands import rebuild_projection
+from .management.commands.consumer import (
+    DeliveryBatch,
+    ForeignKeyGuard,
+    assign_queues,
+    declare_queue,
+    handle_batch,
+    record_checkpoints,
+)
+from .models import Account, Transaction, TransactionAggregate
 
 
 class TransactionViewSetTest(APITestCase):
@@ -80,3 +104,794 @@ class TransactionViewSetTest(APITestCase):
         response = self.client.get(url, {"page": 2, "page_size": 20})
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data["results"]), 20)
+
+    def test_keyset_pagination_walks_all_rows_without_count(self):
+        url = reverse("transaction-list")
+        for ordering in ("transaction_date", "-transaction_date"):
+            cache.clear()
+            seen = []
+            next_url = url + f"?page_size=100&ordering={ordering}"
+            with CaptureQueriesContext(connection) as queries:
+                while next_url:
+                    response = self.client.get(next_url)
+                    self.assertEqual(response.status_code, status.HTTP_200_OK)
+                    seen.extend(response.data["results"])
+                    next_url = response.data["next"]
+
+            self.assertEqual(len({t["description"] for t in seen}), 1000)
+            dates = [t["transaction_date"] for t in seen]
+            self.assertEqual(dates, sorted(dates, reverse=ordering.startswith("-")))
+            self.assertFalse(any("COUNT(" in query["sql"].upper() for query in queries))
+
+    def test_keyset_previous_link_returns_previous_page(self):
+        url = reverse("transaction-list")
+        first = self.client.get(url, {"page_size": 20})
+        second = self.client.get(first.data["next"])
+        previous = self.client.get(second.data["previous"])
+
+        self.assertEqual(previous.data["results"], first.data["results"])
+        self.assertNotEqual(second.data["results"], first.data["results"])
+
+    def test_invalid_cursor(self):
+        url = reverse("transaction-list")
+        response = self.client.get(url, {"cursor": "not-a-cursor"})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    @override_settings(PAGE_ANCHOR_INTERVAL=64)
+    def test_page_jump_uses_anchors_and_counter(self):
+        url = reverse("transaction-list")
+        for ordering in ("transaction_date", "-transaction_date"):
+            cache.clear()
+            self.client.get(url, {"page": 1, "ordering": ordering})
+
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(
+                    url, {"page": 7, "page_size": 20, "ordering": ordering}
+                )
+
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.data["count"], 1000)
+            expected = Transaction.objects.filter(user=self.user).order_by(
+                ordering, "-id" if ordering.startswith("-") else "id"
+            )[120:140]
+            self.assertEqual(
+                [t["description"] for t in response.data["results"]],
+                [t.description for t in expected],
+            )
+            self.assertFalse(any("COUNT(" in query["sql"].upper() for query in queries))
+
+    def test_page_out_of_range(self):
+        url = reverse("transaction-list")
+        response = self.client.get(url, {"page": 101, "page_size": 10})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class SignedTokenAuthenticationTest(APITestCase):
+    def setUp(self):
+        principals.clear()
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+
+    def test_token_from_command_server_authenticates(self):
+        token = signer().sign(str(self.user.id))
+        url = reverse("transaction-list")
+        response = self.client.get(url, HTTP_AUTHORIZATION=f"Token {token}")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.user.is_active = False
+        self.user.save()
+        principals.clear()
+        response = self.client.get(url, HTTP_AUTHORIZATION=f"Token {token}")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    @override_settings(AUTH_TOKEN_TTL=-1)
+    def test_expired_token_is_rejected(self):
+        token = signer().sign(str(self.user.id))
+        response = self.client.get(
+            reverse("transaction-list"), HTTP_AUTHORIZATION=f"Token {token}"
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class TransactionPageCacheTest(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="testuser", password="testpass")
+        cls.account = Account.objects.create(user=cls.user, balance=10000)
+        for i in range(5):
+            Transaction.objects.create(
+                transaction_date=datetime.now() - timedelta(days=i),
+                amount=100 + i,
+                balance=10000 - i,
+                transaction_type="DEPOSIT",
+                description=f"Transaction {i}",
+                account=cls.account,
+                user=cls.user,
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.client.login(username="testuser", password="testpass")
+
+    def test_repeated_page_served_from_cache(self):
+        url = reverse("transaction-list")
+        first = self.client.get(url, {"account_id": self.account.id})
+
+        with CaptureQueriesContext(connection) as queries:
+            second = self.client.get(url, {"account_id": self.account.id})
+
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual(second.data, json.loads(first.content))
+        self.assertFalse(
+            any("banking_transaction" in query["sql"] for query in queries)
+        )
+
+    def test_cached_page_invalidated_by_new_transaction(self):
+        url = reverse("transaction-list")
+        self.client.get(url, {"account_id": self.account.id})
+
+        invalidate_transactions(account_ids=[self.account.id])
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url, {"account_id": self.account.id})
+        self.assertTrue(any("banking_transaction" in query["sql"] for query in queries))
+
+
+class TransactionAggregateViewSetTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        other = User.objects.create_user(username="otheruser", password="testpass")
+        own_account = Account.objects.create(user=self.user, balance=0)
+        other_account = Account.objects.create(user=other, balance=0)
+        for user, account in ((self.user, own_account), (other, other_account)):
+            for granularity, period in (("month", "2024-06"), ("all", "")):
+                TransactionAggregate.objects.create(
+                    account=account,
+                    user=user,
+                    granularity=granularity,
+                    period=period,
+                    transaction_type="deposit",
+                    count=2,
+                    amount=800,
+                )
+        self.client.login(username="testuser", password="testpass")
+
+    def test_list_own_aggregates(self):
+        url = reverse("transaction-aggregate-list")
+        response = self.client.get(url, {"granularity": "month"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["results"]), 1)
+        self.assertEqual(response.data["results"][0]["period"], "2024-06")
+        self.assertEqual(response.data["results"][0]["amount"], 800)
+
+    def test_day_aggregates_are_paged_by_keyset(self):
+        account = Account.objects.get(user=self.user)
+        for day in range(1, 6):
+            for transaction_type in ("deposit", "withdraw"):
+                TransactionAggregate.objects.create(
+                    account=account,
+                    user=self.user,
+                    granularity="day",
+                    period="2024-06-%02d" % day,
+                    transaction_type=transaction_type,
+                    count=1,
+                    amount=100,
+                )
+        response = self.client.get(
+            reverse("transaction-aggregate-list"),
+            {"granularity": "day", "page_size": 3},
+        )
+        seen = []
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(len(response.data["results"]), 3)
+            seen += [
+                (row["period"], row["transaction_type"])
+                for row in response.data["results"]
+            ]
+            if response.data["next"] is None:
+                break
+            response = self.client.get(response.data["next"])
+        self.assertEqual(len(seen), 10)
+        self.assertEqual(seen, sorted(seen))
+
+    def test_unknown_granularity_is_rejected(self):
+        url = reverse("transaction-aggregate-list")
+        response = self.client.get(url, {"granularity": "week"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(CONSISTENCY_MAX_WAIT=0)
+class ReadYourWritesTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        self.account = Account.objects.create(user=self.user, balance=0, last_seq=5)
+        self.client.login(username="testuser", password="testpass")
+
+    def test_min_seq_already_applied(self):
+        response = self.client.get(
+            reverse("transaction-aggregate-list"),
+            {"min_seq": 5, "account_id": self.account.id},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["X-Projection-Seq"], "5")
+        self.assertFalse(response.has_header("X-Projection-Stale"))
+
+    def test_min_seq_not_yet_applied_is_flagged(self):
+        # 다른 계좌의 순번이 더 커도 토큰의 계좌가 뒤처져 있으면 기다린 것으로 봅니다.
+        Account.objects.create(user=self.user, balance=0, last_seq=9)
+        response = self.client.get(
+            reverse("transaction-list"), {"min_seq": f"{self.account.id}:6"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["X-Projection-Seq"], "5")
+        self.assertEqual(response["X-Projection-Stale"], "true")
+
+    def test_invalid_min_seq(self):
+        for min_seq in ("x", "1:x", "6"):
+            response = self.client.get(
+                reverse("transaction-list"), {"min_seq": min_seq}
+            )
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ExplainTransactionsCommandTest(TestCase):
+    def test_prints_plan_for_each_filter_combination(self):
+        user = User.objects.create_user(username="testuser", password="testpass")
+        account = Account.objects.create(user=user, balance=0)
+
+        output = io.StringIO()
+        with redirect_stdout(output):
+            call_command("explain_transactions", user=user.id, account=account.id)
+
+        plans = output.getvalue()
+        self.assertEqual(plans.count("ordering="), 16)
+        self.assertIn("txn_user_account_date_idx", plans)
+
+
+class BenchMiddlewareCommandTest(TestCase):
+    def test_prints_full_and_lean_timings(self):
+        output = io.StringIO()
+        with redirect_stdout(output):
+            call_command("bench_middleware", iterations=20, cookie=["csrftoken=abc"])
+
+        lines = output.getvalue().splitlines()
+        self.assertEqual(
+            [line.split(":")[0] for line in lines], ["full", "lean", "saved"]
+        )
+
+
+class DeclareQueueTest(SimpleTestCase):
+    def test_queue_dead_letters_into_bound_dead_queue(self):
+        channel = mock.Mock()
+        declare_queue(channel, "banking_partition_0")
+
+        channel.exchange_declare.assert_called_once_with(
+            exchange="banking_dead_letter", exchange_type="direct", durable=True
+        )
+        channel.queue_declare.assert_any_call(
+            queue="banking_partition_0_dead", durable=True
+        )
+        channel.queue_bind.assert_called_once_with(
+            queue="banking_partition_0_dead",
+            exchange="banking_dead_letter",
+            routing_key="banking_partition_0",
+        )
+        channel.queue_declare.assert_any_call(
+            queue="banking_partition_0",
+            arguments={"x-dead-letter-exchange": "banking_dead_letter"},
+        )
+
+
+class DeliveryBatchTest(SimpleTestCase):
+    def message(self, seq):
+        return {
+            "event": "created",
+            "app_label": "banking",
+            "model": "account",
+            "data": {"id": seq, "user": 999, "balance": 0},
+            "seq": seq,
+        }
+
+    @override_settings(CONSUMER_FK_RETRIES=1, CONSUMER_FK_RETRY_DELAY=0.5)
+    def test_foreign_key_failures_are_requeued_before_dead_lettering(self):
+        channel = mock.Mock()
+        batch = DeliveryBatch(channel)
+        with mock.patch(
+            "banking.management.commands.consumer.handle_batch",
+            side_effect=IntegrityError("FOREIGN KEY constraint failed"),
+        ):
+            batch.add(1, "banking_partition_0", self.message(1))
+            batch.add(2, "banking_partition_0", self.message(2))
+            batch.flush()
+            # 실패한 메시지부터 뒤의 메시지까지 순서대로 큐에 되돌립니다.
+            channel.basic_nack.assert_called_once_with(
+                delivery_tag=2, multiple=True, requeue=True
+            )
+            # 연결 스레드를 막지 않도록 하트비트를 처리하며 기다립니다.
+            channel.connection.sleep.assert_called_once_with(0.5)
+            self.assertEqual(batch.pending, [])
+
+            # 재시도 횟수를 넘기면 데드레터 큐로 보냅니다.
+            batch.add(3, "banking_partition_0", self.message(1))
+            batch.flush()
+            channel.basic_nack.assert_called_with(delivery_tag=3, requeue=False)
+        channel.basic_ack.assert_not_called()
+
+    def test_undecodable_body_is_dead_lettered_without_stopping(self):
+        channel = mock.Mock()
+        batch = DeliveryBatch(channel)
+        method = mock.Mock(delivery_tag=7, routing_key="banking_partition_0")
+        properties = mock.Mock(content_type=MSGPACK)
+
+        with redirect_stdout(io.StringIO()):
+            batch.receive(channel, method, properties, b"\x00garbage")
+
+        channel.basic_nack.assert_called_once_with(delivery_tag=7, requeue=False)
+        self.assertEqual(batch.pending, [])
+
+    def test_unreadable_envelopes_raise_decode_error(self):
+        body = HEADER.pack(SCHEMA_VERSION, 7, 1.5) + msgpack.packb({"event": "created"})
+        newer = HEADER.pack(SCHEMA_VERSION + 1, 7, 1.5) + body[HEADER.size :]
+
+        for body, content_type in (
+            (body[: HEADER.size - 1], MSGPACK),
+            (newer, MSGPACK),
+            (body, "application/x-protobuf"),
+            (b'{"event": ', None),
+            (b"[1, 2]", "application/json"),
+        ):
+            with self.subTest(body=body, content_type=content_type):
+                with self.assertRaises(DecodeError):
+                    decode_message(body, content_type)
+
+    def test_truncated_and_newer_envelopes_are_dead_lettered(self):
+        channel = mock.Mock()
+        batch = DeliveryBatch(channel)
+        properties = mock.Mock(content_type=MSGPACK)
+        body = HEADER.pack(SCHEMA_VERSION + 1, 7, 1.5) + msgpack.packb({})
+
+        with redirect_stdout(io.StringIO()):
+            for tag, payload in ((1, body[:4]), (2, body)):
+                method = mock.Mock(delivery_tag=tag, routing_key="banking_partition_0")
+                batch.receive(channel, method, properties, payload)
+
+        self.assertEqual(
+            channel.basic_nack.call_args_list,
+            [
+                mock.call(delivery_tag=1, requeue=False),
+                mock.call(delivery_tag=2, requeue=False),
+            ],
+        )
+        self.assertEqual(batch.pending, [])
+
+    def test_rejects_non_positive_worker_count(self):
+        with self.assertRaises(CommandError):
+            call_command("consumer", workers=0)
+
+
+class ConsumerBatchTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+
+    def message(self, model, event, **data):
+        return {"event": event, "app_label": "banking", "model": model, "data": data}
+
+    def transaction_message(self, event, pk, account_id, transaction_date, amount):
+        return self.message(
+            "transaction",
+            event,
+            id=pk,
+            transaction_date=transaction_date,
+            amount=amount,
+            balance=amount,
+            transaction_type="deposit",
+            description="Deposit",
+            account=account_id,
+            user=self.user.id,
+        )
+
+    def test_handle_batch_maintains_aggregates(self):
+        Account.objects.create(id=100, user=self.user, balance=0)
+        created = [
+            self.transaction_message(
+                "created", 201, 100, "2024-06-01T09:00:00+00:00", 500
+            ),
+            self.transaction_message(
+                "created", 202, 100, "2024-06-02T09:00:00+00:00", 300
+            ),
+            self.transaction_message(
+                "created", 203, 100, "2024-07-01T09:00:00+00:00", 200
+            ),
+        ]
+        handle_batch(created)
+        # 재전달과 삭제
+        handle_batch(
+            [
+                created[0],
+                self.transaction_message(
+                    "deleted", 203, 100, "2024-07-01T09:00:00+00:00", 200
+                ),
+            ]
+        )
+
+        totals = {
+            (row.granularity, row.period): (row.count, row.amount)
+            for row in TransactionAggregate.objects.filter(account_id=100)
+        }
+        self.assertEqual(totals[("all", "")], (2, 800))
+        self.assertEqual(totals[("month", "2024-06")], (2, 800))
+        self.assertEqual(totals[("month", "2024-07")], (0, 0))
+        self.assertEqual(totals[("day", "2024-06-02")], (1, 300))
+
+    def test_handle_batch_accepts_msgpack_messages(self):
+        Account.objects.create(id=100, user=self.user, balance=0)
+        message = self.transaction_message(
+            "created", 201, 100, datetime(2024, 6, 1, 9, tzinfo=timezone.utc), 500
+        )
+        body = HEADER.pack(SCHEMA_VERSION, 7, 1.5) + msgpack.packb(
+            message, datetime=True
+        )
+
+        decoded = decode_message(body, MSGPACK)
+        self.assertEqual((decoded["seq"], decoded["ts"]), (7, 1.5))
+        handle_batch([decoded])
+        self.assertEqual(
+            Transaction.objects.get(id=201).transaction_date,
+            datetime(2024, 6, 1, 9, tzinfo=timezone.utc),
+        )
+        self.assertTrue(
+            TransactionAggregate.objects.filter(
+                account_id=100, granularity="day", period="2024-06-01", count=1
+            ).exists()
+        )
+
+    def test_handle_batch_applies_events_in_order(self):
+        transaction_data = {
+            "id": 200,
+            "transaction_date": "2024-06-01T00:00:00+00:00",
+            "amount": 500,
+            "balance": 500,
+            "transaction_type": "deposit",
+            "description": "Batch deposit",
+            "account": 100,
+            "user": self.user.id,
+        }
+        handle_batch(
+            [
+                self.message(
+                    "account", "created", id=100, balance=0, user=self.user.id
+                ),
+                self.message(
+                    "account", "updated", id=100, balance=500, user=self.user.id
+                ),
+                self.message("transaction", "created", **transaction_data),
+                # 재전달된 메시지는 무시됩니다.
+                self.message("transaction", "created", **transaction_data),
+            ]
+        )
+
+        self.assertEqual(Account.objects.get(pk=100).balance, 500)
+        self.assertEqual(Transaction.objects.filter(account_id=100).count(), 1)
+
+    def test_handle_batch_expands_bulk_created_events(self):
+        Account.objects.create(id=100, user=self.user, balance=0)
+        rows = [
+            self.transaction_message(
+                "created", pk, 100, "2024-06-01T09:00:00+00:00", 100
+            )["data"]
+            for pk in (201, 202, 203)
+        ]
+        bulk = self.message("transaction", "bulk_created")
+        handle_batch([{**bulk, "data": rows}])
+
+        self.assertEqual(
+            list(Transaction.objects.order_by("id").values_list("id", flat=True)),
+            [201, 202, 203],
+        )
+        self.assertEqual(
+            TransactionAggregate.objects.get(account_id=100, granularity="all").count,
+            3,
+        )
+
+    def test_handle_batch_invalidates_only_affected_owner(self):
+        other = User.objects.create_user(username="otheruser", password="testpass")
+        Account.objects.create(id=100, user=self.user, balance=0)
+        other_key = transaction_cache_key(other.id, {})
+        own_key = transaction_cache_key(self.user.id, {})
+
+        handle_batch(
+            [
+                self.message(
+                    "transaction",
+                    "created",
+                    id=200,
+                    transaction_date="2024-06-01T00:00:00+00:00",
+                    amount=500,
+                    balance=500,
+                    transaction_type="deposit",
+                    description="Deposit",
+                    account=100,
+                    user=self.user.id,
+                )
+            ]
+        )
+
+        self.assertNotEqual(transaction_cache_key(self.user.id, {}), own_key)
+        self.assertEqual(transaction_cache_key(other.id, {}), other_key)
+
+    @override_settings(PAGE_ANCHOR_INTERVAL=2)
+    def test_handle_batch_extends_cached_page_anchors(self):
+        account = Account.objects.create(id=100, user=self.user, balance=0)
+        state = get_anchors(self.user.id, account.id)
+        self.assertEqual(state["count"], 0)
+
+        handle_batch(
+            [
+                self.message(
+                    "transaction",
+                    "created",
+                    id=200 + i,
+                    transaction_date=f"2024-06-0{i + 1}T00:00:00+00:00",
+                    amount=500,
+                    balance=500,
+                    transaction_type="deposit",
+                    description="Deposit",
+                    account=account.id,
+                    user=self.user.id,
+                )
+                for i in range(3)
+            ]
+        )
+
+        with self.assertNumQueries(0):
+            state = get_anchors(self.user.id, account.id)
+        self.assertEqual(state["count"], 3)
+        self.assertEqual([pk for _, pk in state["anchors"]], [201])
+
+    @override_settings(PAGE_ANCHOR_SLOW_BUILD=0)
+    def test_anchor_build_racing_the_consumer_is_not_stored(self):
+        account = Account.objects.create(id=100, user=self.user, balance=0)
+        build_anchors = anchors.build_anchors
+
+        def build_then_consume(queryset, interval):
+            state = build_anchors(queryset, interval)
+            handle_batch(
+                [
+                    self.transaction_message(
+                        "created", 201, account.id, "2024-06-01T09:00:00+00:00", 500
+                    )
+                ]
+            )
+            return state
+
+        with mock.patch.object(anchors, "build_anchors", build_then_consume):
+            with self.assertLogs("banking.anchors", "WARNING"):
+                self.assertEqual(get_anchors(self.user.id, account.id)["count"], 0)
+
+        self.assertIsNone(cache.get(anchor_key(self.user.id, account.id)))
+        self.assertEqual(get_anchors(self.user.id, account.id)["count"], 1)
+
+    def test_account_events_record_seq_and_checkpoints(self):
+        updated = {
+            **self.message(
+                "account", "updated", id=100, balance=700, user=self.user.id
+            ),
+            "seq": 42,
+            "ts": 1717232400.0,
+        }
+        handle_batch(
+            [self.message("account", "created", id=100, balance=0, user=self.user.id)]
+        )
+        handle_batch([updated])
+        record_checkpoints([("banking_partition_0", updated)])
+
+        self.assertEqual(Account.objects.get(pk=100).last_seq, 42)
+        admin = User.objects.create_superuser(username="admin", password="testpass")
+        self.client.force_login(admin)
+        queues = self.client.get(reverse("projection-lag")).json()["queues"]
+        self.assertEqual(queues[0]["queue"], "banking_partition_0")
+        self.assertEqual(queues[0]["last_seq"], 42)
+
+    def test_batch_extends_user_level_anchors_under_user_lock(self):
+        account = Account.objects.create(id=100, user=self.user, balance=0)
+        other = Account.objects.create(id=101, user=self.user, balance=0)
+        get_anchors(self.user.id)
+        get_anchors(self.user.id, account.id)
+
+        # 두 파티션 워커가 같은 사용자의 서로 다른 계좌를 차례로 반영합니다.
+        handle_batch(
+            [
+                self.transaction_message(
+                    "created", 201, account.id, "2024-06-01T09:00:00+00:00", 500
+                )
+            ]
+        )
+        handle_batch(
+            [
+                self.transaction_message(
+                    "created", 202, other.id, "2024-06-02T09:00:00+00:00", 500
+                )
+            ]
+        )
+
+        self.assertEqual(cache.get(anchor_key(self.user.id))["count"], 2)
+        self.assertEqual(cache.get(anchor_key(self.user.id, account.id))["count"], 1)
+
+    @override_settings(PAGE_ANCHOR_LOCK_TIMEOUT=0.05)
+    def test_batch_drops_anchors_when_user_lock_is_held(self):
+        account = Account.objects.create(id=100, user=self.user, balance=0)
+        get_anchors(self.user.id)
+
+        # 다른 프로세스가 잠금을 쥔 채 놓지 않는 경우입니다.
+        cache.set(anchors.anchor_lock_key(self.user.id), 1, timeout=60)
+        handle_batch(
+            [
+                self.transaction_message(
+                    "created", 201, account.id, "2024-06-01T09:00:00+00:00", 500
+                )
+            ]
+        )
+        cache.delete(anchors.anchor_lock_key(self.user.id))
+
+        self.assertIsNone(cache.get(anchor_key(self.user.id)))
+        self.assertEqual(get_anchors(self.user.id)["count"], 1)
+
+    def test_assign_queues_gives_each_partition_one_worker(self):
+        self.assertEqual(
+            assign_queues(partitions=4, workers=2),
+            [
+                ["auth_user_queue", "banking_partition_0", "banking_partition_2"],
+                ["banking_partition_1", "banking_partition_3"],
+            ],
+        )
+
+    def test_guard_skips_events_with_unknown_foreign_keys(self):
+        Account.objects.create(id=100, user=self.user, balance=0)
+        guard = ForeignKeyGuard(maxsize=10)
+        rows = [
+            {
+                "id": transaction_id,
+                "transaction_date": "2024-06-01T00:00:00+00:00",
+                "amount": 500,
+                "balance": 500,
+                "transaction_type": "deposit",
+                "description": "Guarded deposit",
+                "account": account_id,
+                "user": self.user.id,
+            }
+            for transaction_id, account_id in [(201, 100), (202, 999)]
+        ]
+        handle_batch(
+            [self.message("transaction", "created", **data) for data in rows], guard
+        )
+
+        self.assertEqual(list(Transaction.objects.values_list("id", flat=True)), [201])
+        # 한 번 확인된 id 는 다시 조회하지 않습니다.
+        with self.assertNumQueries(0):
+            self.assertEqual(guard.missing(Account, {100}), set())
+
+
+class RebuildProjectionTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        stale = Account.objects.create(id=100, user=self.user, balance=1)
+        Transaction.objects.create(
+            account=stale,
+            user=self.user,
+            amount=1,
+            balance=1,
+            transaction_type="deposit",
+            description="Stale",
+            transaction_date=datetime(2024, 5, 1),
+        )
+
+    def account(self, event, balance):
+        return {
+            "event": event,
+            "app_label": "banking",
+            "model": "account",
+            "data": {"id": 100, "balance": balance, "user": self.user.id},
+        }
+
+    def deposit(self, pk=500, amount=700, balance=700):
+        return {
+            "event": "created",
+            "app_label": "banking",
+            "model": "transaction",
+            "data": {
+                "id": pk,
+                "transaction_date": "2024-06-01T09:00:00+00:00",
+                "amount": amount,
+                "balance": balance,
+                "transaction_type": "deposit",
+                "description": "Deposit",
+                "account": 100,
+                "user": self.user.id,
+            },
+        }
+
+    def rebuild(self, events):
+        pages = {
+            ("snapshots/", None): {
+                "snapshots": [
+                    {
+                        "account_id": 100,
+                        "user_id": self.user.id,
+                        "balance": 700,
+                        "last_event_id": 3,
+                    }
+                ],
+                "users": [
+                    {
+                        "id": self.user.id,
+                        "username": "renamed",
+                        "password": self.user.password,
+                    }
+                ],
+            },
+            ("snapshots/transactions/", 0): {
+                "next": None,
+                "transactions": [self.deposit()["data"]],
+            },
+            **{("events/", after): page for after, page in events.items()},
+        }
+        fetched = []
+
+        def fetch(source, path, token, after=None, **params):
+            self.assertEqual(params.get("user"), self.user.id)
+            fetched.append((path, after))
+            return pages[(path, after)]
+
+        with mock.patch.object(rebuild_projection, "fetch", side_effect=fetch):
+            with redirect_stdout(io.StringIO()):
+                call_command("rebuild_projection", user=self.user.id, chunk_size=2)
+        return fetched
+
+    def test_rebuild_seeds_snapshot_and_replays_only_the_tail(self):
+        fetched = self.rebuild(
+            {
+                3: {
+                    "next": 5,
+                    "events": [
+                        # 스냅샷으로 채운 거래가 꼬리에 다시 와도 한 번만 반영합니다.
+                        {"id": 4, "message": self.deposit()},
+                        {"id": 5, "message": self.deposit(501, 200, 900)},
+                    ],
+                },
+                5: {
+                    "next": None,
+                    "events": [{"id": 6, "message": self.account("updated", 900)}],
+                },
+            }
+        )
+
+        # 스냅샷 이전(1..3)의 이벤트는 가져오지 않습니다.
+        self.assertEqual(
+            [after for path, after in fetched if path == "events/"], [3, 5]
+        )
+        self.assertEqual(User.objects.get(pk=self.user.id).username, "renamed")
+        account = Account.objects.get(pk=100)
+        self.assertEqual((account.balance, account.last_seq), (900, 6))
+        self.assertEqual(
+            list(Transaction.objects.order_by("id").values_list("id", flat=True)),
+            [500, 501],
+        )
+        self.assertEqual(
+            TransactionAggregate.objects.get(account_id=100, granularity="all").amount,
+            900,
+        )
+
+    @override_settings(CONSISTENCY_MAX_WAIT=0)
+    def test_rebuilt_account_serves_min_seq_covered_by_snapshot(self):
+        self.rebuild({3: {"next": None, "events": []}})
+
+        self.assertEqual(Account.objects.get(pk=100).last_seq, 3)
+        self.client.force_login(self.user)
+        response = self.client.get(
+            reverse("transaction-aggregate-list"), {"min_seq": 3, "account_id": 100}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["X-Projection-Seq"], "3")
+        self.assertFalse(response.has_header("X-Projection-Stale"))
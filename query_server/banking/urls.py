@@ -1,11 +1,23 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from .views import TransactionViewSet
+from . import async_views
+from .views import (
+    MetricsView,
+    ProjectionLagView,
+    TransactionAggregateViewSet,
+    TransactionViewSet,
+)
 
 router = DefaultRouter()
 router.register(r"banking", TransactionViewSet, basename="transaction")
+router.register(
+    r"aggregates", TransactionAggregateViewSet, basename="transaction-aggregate"
+)
 
 urlpatterns = [
     path("", include(router.urls)),
+    path("async/banking/", async_views.transactions, name="async-transaction-list"),
+    path("metrics/", MetricsView.as_view(), name="metrics"),
+    path("metrics/lag/", ProjectionLagView.as_view(), name="projection-lag"),
 ]
@@ -1,15 +1,53 @@
+import json
+
 from django.core.cache import cache
 from django.db.models import Q
+from django.http import HttpResponse
+from django.utils import timezone
 from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
 from rest_framework import permissions, viewsets
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from . import metrics
+from .caching import page_cache_timeout, transaction_cache_key
+from .consistency import ReadYourWritesMixin
+from .models import ProjectionCheckpoint, Transaction, TransactionAggregate
+from .pagination import AggregateKeysetPagination, CursorOrPageNumberPagination
+from .queries import resolve_ordering, transaction_queryset
+from .serializers import TransactionAggregateSerializer, TransactionSerializer
+
+
+class CachedPageResponse(HttpResponse):
+    """
+    캐시에 저장해 둔 JSON 바이트를 그대로 돌려주는 응답입니다.
+    DRF 시리얼라이저와 렌더러를 거치지 않습니다.
+    """
 
-from .models import Transaction
-from .pagination import CursorOrPageNumberPagination
-from .serializers import TransactionSerializer
+    def __init__(self, content):
+        super().__init__(content, content_type="application/json")
 
+    @property
+    def data(self):
+        # 파싱된 본문이 필요한 경우(테스트 클라이언트 등)에만 디코딩합니다.
+        return json.loads(self.content)
 
-class TransactionViewSet(viewsets.ReadOnlyModelViewSet):
+
+MIN_SEQ_PARAMETER = openapi.Parameter(
+    "min_seq",
+    openapi.IN_QUERY,
+    description=(
+        "consistency_token from the command server (account:seq[,account:seq]),"
+        " or a seq together with account_id; waits until applied"
+    ),
+    type=openapi.TYPE_STRING,
+)
+
+
+class TransactionViewSet(ReadYourWritesMixin, viewsets.ReadOnlyModelViewSet):
     serializer_class = TransactionSerializer
     pagination_class = CursorOrPageNumberPagination
     permission_classes = [permissions.IsAuthenticated]
@@ -44,7 +82,13 @@ class TransactionViewSet(viewsets.ReadOnlyModelViewSet):
             openapi.Parameter(
                 "ordering",
                 openapi.IN_QUERY,
-                description="Ordering field (e.g., transaction_date or -transaction_date)",
+                description="Ordering (transaction_date or -transaction_date)",
+                type=openapi.TYPE_STRING,
+            ),
+            openapi.Parameter(
+                "cursor",
+                openapi.IN_QUERY,
+                description="Opaque keyset cursor from the next/previous links",
                 type=openapi.TYPE_STRING,
             ),
             openapi.Parameter(
@@ -59,8 +103,32 @@ class TransactionViewSet(viewsets.ReadOnlyModelViewSet):
                 description="Page size",
                 type=openapi.TYPE_INTEGER,
             ),
+            MIN_SEQ_PARAMETER,
         ],
     )
+    def list(self, request, *args, **kwargs):
+        if "min_seq" in request.query_params:
+            # 커밋과 캐시 무효화 사이의 오래된 페이지를 피하려고 캐시를 거치지 않습니다.
+            return super().list(request, *args, **kwargs)
+
+        # 직렬화된 페이지 캐시 조회 (O(1)) - 적중하면 DB 와 시리얼라이저를 거치지 않습니다.
+        cache_key = transaction_cache_key(request.user.id, request.query_params)
+        cached_page = cache.get(cache_key)
+        if cached_page is not None:
+            metrics.incr("transaction_page_cache_hits")
+            return CachedPageResponse(cached_page)
+
+        metrics.incr("transaction_page_cache_misses")
+        response = super().list(request, *args, **kwargs)
+
+        # 렌더링된 JSON 바이트를 키별 TTL 로 캐시에 저장합니다.
+        cache.set(
+            cache_key,
+            JSONRenderer().render(response.data),
+            timeout=page_cache_timeout(request.query_params),
+        )
+        return response
+
     def get_queryset(self):
         # swagger_fake_view 체크
         if getattr(self, "swagger_fake_view", False):
@@ -71,36 +139,127 @@ class TransactionViewSet(viewsets.ReadOnlyModelViewSet):
         transaction_type = self.request.query_params.get("transaction_type")
         start_date = self.request.query_params.get("start_date")
         end_date = self.request.query_params.get("end_date")
-        ordering = self.request.query_params.get("ordering", "transaction_date")
+        ordering = resolve_ordering(self.request.query_params.get("ordering"))
+
+        # 쿼리셋 필터링 및 정렬 (복합 인덱스 범위 스캔)
+        return transaction_queryset(
+            user.id, account_id, transaction_type, start_date, end_date, ordering
+        )
+
+
+class TransactionAggregateViewSet(ReadYourWritesMixin, viewsets.ReadOnlyModelViewSet):
+    serializer_class = TransactionAggregateSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = AggregateKeysetPagination
+
+    @swagger_auto_schema(
+        operation_description="Retrieve transaction counts and totals per period",
+        manual_parameters=[
+            openapi.Parameter(
+                "account_id",
+                openapi.IN_QUERY,
+                description="Account ID",
+                type=openapi.TYPE_INTEGER,
+            ),
+            openapi.Parameter(
+                "granularity",
+                openapi.IN_QUERY,
+                description="day, month or all (default: month)",
+                type=openapi.TYPE_STRING,
+            ),
+            openapi.Parameter(
+                "transaction_type",
+                openapi.IN_QUERY,
+                description="Transaction Type",
+                type=openapi.TYPE_STRING,
+            ),
+            openapi.Parameter(
+                "start_period",
+                openapi.IN_QUERY,
+                description="First period (YYYY-MM-DD or YYYY-MM)",
+                type=openapi.TYPE_STRING,
+            ),
+            openapi.Parameter(
+                "end_period",
+                openapi.IN_QUERY,
+                description="Last period (YYYY-MM-DD or YYYY-MM)",
+                type=openapi.TYPE_STRING,
+            ),
+            openapi.Parameter(
+                "cursor",
+                openapi.IN_QUERY,
+                description="Cursor from the previous page's next link",
+                type=openapi.TYPE_STRING,
+            ),
+            openapi.Parameter(
+                "page_size",
+                openapi.IN_QUERY,
+                description="Page size",
+                type=openapi.TYPE_INTEGER,
+            ),
+            MIN_SEQ_PARAMETER,
+        ],
+    )
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    def get_queryset(self):
+        # swagger_fake_view 체크
+        if getattr(self, "swagger_fake_view", False):
+            return TransactionAggregate.objects.none()
 
-        # 캐시 키 생성 (O(1) 상수 시간 복잡도)
-        cache_key = f"transaction_{user.id}_{account_id}_{transaction_type}_{start_date}_{end_date}_{ordering}"
+        params = self.request.query_params
+        granularity = params.get("granularity", "month")
+        if granularity not in dict(TransactionAggregate.GRANULARITIES):
+            raise ParseError("granularity must be one of day, month, all")
 
-        # 캐시에서 쿼리셋 가져오기 시도 (O(1) 상수 시간 복잡도)
-        cached_queryset = cache.get(cache_key)
-        if cached_queryset is not None:
-            return cached_queryset
+        # 사용자/단위 필터 (O(log n), (user, granularity, period) 인덱스)
+        queryset = TransactionAggregate.objects.filter(
+            user_id=self.request.user.id, granularity=granularity
+        )
+        if params.get("account_id"):
+            queryset = queryset.filter(account_id=params["account_id"])
+        if params.get("transaction_type"):
+            queryset = queryset.filter(transaction_type=params["transaction_type"])
+        if params.get("start_period"):
+            queryset = queryset.filter(period__gte=params["start_period"])
+        if params.get("end_period"):
+            queryset = queryset.filter(period__lte=params["end_period"])
+        return queryset.order_by("account_id", "period", "transaction_type")
 
-        # 쿼리셋 필터링 (여러 필터 적용, 대부분 O(n))
-        queryset = Transaction.objects.filter(account__user=user)
 
-        # account_id 필터 적용 (O(1) 상수 시간 복잡도, 외래 키 인덱스 있음)
-        if account_id:
-            queryset = queryset.filter(account_id=account_id)
+class MetricsView(APIView):
+    permission_classes = [permissions.IsAdminUser]
 
-        # transaction_type 필터 적용 (O(1) 상수 시간 복잡도, 인덱스 있음)
-        if transaction_type:
-            queryset = queryset.filter(transaction_type=transaction_type)
+    def get(self, request):
+        return Response(metrics.snapshot())
 
-        # 날짜 범위 필터 적용 (O(log n) 로그 시간 복잡도, 날짜 인덱스 있음)
-        if start_date and end_date:
-            queryset = queryset.filter(transaction_date__range=[start_date, end_date])
 
-        # 정렬 적용 (O(n log n))
-        queryset = queryset.order_by(ordering)
+class ProjectionLagView(APIView):
+    """
+    큐(파티션)별로 마지막으로 반영한 이벤트 순번과 지연 시간입니다.
+    - lag_seconds: 이벤트 발생부터 반영까지 걸린 시간
+    - idle_seconds: 마지막 반영 이후 지난 시간
+    """
 
-        # 필터링된 쿼리셋 캐시에 저장 (O(1) 상수 시간 복잡도)
-        cache.set(cache_key, queryset, timeout=60 * 60)  # 1시간 동안 캐싱
+    permission_classes = [permissions.IsAdminUser]
 
-        # 최종 쿼리셋 반환 (O(n))
-        return queryset
+    def get(self, request):
+        now = timezone.now()
+        return Response(
+            {
+                "queues": [
+                    {
+                        "queue": checkpoint.queue,
+                        "last_seq": checkpoint.last_seq,
+                        "last_event_at": checkpoint.last_event_at,
+                        "applied_at": checkpoint.applied_at,
+                        "lag_seconds": (
+                            checkpoint.applied_at - checkpoint.last_event_at
+                        ).total_seconds(),
+                        "idle_seconds": (now - checkpoint.applied_at).total_seconds(),
+                    }
+                    for checkpoint in ProjectionCheckpoint.objects.order_by("queue")
+                ]
+            }
+        )
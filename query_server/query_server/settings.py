@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 import os
+import sys
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -43,18 +44,49 @@ INSTALLED_APPS = [
 
 REST_FRAMEWORK = {
     "DEFAULT_SCHEMA_CLASS": "rest_framework.schemas.coreapi.AutoSchema",
+    "DEFAULT_AUTHENTICATION_CLASSES": [
+        "banking.authentication.SignedTokenAuthentication",
+        "rest_framework.authentication.SessionAuthentication",
+        "rest_framework.authentication.BasicAuthentication",
+    ],
 }
 
-MIDDLEWARE = [
+# 서명 토큰 키(두 서버가 같아야 합니다)와 토큰 유효 시간(초)
+AUTH_TOKEN_SECRET = os.getenv("AUTH_TOKEN_SECRET", SECRET_KEY)
+AUTH_TOKEN_TTL = int(os.getenv("AUTH_TOKEN_TTL", "3600"))
+
+# 토큰 인증 사용자 정보의 프로세스 내 캐시 TTL(초)과 최대 항목 수
+AUTH_PRINCIPAL_CACHE_TTL = float(os.getenv("AUTH_PRINCIPAL_CACHE_TTL", "30"))
+AUTH_PRINCIPAL_CACHE_SIZE = int(os.getenv("AUTH_PRINCIPAL_CACHE_SIZE", "10000"))
+
+# 모든 경로에 적용하는 미들웨어
+API_MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
-    "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
+]
+
+# 브라우저용 미들웨어 (세션, CSRF, 로그인 사용자, 메시지, 클릭재킹 방지)
+BROWSER_MIDDLEWARE = [
+    "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
+# 미들웨어 프로필: full 은 모든 경로에 전체 스택을 적용하고, lean 은
+# BROWSER_PATHS/BROWSER_PATH_PREFIXES 이외의 API 경로에서 BROWSER_MIDDLEWARE 를 건너뜁니다.
+# lean 에서는 API 경로의 세션 인증이 꺼지므로 토큰(또는 Basic) 인증을 씁니다.
+API_MIDDLEWARE_PROFILE = os.getenv("API_MIDDLEWARE_PROFILE", "full")
+# DRF 브라우저블 API 루트는 정확히 일치할 때만, 나머지는 접두사로 비교합니다.
+BROWSER_PATHS = ["/"]
+BROWSER_PATH_PREFIXES = ["/admin/", "/swagger", "/redoc/"]
+
+if API_MIDDLEWARE_PROFILE == "lean":
+    MIDDLEWARE = API_MIDDLEWARE + ["banking.middleware.BrowserOnlyMiddleware"]
+else:
+    MIDDLEWARE = API_MIDDLEWARE + BROWSER_MIDDLEWARE
+
 ROOT_URLCONF = "query_server.urls"
 
 TEMPLATES = [
@@ -88,12 +120,73 @@ DATABASES = {
     }
 }
 
+# 캐시 설정 - 웹 프로세스와 컨슈머 프로세스가 페이지 캐시, 세대 번호, 앵커와 잠금을 공유합니다.
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/1")
+CACHES = {
+    "default": {
+        "BACKEND": "django_redis.cache.RedisCache",
+        "LOCATION": REDIS_URL,
+        "OPTIONS": {"CLIENT_CLASS": "django_redis.client.DefaultClient"},
+    }
+}
+
+# 테스트는 Redis 없이 프로세스 메모리 캐시로 실행합니다.
+if sys.argv[1:2] == ["test"]:
+    CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
 # RabbitMQ 설정
 RABBITMQ_HOST = os.getenv("RABBITMQ_HOST", "localhost")
 
+# 컨슈머가 처리하지 못한 메시지를 보낼 데드레터 교환기 (두 서버가 같아야 합니다)
+RABBITMQ_DEAD_LETTER_EXCHANGE = os.getenv(
+    "RABBITMQ_DEAD_LETTER_EXCHANGE", "banking_dead_letter"
+)
+
 # 메시지 큐 전송 기능 활성화 여부를 환경 변수로 설정
 ENABLE_MQ = os.getenv("ENABLE_MQ", "true").lower() == "true"
 
+# 컨슈머 QoS prefetch 와 마이크로 배치 크기/시간 창(초)
+CONSUMER_PREFETCH = int(os.getenv("CONSUMER_PREFETCH", "1000"))
+CONSUMER_BATCH_SIZE = int(os.getenv("CONSUMER_BATCH_SIZE", "500"))
+CONSUMER_BATCH_WINDOW = float(os.getenv("CONSUMER_BATCH_WINDOW", "0.2"))
+
+# 계좌/거래 이벤트 파티션 큐 수 (명령 서버와 같은 값을 써야 합니다)
+PROJECTION_PARTITIONS = int(os.getenv("PROJECTION_PARTITIONS", "4"))
+
+# 다른 워커가 아직 반영하지 않은 행을 참조해 실패한 메시지를 큐에 되돌려 재시도할 횟수와
+# 재시도 간격(초, 시도마다 배수로 증가). 횟수를 넘기면 데드레터 큐로 보냅니다.
+CONSUMER_FK_RETRIES = int(os.getenv("CONSUMER_FK_RETRIES", "10"))
+CONSUMER_FK_RETRY_DELAY = float(os.getenv("CONSUMER_FK_RETRY_DELAY", "0.2"))
+
+# --verify-fks 사용 시 모델별로 기억할 확인된 id 수 (LRU)
+CONSUMER_KNOWN_IDS_SIZE = int(os.getenv("CONSUMER_KNOWN_IDS_SIZE", "100000"))
+
+# 거래내역 페이지 캐시 TTL(초) - 종료일이 지난 기간 조회는 더 길게 보관
+TRANSACTION_PAGE_CACHE_TTL = int(os.getenv("TRANSACTION_PAGE_CACHE_TTL", "3600"))
+TRANSACTION_HISTORY_CACHE_TTL = int(os.getenv("TRANSACTION_HISTORY_CACHE_TTL", "86400"))
+
+# 비동기(ASGI) 거래내역 엔드포인트의 캐시 조회/DB 조회 스레드 수와 최대 대기 요청 수
+QUERY_CACHE_EXECUTOR_WORKERS = int(os.getenv("QUERY_CACHE_EXECUTOR_WORKERS", "32"))
+QUERY_DB_EXECUTOR_WORKERS = int(os.getenv("QUERY_DB_EXECUTOR_WORKERS", "8"))
+QUERY_EXECUTOR_MAX_PENDING = int(os.getenv("QUERY_EXECUTOR_MAX_PENDING", "8192"))
+
+# page= 이동용 앵커 간격(행 수)과 앵커/건수 캐시 TTL(초)
+PAGE_ANCHOR_INTERVAL = int(os.getenv("PAGE_ANCHOR_INTERVAL", "1000"))
+PAGE_ANCHOR_TTL = int(os.getenv("PAGE_ANCHOR_TTL", "86400"))
+
+# 사용자 앵커 잠금의 최대 보유 시간과, 경고를 남길 앵커 빌드 시간(초)
+PAGE_ANCHOR_LOCK_TIMEOUT = float(os.getenv("PAGE_ANCHOR_LOCK_TIMEOUT", "1"))
+PAGE_ANCHOR_SLOW_BUILD = float(os.getenv("PAGE_ANCHOR_SLOW_BUILD", "0.5"))
+
+# min_seq 요청이 프로젝션을 기다리는 최대 시간과 확인 간격(초)
+CONSISTENCY_MAX_WAIT = float(os.getenv("CONSISTENCY_MAX_WAIT", "1"))
+CONSISTENCY_POLL_INTERVAL = float(os.getenv("CONSISTENCY_POLL_INTERVAL", "0.05"))
+
+# rebuild_projection 이 읽을 명령 서버 주소와 이벤트 API 토큰, 한 번에 반영할 이벤트 수
+COMMAND_SERVER_URL = os.getenv("COMMAND_SERVER_URL", "http://localhost:8000")
+EVENT_API_TOKEN = os.getenv("EVENT_API_TOKEN", "")
+REBUILD_CHUNK_SIZE = int(os.getenv("REBUILD_CHUNK_SIZE", "5000"))
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 